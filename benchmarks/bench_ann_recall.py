@@ -0,0 +1,85 @@
+"""Recall@k and latency of the IVF index vs. brute force on synthetic
+clustered 384-dim vectors (shaped like MiniLM embeddings of many videos).
+
+  python benchmarks/bench_ann_recall.py --vectors 100000 --queries 200
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from ann_index import IVFIndex  # noqa: E402
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Synthetic corpus — many topics (videos) with noisy members
+# ------------------------------------------------------------------------
+def make_corpus(n, dim, topics, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(topics, dim)).astype(np.float32)
+    labels = rng.integers(0, topics, size=n)
+    vectors = centers[labels] + 1.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def brute_force(vectors, queries, k):
+    # One query at a time, like the local store's exact path
+    results = []
+    for query in queries:
+        scores = vectors @ query
+        results.append(set(np.argpartition(-scores, k - 1)[:k]))
+    return results
+
+
+
+
+# ------------------------------------------------------------------------
+# main: Sweep nprobe for float32 and int8 lists
+# ------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.vectors + args.queries, args.dim, args.topics)
+    vectors, queries = corpus[:args.vectors], corpus[args.vectors:]
+
+    start = time.perf_counter()
+    truth = brute_force(vectors, queries, args.k)
+    brute_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"Brute force: {brute_ms:.3f} ms/query, {vectors.nbytes / 1e6:.1f} MB resident")
+
+    for quantization in ("none", "int8"):
+        index = IVFIndex(args.dim, quantization=quantization)
+        start = time.perf_counter()
+        # Insert in batches, as main_workflow does once per finished video
+        for batch_start in range(0, len(vectors), 5000):
+            index.add(list(range(batch_start, min(batch_start + 5000, len(vectors)))),
+                      vectors[batch_start:batch_start + 5000])
+        build_s = time.perf_counter() - start
+        print(f"\nIVF ({quantization}): {len(index.centroids)} lists, built in {build_s:.2f}s, "
+              f"{index.memory_bytes() / 1e6:.1f} MB resident")
+        print(f"{'nprobe':>6} {'recall@' + str(args.k):>10} {'ms/query':>9} {'speedup':>8}")
+
+        for nprobe in args.nprobe:
+            start = time.perf_counter()
+            results = [index.search(q, args.k, nprobe=nprobe) for q in queries]
+            ms = (time.perf_counter() - start) * 1000 / len(queries)
+            recall = np.mean([len({key for key, _ in r} & t) / args.k for r, t in zip(results, truth)])
+            print(f"{nprobe:>6} {recall:>10.3f} {ms:>9.3f} {brute_ms / ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
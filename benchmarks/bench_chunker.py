@@ -0,0 +1,90 @@
+"""Segment-aligned token chunker vs. the RecursiveCharacterTextSplitter path
+(file read + 400/100 character split + timestamp lookup) on synthetic long transcripts.
+
+  python benchmarks/bench_chunker.py --hours 1 2 4
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from picone import split_text_into_chunks, attach_timestamps, CHUNK_SIZE, CHUNK_OVERLAP  # noqa: E402
+from segment_chunker import chunk_segments, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS  # noqa: E402
+from map_reduce_summary import get_token_counter  # noqa: E402
+from transcript_store import write_transcript  # noqa: E402
+
+WORDS = ("the model attention layer token vector query answer video transcript embedding index search "
+         "result chunk segment speaker example data training loss gradient batch latency memory").split()
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Synthetic Whisper output (~2.5 words/second, segments of 2-8 seconds)
+# ------------------------------------------------------------------------
+def make_segments(seconds: float, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    segments, t = [], 0.0
+    while t < seconds:
+        duration = rng.uniform(2.0, 8.0)
+        words = [rng.choice(WORDS) for _ in range(max(1, int(duration * 2.5)))]
+        text = " " + " ".join(words)
+        if rng.random() < 0.7:
+            text += rng.choice([".", ".", "?", "!"])  # most segments end a sentence, some run on
+        segments.append({"start": round(t, 2), "end": round(t + duration, 2), "text": text})
+        t += duration
+    return segments
+
+
+def describe(chunks: list, count_tokens) -> str:
+    tokens = [count_tokens(c["text"]) for c in chunks]
+    sentence_ends = sum(c["text"].rstrip()[-1:] in ".?!" for c in chunks)
+    return (f"{len(chunks):>6} chunks, {sum(tokens) / len(tokens):6.1f} tok avg, {max(tokens):4d} max, "
+            f"{100 * sentence_ends / len(chunks):5.1f}% end on a sentence")
+
+
+
+
+# ------------------------------------------------------------------------
+# main: Time both chunkers for each transcript length
+# ------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, nargs="+", default=[0.5, 1, 2, 4])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    count_tokens = get_token_counter()
+
+    print(f"text splitter: {CHUNK_SIZE}/{CHUNK_OVERLAP} chars; segment chunker: "
+          f"{CHUNK_TOKENS}/{CHUNK_OVERLAP_TOKENS} tokens")
+    with tempfile.TemporaryDirectory() as tmp:
+        for hours in args.hours:
+            segments = make_segments(hours * 3600)
+            text_path = os.path.join(tmp, f"bench_{hours}h_transcription.txt")
+            write_transcript(text_path, segments)
+            chars = sum(len(s["text"]) for s in segments)
+            print(f"\n{hours:g} h transcript: {len(segments)} segments, {chars / 1e6:.2f} M chars")
+
+            runs = {
+                "text splitter": lambda: attach_timestamps(
+                    split_text_into_chunks(text_path, CHUNK_SIZE, CHUNK_OVERLAP, with_offsets=True), text_path),
+                "segment chunker": lambda: list(chunk_segments(segments, count_tokens=count_tokens)),
+            }
+            baseline = None
+            for name, run in runs.items():
+                best = float("inf")
+                for _ in range(args.repeats):
+                    start = time.perf_counter()
+                    chunks = run()
+                    best = min(best, time.perf_counter() - start)
+                baseline = baseline or best
+                print(f"  {name:<16} {best * 1000:9.1f} ms  {chars / best / 1e6:6.2f} M chars/s  "
+                      f"{baseline / best:5.2f}x  {describe(chunks, count_tokens)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Recall@k and latency of dense-only vs. hybrid (dense + BM25, reciprocal rank fusion)
+retrieval on a synthetic transcript whose answers hinge on exact names, numbers and codes.
+
+  python benchmarks/bench_retrieval.py --chunks 2000 --queries 200
+  python benchmarks/bench_retrieval.py --fake-embeddings   # offline, no MiniLM download
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+TOPICS = ("the training loop", "gradient descent", "the attention layer", "our evaluation setup", "the dataset",
+          "the inference server", "the tokenizer", "memory usage", "the learning rate schedule", "the results")
+VERBS = ("explains", "changes", "improves", "breaks", "replaces", "measures", "simplifies", "describes")
+FILLER = ("so basically what we did here is", "and if you look at the chart", "which is why", "remember that",
+          "as we saw earlier", "the interesting part is that")
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Synthetic chunks with one exact-match "needle" each (name, number or code)
+# ------------------------------------------------------------------------
+def make_needle(rng: random.Random) -> str:
+    kind = rng.randrange(3)
+    if kind == 0:
+        return "".join(rng.choice("bdfgklmnprstvz") + rng.choice("aeiou") for _ in range(3)).capitalize()
+    if kind == 1:
+        return f"{rng.randint(10, 999)}.{rng.randint(1, 99)}"
+    return f"{rng.choice('ABCDEFGHKMNPRSTXZ')}{rng.choice('ABCDEFGHKMNPRSTXZ')}-{rng.randint(100, 9999)}"
+
+
+def make_corpus(n: int, seed: int = 0) -> tuple:
+    rng = random.Random(seed)
+    chunks, needles = [], []
+    for i in range(n):
+        needle = make_needle(rng)
+        sentences = [f"{rng.choice(FILLER)} {rng.choice(TOPICS)} {rng.choice(VERBS)} {rng.choice(TOPICS)}."
+                     for _ in range(4)]
+        sentences.insert(rng.randrange(5), f"{rng.choice(TOPICS).capitalize()} {rng.choice(VERBS)} {needle}.")
+        chunks.append({"text": " ".join(sentences), "start": i * 15.0, "end": i * 15.0 + 15.0})
+        needles.append(needle)
+    return chunks, needles
+
+
+def make_queries(chunks: list, needles: list, count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    picks = rng.sample(range(len(chunks)), min(count, len(chunks)))
+    return [(f"What did they say about {needles[i]}?", i) for i in picks]
+
+
+
+
+# ------------------------------------------------------------------------
+# main: Ingest into a temporary local store + BM25 index, then query both ways
+# ------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 4, 10])
+    parser.add_argument("--fake-embeddings", action="store_true", help="hashed bag-of-words instead of MiniLM")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_retrieval_")
+    os.environ.update(VECTOR_BACKEND="local", LOCAL_VECTOR_DIR=os.path.join(tmp, "vectors"),
+                      BM25_INDEX_DIR=os.path.join(tmp, "bm25"))
+    import numpy as np
+    import retrieval_cache
+    from vector_backend import get_local_index, get_vectorstore
+    from bm25_index import build_namespace_index, hybrid_retrieve
+    if args.fake_embeddings:
+        from fakes import HashEmbeddings
+        embeddings = HashEmbeddings()
+    else:
+        from model_registry import get_embeddings
+        embeddings = get_embeddings("all-MiniLM-L6-v2")
+
+    namespace = "bench"
+    chunks, needles = make_corpus(args.chunks)
+    queries = make_queries(chunks, needles, args.queries)
+    started = time.perf_counter()
+    vectors = embeddings.embed_documents([c["text"] for c in chunks])
+    get_local_index().upsert([(f"chunk-{i}", v, c) for i, (v, c) in enumerate(zip(vectors, chunks))],
+                             namespace=namespace)
+    build_namespace_index(namespace, chunks)
+    print(f"Ingested {len(chunks)} chunks in {time.perf_counter() - started:.1f}s; {len(queries)} queries")
+    vectordb = get_vectorstore(namespace, embeddings)
+
+    k_max = max(args.k)
+    methods = {
+        "dense": lambda q: retrieval_cache.cached_retrieve(vectordb, namespace, q, k=k_max),
+        "hybrid": lambda q: hybrid_retrieve(vectordb, namespace, q, k=k_max),
+    }
+    print(f"{'method':<8} " + " ".join(f"{'recall@' + str(k):>9}" for k in args.k) + f" {'p50 ms':>8} {'p95 ms':>8}")
+    for name, retrieve in methods.items():
+        # Cold caches so every query pays for its embedding and search
+        retrieval_cache.query_embedding_cache.discard_where(lambda key: True)
+        retrieval_cache.retrieval_cache.discard_where(lambda key: True)
+        latencies, hits = [], {k: 0 for k in args.k}
+        for query, target in queries:
+            start = time.perf_counter()
+            docs = retrieve(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            starts = [doc.metadata.get("start") for doc in docs]
+            for k in args.k:
+                hits[k] += chunks[target]["start"] in starts[:k]
+        print(f"{name:<8} " + " ".join(f"{hits[k] / len(queries):>9.3f}" for k in args.k)
+              + f" {np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
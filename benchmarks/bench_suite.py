@@ -0,0 +1,399 @@
+"""Per-stage benchmarks of the ingestion and QA hot paths on synthetic fixtures, with offline
+stand-ins (hash embeddings, local vector store, fake LLM and Whisper, stub yt-dlp).
+Reports p50/p95 wall time, throughput and peak traced memory per benchmark, saves the run
+to benchmarks/results/<name>.json and compares it with an earlier run.
+
+  python benchmarks/bench_suite.py                                  # everything, saved as latest
+  python benchmarks/bench_suite.py --only chunk retrieval --repeats 20
+  python benchmarks/bench_suite.py --save baseline                  # before a change
+  python benchmarks/bench_suite.py --compare baseline --fail-over 10   # after it; exit 1 on >10% slower
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+import platform
+import shutil
+import tempfile
+import tracemalloc
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, SRC_DIR)
+
+BENCHMARKS = {}  # name -> setup(args) returning (run, items per run: chunks, records, queries, audio seconds)
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Timing and memory measurement
+# ------------------------------------------------------------------------
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lo = int(position)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (position - lo)
+
+
+def measure(run, repeats: int, warmup: int = 1, items: int = 0) -> dict:
+    for _ in range(warmup):
+        run()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    # Memory in a separate pass: tracemalloc slows allocation-heavy code too much to time under it
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50 = percentile(times, 50)
+    result = {"runs": repeats, "p50_ms": p50 * 1000, "p95_ms": percentile(times, 95) * 1000,
+              "mean_ms": sum(times) / len(times) * 1000, "peak_kb": peak / 1024}
+    if items:
+        result["items"] = items
+        result["items_per_s"] = items / p50 if p50 else 0.0
+    return result
+
+
+def bench(name: str):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Synthetic fixtures (transcripts, chunks, quiz text, summaries)
+# ------------------------------------------------------------------------
+WORDS = ("the model attention layer token vector query answer video transcript embedding index search "
+         "result chunk segment speaker example data training loss gradient batch latency memory").split()
+
+
+def make_segments(seconds: float, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    segments, t = [], 0.0
+    while t < seconds:
+        duration = rng.uniform(2.0, 8.0)
+        text = " " + " ".join(rng.choice(WORDS) for _ in range(max(1, int(duration * 2.5))))
+        if rng.random() < 0.7:
+            text += rng.choice([".", ".", "?", "!"])
+        segments.append({"start": round(t, 2), "end": round(t + duration, 2), "text": text})
+        t += duration
+    return segments
+
+
+def make_chunks(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [{"text": " ".join(rng.choice(WORDS) for _ in range(60)) + ".", "start": i * 15.0, "end": i * 15.0 + 15.0}
+            for i in range(count)]
+
+
+def make_quiz_text(count: int) -> str:
+    blocks = [f"{i}. Which component does the speaker describe as item {i}?\n"
+              f"A) The attention layer\nB) The tokenizer\nC) The index\nD) The batch size\nCorrect answer: B)"
+              for i in range(1, count + 1)]
+    return "Here are the questions:\n\n" + "\n\n".join(blocks)
+
+
+def fake_models(args):
+    # Offline embeddings and Whisper through the shared registry (every caller gets the stand-ins)
+    import model_registry
+    import fakes
+    embeddings = fakes.HashEmbeddings()
+    if not args.real_embeddings:
+        model_registry._registry.loaders["embeddings"] = lambda name, device: embeddings
+    model_registry._registry.loaders["whisper"] = lambda name, device: fakes.FakeWhisperModel(args.whisper_rtf)
+    return model_registry.get_embeddings("all-MiniLM-L6-v2")
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Ingestion benchmarks
+# ------------------------------------------------------------------------
+@bench("split_text_into_chunks")
+def setup_split(args):
+    from picone import split_text_into_chunks, attach_timestamps, CHUNK_SIZE, CHUNK_OVERLAP
+    from transcript_store import write_transcript
+    path = os.path.join(args.workdir, "bench_split_transcription.txt")
+    write_transcript(path, make_segments(args.transcript_minutes * 60))
+    run = lambda: attach_timestamps(
+        split_text_into_chunks(path, CHUNK_SIZE, CHUNK_OVERLAP, with_offsets=True), path)
+    return run, len(run())
+
+
+@bench("chunk_segments")
+def setup_segment_chunker(args):
+    from segment_chunker import chunk_segments
+    from map_reduce_summary import get_token_counter
+    segments, count_tokens = make_segments(args.transcript_minutes * 60), get_token_counter()
+    run = lambda: list(chunk_segments(segments, count_tokens=count_tokens))
+    return run, len(run())
+
+
+@bench("embed")
+def setup_embed(args):
+    from picone import EMBED_BATCH_SIZE, batched
+    embeddings = fake_models(args)
+    texts = [c["text"] for c in make_chunks(args.embed_chunks)]
+
+    def run():
+        for batch in batched(texts, EMBED_BATCH_SIZE):
+            embeddings.embed_documents(batch)
+    return run, len(texts)
+
+
+@bench("upsert_batching")
+def setup_upsert_batching(args):
+    from picone import build_upsert_batches, chunk_metadata
+    rng = random.Random(0)
+    records = [(f"chunk-{i}", [rng.random() for _ in range(384)], chunk_metadata(chunk))
+               for i, chunk in enumerate(make_chunks(args.upsert_records))]
+    return lambda: list(build_upsert_batches(records)), len(records)
+
+
+@bench("embed_and_upload")
+def setup_embed_upload(args):
+    from picone import embed_chunks_and_upload_to_pinecone
+    from fakes import InMemoryIndex
+    embeddings = fake_models(args)
+    chunks, index, runs = make_chunks(args.embed_chunks), InMemoryIndex(), [0]
+
+    def run():
+        runs[0] += 1  # fresh namespace: every run embeds and uploads everything
+        embed_chunks_and_upload_to_pinecone(chunks, namespace=f"bench_upload_{runs[0]}", index=index,
+                                            embeddings=embeddings)
+    return run, len(chunks)
+
+
+@bench("main_workflow")
+def setup_main_workflow(args):
+    import picone
+    fake_models(args)
+    runs = [0]
+
+    def run():
+        runs[0] += 1  # new video ID each run: nothing is served from the pipeline cache
+        picone.main_workflow(f"https://youtu.be/bench{runs[0]:06d}", use_cache=False)
+    return run, int(args.audio_seconds)
+
+
+@bench("main_workflow_cached")
+def setup_main_workflow_cached(args):
+    import picone
+    fake_models(args)
+    url = "https://youtu.be/benchcached"
+    picone.main_workflow(url)  # populate every stage once
+    return lambda: picone.main_workflow(url), int(args.audio_seconds)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: QA, quiz and summary export benchmarks
+# ------------------------------------------------------------------------
+def load_corpus(namespace: str, size: int, embeddings) -> list:
+    from vector_backend import get_local_index
+    from bm25_index import build_namespace_index
+    chunks = make_chunks(size, seed=size)
+    vectors = embeddings.embed_documents([c["text"] for c in chunks])
+    get_local_index().upsert([(f"chunk-{i}", v, c) for i, (v, c) in enumerate(zip(vectors, chunks))],
+                             namespace=namespace)
+    build_namespace_index(namespace, chunks)
+    return chunks
+
+
+def retrieval_bench(mode: str, size: int):
+    def setup(args):
+        import retrieval_cache
+        from vector_backend import get_vectorstore
+        from bm25_index import hybrid_retrieve
+        embeddings = fake_models(args)
+        namespace = f"bench_retrieval_{size}"
+        load_corpus(namespace, size, embeddings)
+        vectordb = get_vectorstore(namespace, embeddings)
+        rng = random.Random(size)
+        queries = [f"what did they say about the {rng.choice(WORDS)} and {rng.choice(WORDS)}" for _ in range(50)]
+
+        def run():
+            # Cold caches: every query pays for its embedding and search
+            retrieval_cache.query_embedding_cache.discard_where(lambda key: True)
+            retrieval_cache.retrieval_cache.discard_where(lambda key: True)
+            for query in queries:
+                if mode == "hybrid":
+                    hybrid_retrieve(vectordb, namespace, query, k=4)
+                else:
+                    retrieval_cache.cached_retrieve(vectordb, namespace, query, k=4)
+        return run, len(queries)
+    return setup
+
+
+for _size in (1000, 10000, 50000):
+    bench(f"retrieval_dense@{_size}")(retrieval_bench("dense", _size))
+    bench(f"retrieval_hybrid@{_size}")(retrieval_bench("hybrid", _size))
+
+
+@bench("qa_chain")
+def setup_qa_chain(args):
+    from vector_backend import get_vectorstore
+    from chat_with_video import build_qa_chain
+    from fakes import make_fake_llm
+    embeddings = fake_models(args)
+    namespace = "bench_qa"
+    load_corpus(namespace, 2000, embeddings)
+    chain = build_qa_chain(get_vectorstore(namespace, embeddings), namespace=namespace,
+                           llm=make_fake_llm(), answer_cache=None)
+    questions = [f"How does the {word} work?" for word in WORDS]
+    return lambda: [chain({"query": q, "return_sources": True}) for q in questions], len(questions)
+
+
+@bench("parse_questions")
+def setup_parse_questions(args):
+    from quiz_generator import parse_questions
+    text = make_quiz_text(50)
+    return lambda: parse_questions(text), 50
+
+
+@bench("wrap_text")
+def setup_wrap_text(args):
+    from summary_and_email import wrap_text
+    text = " ".join(random.Random(0).choice(WORDS) for _ in range(args.summary_words))
+    return lambda: wrap_text(text, max_chars=100), 0
+
+
+@bench("generate_pdf")
+def setup_generate_pdf(args):
+    from summary_and_email import generate_pdf
+    text = " ".join(random.Random(0).choice(WORDS) for _ in range(args.summary_words))
+    return lambda: generate_pdf(text, "Bench Summary"), 0
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Saved results and run-over-run comparison
+# ------------------------------------------------------------------------
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def results_path(name: str) -> str:
+    return name if name.endswith(".json") else os.path.join(RESULTS_DIR, f"{name}.json")
+
+
+def save_results(name: str, run: dict) -> str:
+    path = results_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def compare(current: dict, previous: dict, fail_over: float) -> list:
+    # Returns the benchmarks whose p50 got slower by more than fail_over percent
+    print(f"\nvs. {previous['environment'].get('commit') or '?'} ({previous['environment'].get('timestamp')})")
+    print(f"{'benchmark':<26} {'p50 ms':>10} {'before':>10} {'change':>8} {'peak KB':>10} {'before':>10}")
+    regressions = []
+    for name, result in current["results"].items():
+        before = previous["results"].get(name)
+        if before is None:
+            continue
+        change = 100 * (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] if before["p50_ms"] else 0.0
+        flag = "  <-- slower" if change > fail_over else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<26} {result['p50_ms']:>10.2f} {before['p50_ms']:>10.2f} {change:>+7.1f}% "
+              f"{result['peak_kb']:>10.0f} {before['peak_kb']:>10.0f}{flag}")
+    return regressions
+
+
+
+
+# ------------------------------------------------------------------------
+# main: Run the selected benchmarks in an isolated working directory
+# ------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", help="benchmark names or prefixes (default: all)")
+    parser.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--save", default="latest", help="results name under benchmarks/results (or a .json path)")
+    parser.add_argument("--compare", help="earlier results name or .json path to compare against")
+    parser.add_argument("--fail-over", type=float, default=None, help="exit 1 if any p50 is this many %% slower")
+    parser.add_argument("--transcript-minutes", type=float, default=60)
+    parser.add_argument("--embed-chunks", type=int, default=512)
+    parser.add_argument("--upsert-records", type=int, default=5000)
+    parser.add_argument("--summary-words", type=int, default=3000)
+    parser.add_argument("--audio-seconds", type=float, default=300, help="stub audio length for main_workflow")
+    parser.add_argument("--whisper-rtf", type=float, default=0.0, help="fake Whisper seconds per audio second")
+    parser.add_argument("--real-embeddings", action="store_true", help="MiniLM instead of hash embeddings")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline output while benchmarking")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return
+    selected = [name for name in BENCHMARKS if not args.only or any(name.startswith(p) for p in args.only)]
+    previous = None
+    if args.compare:
+        with open(results_path(args.compare), "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    save_path = os.path.abspath(results_path(args.save))
+
+    # Every relative data/ path (vector store, caches, manifests, PDFs) lands in a throwaway directory
+    args.workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    os.chdir(args.workdir)
+    os.environ.update(VECTOR_BACKEND="local", TRANSCRIBE_WORKERS="1",
+                      YTDLP_CMD=f"{sys.executable} {os.path.join(SRC_DIR, 'stub_yt_dlp.py')}",
+                      STUB_DURATION_SECONDS=str(args.audio_seconds))
+
+    try:
+        run = {"environment": environment(), "args": {k: v for k, v in vars(args).items() if k != "workdir"},
+               "results": {}}
+        print(f"{'benchmark':<26} {'p50 ms':>10} {'p95 ms':>10} {'items/s':>10} {'peak KB':>10}")
+        output = sys.stdout if args.verbose else open(os.devnull, "w")
+        for name in selected:
+            try:
+                with contextlib.redirect_stdout(output):
+                    target, items = BENCHMARKS[name](args)
+                    result = measure(target, args.repeats, items=items)
+            except ImportError as e:
+                print(f"{name:<26} skipped ({e})")
+                continue
+            run["results"][name] = result
+            rate = f"{result['items_per_s']:>10.0f}" if items else f"{'':>10}"
+            print(f"{name:<26} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} {rate} {result['peak_kb']:>10.0f}")
+
+        print(f"\nSaved {save_results(save_path, run)}")
+        if previous is not None:
+            regressions = compare(run, previous, args.fail_over if args.fail_over is not None else 10.0)
+            if regressions and args.fail_over is not None:
+                print(f"Regressions over {args.fail_over:g}%: {', '.join(regressions)}")
+                sys.exit(1)
+    finally:
+        shutil.rmtree(args.workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
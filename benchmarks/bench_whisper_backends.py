@@ -0,0 +1,177 @@
+"""Whisper inference backends on CPU: full-precision PyTorch (the current path), dynamic int8
+quantized PyTorch and CTranslate2 (faster-whisper), across thread counts and batch sizes.
+Reports real-time factor (decode seconds per audio second) and word error rate on the audio
+files in benchmarks/samples; a <name>.txt next to each file holds its reference transcript.
+Bundled: jfk.wav (11 s of John F. Kennedy's 1961 inaugural address, public domain; the clip
+whisper.cpp ships as samples/jfk.wav).
+
+  python benchmarks/bench_whisper_backends.py --model tiny
+  python benchmarks/bench_whisper_backends.py --model base --backends torch int8 --threads 2 4 --batch-sizes 1 8
+  python benchmarks/bench_whisper_backends.py --save whisper_base   # to benchmarks/results/whisper_base.json
+"""
+
+import os
+import re
+import sys
+import time
+import glob
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLES_DIR = os.path.join(BENCH_DIR, "samples")
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+from bench_suite import environment, save_results  # noqa: E402
+from streaming_transcriber import SAMPLE_RATE, decode_spans, load_pcm, vad_segments  # noqa: E402
+from whisper_backends import BACKEND_KINDS, load_ctranslate2, load_int8, set_threads  # noqa: E402
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".m4a", ".ogg", ".webm")
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Sample audio with optional reference transcripts
+# ------------------------------------------------------------------------
+def load_samples(directory: str) -> list:
+    samples = []
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        if not path.lower().endswith(AUDIO_EXTENSIONS):
+            continue
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, "r", encoding="utf-8") as f:
+                reference = f.read()
+        pcm = load_pcm(path)
+        samples.append({"name": os.path.basename(path), "pcm": pcm, "seconds": len(pcm) / SAMPLE_RATE,
+                        "reference": reference})
+    return samples
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Word error rate (edit distance over normalized words)
+# ------------------------------------------------------------------------
+def normalize_words(text: str) -> list:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_edits(reference: list, hypothesis: list) -> int:
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, start=1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1]
+
+
+def error_rate(pairs: list):
+    # Corpus-level: total edits over total reference words; None when nothing has a reference
+    pairs = [(normalize_words(ref), normalize_words(hyp)) for ref, hyp in pairs if ref is not None]
+    words = sum(len(ref) for ref, _ in pairs)
+    return sum(word_edits(ref, hyp) for ref, hyp in pairs) / words if words else None
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Load a backend and transcribe through the streaming pipeline's VAD + decode path
+# ------------------------------------------------------------------------
+def load_backend(backend: str, model: str):
+    if backend == "int8":
+        return load_int8(model)
+    if backend == "ctranslate2":
+        return load_ctranslate2(model)
+    import whisper
+    return whisper.load_model(model, device="cpu")
+
+
+def transcribe(model, pcm, batch_size: int) -> str:
+    # The streaming pipeline's own path: VAD slices, decoded one by one or batch_size at a time
+    spans = vad_segments(pcm)
+    segments = []
+    for i in range(0, len(spans), batch_size):
+        group = spans[i:i + batch_size]
+        segments += decode_spans(model, [s for s, _ in group], [pcm[s:e] for s, e in group])
+    return "".join(segment["text"] for segment in segments)
+
+
+def run_config(backend: str, args, threads: int, batch_size: int, samples: list) -> dict:
+    set_threads(threads)  # before loading: CTranslate2 fixes its thread pool at load time
+    started = time.perf_counter()
+    model = load_backend(backend, args.model)
+    load_seconds = time.perf_counter() - started
+    transcribe(model, samples[0]["pcm"][:5 * SAMPLE_RATE], batch_size)  # warm-up (allocations, kernels)
+
+    transcripts, decode_seconds = {}, 0.0
+    for sample in samples:
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            transcripts[sample["name"]] = transcribe(model, sample["pcm"], batch_size)
+            decode_seconds += (time.perf_counter() - started) / args.repeats
+    audio_seconds = sum(sample["seconds"] for sample in samples)
+    return {
+        "backend": backend, "threads": threads, "batch_size": batch_size,
+        "load_seconds": round(load_seconds, 3), "decode_seconds": round(decode_seconds, 3),
+        "rtf": round(decode_seconds / audio_seconds, 4),
+        "wer": error_rate([(sample["reference"], transcripts[sample["name"]]) for sample in samples]),
+        "transcripts": transcripts,
+    }
+
+
+
+
+# ------------------------------------------------------------------------
+# main: Every backend x threads x batch size; RTF, WER and drift from the PyTorch baseline
+# ------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="tiny", help="tiny/base/small/...")
+    parser.add_argument("--backends", nargs="+", default=list(BACKEND_KINDS), choices=list(BACKEND_KINDS))
+    parser.add_argument("--threads", type=int, nargs="+", default=[os.cpu_count() or 1])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1])
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--samples", default=SAMPLES_DIR, help="directory with audio files (+ .txt references)")
+    parser.add_argument("--save", help="results name (benchmarks/results/<name>.json)")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    if not samples:
+        print(f"No audio in {args.samples}: add {'/'.join(AUDIO_EXTENSIONS)} files (and <name>.txt references).")
+        return 2
+    audio_seconds = sum(sample["seconds"] for sample in samples)
+    print(f"{len(samples)} samples, {audio_seconds:.1f}s of audio, "
+          f"{sum(s['reference'] is not None for s in samples)} with references; model '{args.model}'")
+
+    results, baseline = [], None
+    print(f"\n{'backend':<12} {'threads':>7} {'batch':>5} {'load s':>7} {'RTF':>7} {'speedup':>7} "
+          f"{'WER':>6} {'drift':>6}")
+    for backend in args.backends:
+        for threads in args.threads:
+            for batch_size in args.batch_sizes:
+                try:
+                    result = run_config(backend, args, threads, batch_size, samples)
+                except ImportError as e:
+                    print(f"{backend:<12} {threads:>7} {batch_size:>5}  skipped ({e})")
+                    continue
+                baseline = baseline or result  # first config run is the reference point (torch by default)
+                result["speedup"] = round(baseline["rtf"] / result["rtf"], 2) if result["rtf"] else None
+                # Word changes vs. the baseline transcript: quantization drift even without references
+                result["drift"] = error_rate([(baseline["transcripts"][name], text)
+                                              for name, text in result["transcripts"].items()])
+                results.append(result)
+                wer = f"{result['wer']:.3f}" if result["wer"] is not None else "-"
+                print(f"{backend:<12} {threads:>7} {batch_size:>5} {result['load_seconds']:>7.2f} "
+                      f"{result['rtf']:>7.4f} {result['speedup']:>6.2f}x {wer:>6} {result['drift']:>6.3f}")
+
+    if args.save:
+        path = save_results(args.save, {"environment": environment(), "model": args.model,
+                                         "audio_seconds": round(audio_seconds, 3), "results": results})
+        print(f"\nSaved to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
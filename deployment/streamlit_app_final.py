@@ -10,6 +10,7 @@ st.set_page_config(page_title="Video QA Assistant", layout="wide")  # Wide layou
 # config: Environment setup for keys and compatibility
 # ------------------------------------------------------------------------
 import os
+import time
 os.environ["STREAMLIT_WATCHER_TYPE"] = "none"  # Fix for Windows filesystem issues with Streamlit
 
 # Use env variable for OpenAI key — DO NOT hardcode in production
@@ -27,7 +28,14 @@ torch._C._jit_set_profiling_mode(False)
 # ------------------------------------------------------------------------
 from streamlit.components.v1 import html  # For embedding raw HTML like YouTube player
 from keyword_explorer import keyword_explorer  # Visual keyword summary
-from picone import main_workflow  # Audio download + transcript + vector storage
+from job_queue import get_job_queue  # Background main_workflow jobs (download + transcript + vector storage)
+from session_context import SessionContext  # Per-session namespace + handles (no shared namespace file)
+from resources import get_resources  # Shared vector stores / LLM clients, per-session QA chains
+from model_registry import warm_up_from_env  # Process-wide model cache
+from transcript_store import format_timestamp  # Seconds → M:SS for source links
+from retrieval_cache import cache_stats  # Query/retrieval cache hit ratio and memory
+from answer_cache import get_answer_cache  # Semantic LLM answer cache
+from token_stream import get_stream_metrics  # Time-to-first-token per streamed feature
 import speech_recognition as sr  # For microphone-based input
 
 # Load LangChain QA tools
@@ -41,7 +49,7 @@ os.environ["LANGCHAIN_PROJECT"] = "pr-grumpy-simple-26"
 # Summarization and PDF/email export tools
 from summary_and_email import (
     load_transcript,
-    summarize_transcript,
+    stream_summary,
     fetch_related_image,
     generate_pdf,
     send_email_with_pdf
@@ -49,6 +57,13 @@ from summary_and_email import (
 
 
 
+# ------------------------------------------------------------------------
+# perf: Preload models listed in MODEL_WARMUP (no-op after the first run)
+# ------------------------------------------------------------------------
+warm_up_from_env()
+
+
+
 # ------------------------------------------------------------------------
 # ui: Page header + GitHub contact button
 # ------------------------------------------------------------------------
@@ -96,20 +111,43 @@ if "quiz_score" not in st.session_state:
     st.session_state.quiz_score = 0  # Score counter
 if "quiz_answers" not in st.session_state:
     st.session_state.quiz_answers = []  # Selected answers
+if "video_start" not in st.session_state:
+    st.session_state.video_start = 0  # Player start offset (seconds), set by source links
+if "job_id" not in st.session_state:
+    st.session_state.job_id = None  # Background processing job for the current video
+if "ctx" not in st.session_state:
+    st.session_state.ctx = SessionContext()  # This browser session's video namespace and handles
 
 
 
 # ------------------------------------------------------------------------
 # helper: Embed YouTube video on screen
 # ------------------------------------------------------------------------
-def show_youtube_embed(url):
+def show_youtube_embed(url, start=0):
     if "youtube.com/watch?v=" in url or "youtu.be/" in url:
         video_id = url.split("v=")[-1] if "v=" in url else url.split("/")[-1]
-        embed_url = f"https://www.youtube.com/embed/{video_id}"
+        video_id = video_id.split("&")[0].split("?")[0]  # drop extra query params (t=, list=, ...)
+        embed_url = f"https://www.youtube.com/embed/{video_id}?start={int(start)}"
         html(f'<iframe width="560" height="315" src="{embed_url}" frameborder="0" allowfullscreen></iframe>', height=335)
 
 
 
+# ------------------------------------------------------------------------
+# helper: Timestamp buttons that seek the embedded player to a source chunk
+# ------------------------------------------------------------------------
+def show_sources(sources, key_prefix):
+    timed = [s for s in sources if s.get("start") is not None]
+    if not timed:
+        return
+    cols = st.columns(len(timed))
+    for i, (col, source) in enumerate(zip(cols, timed)):
+        with col:
+            if st.button(f"⏱ {format_timestamp(source['start'])}", key=f"{key_prefix}_src{i}", help=source["text"]):
+                st.session_state.video_start = source["start"]
+                st.rerun()
+
+
+
 # ------------------------------------------------------------------------
 # helper: Voice recognition using Google STT
 # ------------------------------------------------------------------------
@@ -130,29 +168,67 @@ def listen_to_voice():
 
 
 
+# ------------------------------------------------------------------------
+# ui: Job status, polled in a fragment so the rest of the page stays live
+# ------------------------------------------------------------------------
+@st.fragment(run_every=1)
+def job_status():
+    job_queue = get_job_queue()
+
+    # Reattach to a job started before a page reload / disconnect
+    job = job_queue.get(st.session_state.job_id) if st.session_state.job_id else None
+    if job is None and video_url:
+        job = job_queue.latest_for_video(video_url)
+        if job is not None and job["status"] in ("queued", "running"):
+            st.session_state.job_id = job["id"]
+        else:
+            job = None
+
+    if job is not None:
+        if job["status"] in ("queued", "running"):
+            stage = job["stage"] or "queued"
+            st.progress(job["progress"], text=f"⏳ {stage}: {job['message']}")
+            if st.button("⏹ Cancel", key="cancel_job"):
+                job_queue.cancel(job["id"])
+        elif job["status"] == "done":
+            if not st.session_state.processed or st.session_state.ctx.namespace != job["namespace"]:
+                st.session_state.result = job["result"]
+                st.session_state.ctx.set_namespace(job["namespace"])
+                st.session_state.processed = True
+                st.rerun()  # once per finished job: render the panels that depend on it
+            st.success("✅ Video processed!")
+            st.info(job["result"])
+        elif job["status"] == "failed":
+            if st.session_state.processed:
+                st.session_state.processed = False
+                st.rerun()
+            st.error(f"❌ Error during processing: {job['error']}")
+        else:
+            if st.session_state.processed:
+                st.session_state.processed = False
+                st.rerun()
+            st.warning(f"⚠️ Processing {job['status']}: {job['message']}")
+
+
+
 # ------------------------------------------------------------------------
 # ui: Left = video display | Right = trigger processing
 # ------------------------------------------------------------------------
 col1, col2 = st.columns([1.5, 1])
 with col1:
     if video_url:
-        show_youtube_embed(video_url)
+        show_youtube_embed(video_url, start=st.session_state.video_start)
 
 with col2:
+    job_queue = get_job_queue()
     if st.button("▶️ Start Processing"):
         if not video_url:
             st.warning("⚠️ Please enter a URL.")
         else:
-            with st.spinner("⏳ Processing..."):
-                try:
-                    result = main_workflow(video_url)  # download + transcribe + embed
-                    st.session_state.result = result
-                    st.session_state.processed = True
-                    st.success("✅ Video processed!")
-                    st.info(result)
-                except Exception as e:
-                    st.session_state.processed = False
-                    st.error(f"❌ Error during processing: {e}")
+            st.session_state.job_id = job_queue.submit(video_url)  # returns the running job if already queued
+            st.session_state.processed = False
+
+    job_status()
 
 
 
@@ -165,28 +241,27 @@ if st.session_state.get("processed", False):
 
     try:
         # Load QA system
-        from chat_with_video import load_vectorstore, build_qa_chain
-        with open("current_namespace.txt", "r") as f:
-            namespace = f.read().strip()
+        ctx = st.session_state.ctx
+        namespace = ctx.require_namespace()
         st.success(f"📂 Namespace loaded: {namespace}")
 
-        vectordb = load_vectorstore(namespace)
-        qa_chain = build_qa_chain(vectordb)
+        qa_chain = ctx.qa_chain()  # reused across reruns; built once per session and namespace
 
         # Text input for QA
         question = st.text_input("Type your question here:", key="user_question_input")
         if st.button("💬 Ask Question", key="submit_question"):
-            with st.spinner("🧠 Thinking..."):
-                result = qa_chain({"query": question})
-                st.session_state.chat_history.append((question, result))
-                st.markdown(f"**Answer:** {result}")
+            st.markdown("**Answer:**")
+            answer = qa_chain.stream({"query": question})  # tokens render as the LLM produces them
+            st.write_stream(answer)
+            st.session_state.chat_history.append((question, answer.text, answer.sources))
 
-        # Show full chat history
+        # Show full chat history (with jump-to-timestamp links for each answer)
         if st.session_state.chat_history:
             st.markdown("### 🕘 Chat History")
-            for q, a in reversed(st.session_state.chat_history):
+            for turn, (q, a, sources) in reversed(list(enumerate(st.session_state.chat_history))):
                 st.markdown(f"**Q:** {q}")
                 st.markdown(f"**A:** {a}")
+                show_sources(sources, key_prefix=f"chat{turn}")
                 st.markdown("---")
 
         # Voice QA
@@ -194,10 +269,10 @@ if st.session_state.get("processed", False):
             try:
                 voice_question = listen_to_voice()
                 if voice_question:
-                    with st.spinner("🧠 Thinking..."):
-                        result = qa_chain({"query": voice_question})
-                        st.session_state.chat_history.append((voice_question, result))
-                        st.markdown(f"**Answer:** {result}")
+                    st.markdown("**Answer:**")
+                    answer = qa_chain.stream({"query": voice_question})
+                    st.write_stream(answer)
+                    st.session_state.chat_history.append((voice_question, answer.text, answer.sources))
             except Exception as e:
                 st.error(f"❌ Voice QA failed: {e}")
 
@@ -209,15 +284,22 @@ if st.session_state.get("processed", False):
         if st.button("🧠 Generate Quiz from Video", key="generate_quiz_button"):
             with st.spinner("Generating quiz..."):
                 try:
-                    from quiz_generator import load_transcript, generate_quiz_questions, parse_questions
-                    transcript_text = load_transcript()
-                    raw_quiz = generate_quiz_questions(transcript_text, num_questions=5)
-                    questions = parse_questions(raw_quiz)
+                    from quiz_engine import stream_quiz, as_tuples
+                    # Sections sampled across the whole video; a new seed re-draws from cached pools.
+                    # Each question is shown as soon as it is ready, then the quiz is kept in timeline order.
+                    quiz, preview = [], st.empty()
+                    for question in stream_quiz(ctx, num_questions=5, seed=time.time_ns()):
+                        quiz.append(question)
+                        preview.markdown("\n\n".join(f"⏳ **Q{i + 1}:** {q['question']}" for i, q in enumerate(quiz)))
+                    preview.empty()
+                    quiz.sort(key=lambda q: q["start"] or 0)
+                    questions = as_tuples(quiz)
 
                     if not questions:
                         st.error("❌ Failed to generate quiz questions.")
                     else:
                         st.session_state.generated_questions = questions
+                        st.session_state.quiz_sources = [{"text": q["question"], "start": q["start"]} for q in quiz]
                         st.session_state.quiz_submitted = False
                         st.session_state.quiz_score = 0
                         st.session_state.quiz_answers = [""] * len(questions)
@@ -251,6 +333,7 @@ if st.session_state.get("processed", False):
                     mark = "✅" if o.startswith(correct) else "❌" if o.startswith(st.session_state.quiz_answers[i]) else ""
                     st.markdown(f"- {o} {mark}")
                 st.markdown(f"🟢 Correct Answer: {correct}")
+                show_sources(st.session_state.get("quiz_sources", [])[i:i + 1], key_prefix=f"quiz{i}")  # jump to the section
                 st.markdown("---")
 
 
@@ -262,12 +345,13 @@ if st.session_state.get("processed", False):
 
         if st.button("🧾 Generate Summary", key="generate_summary_button"):
             try:
-                transcript, namespace = load_transcript()
-                summary = summarize_transcript(transcript)
-                st.session_state.summary_text = summary
+                transcript, namespace = load_transcript(ctx)
+                st.markdown("📄 **Summary:**")
+                summary = stream_summary(transcript)  # map/reduce runs silently, then the final summary streams token by token
+                st.write_stream(summary)
+                st.session_state.summary_text = summary.text
                 st.session_state.video_title = namespace.replace("_", " ").title()
-                st.success("✅ Summary generated:")
-                st.text_area("📄 Summary:", summary, height=250)
+                st.success("✅ Summary generated")
             except Exception as e:
                 st.error(f"❌ Failed to summarize: {e}")
 
@@ -294,7 +378,7 @@ if st.session_state.get("processed", False):
         # feat: Show extracted keywords from transcript
         # ------------------------------------------------------------------------
         if st.button("🔑 Show Keywords"):
-            keyword_explorer()
+            keyword_explorer(ctx)
 
     except Exception as e:
         st.error(f"❌ QA system failed: {e}")
@@ -302,3 +386,37 @@ if st.session_state.get("processed", False):
 # If not yet processed
 else:
     st.info("📌 Please process a video to start asking questions.")
+
+
+
+# ------------------------------------------------------------------------
+# ui: Sidebar cache statistics (hit ratio and memory per cache)
+# ------------------------------------------------------------------------
+with st.sidebar.expander("⚙️ Cache stats"):
+    all_stats = cache_stats()
+    if get_answer_cache() is not None:
+        all_stats["answers"] = get_answer_cache().stats()
+    for name, stats in all_stats.items():
+        st.markdown(
+            f"**{name}**: {stats['hit_ratio']:.0%} hits "
+            f"({stats['hits']}/{stats['hits'] + stats['misses']}), "
+            f"{stats['entries']} entries, {stats['memory_bytes'] / 1024:.0f} KB"
+        )
+    open_namespaces = get_resources().snapshot()
+    st.markdown(f"**qa resources**: {len(open_namespaces)} namespaces, "
+                f"{sum(open_namespaces.values())} session chains")
+
+
+
+# ------------------------------------------------------------------------
+# ui: Sidebar streaming latency (time to first token vs. full response)
+# ------------------------------------------------------------------------
+with st.sidebar.expander("⏱️ Response latency"):
+    stream_stats = get_stream_metrics().stats()
+    if not stream_stats:
+        st.markdown("No streamed responses yet.")
+    for feature, stats in stream_stats.items():
+        st.markdown(
+            f"**{feature}**: first token {stats['ttft_p50']:.2f}s p50 / {stats['ttft_p95']:.2f}s p95, "
+            f"full response {stats['total_p50']:.2f}s p50 ({stats['count']} runs)"
+        )
@@ -1,10 +1,9 @@
-from pinecone import Pinecone
-from langchain_community.vectorstores import Pinecone as PineconeVectorStore
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.chat_models import ChatOpenAI
 from langchain.agents import initialize_agent, AgentType
 from keywords_tool import create_keywords_tool
 from quiz_tool import create_quiz_tool
+from session_context import SessionContext, resolve_context
+from token_stream import TokenStream
 import os
 
 
@@ -22,41 +21,37 @@ EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 
 
 # ------------------------------------------------------------------------
-# config: load active namespace from file
+# feat: build an agent scoped to one session's namespace
 # ------------------------------------------------------------------------
-with open("current_namespace.txt", "r") as f:
-    namespace = f.read().strip()  # This defines the scope for vector search
+def build_agent(ctx: SessionContext = None):
+    ctx = resolve_context(ctx)  # falls back to current_namespace.txt for the console script
 
+    # Retriever over the session's vector namespace (Pinecone or local, per VECTOR_BACKEND)
+    retriever = ctx.vectorstore.as_retriever(search_kwargs={"k": 4})
 
+    # Tools (quiz + keyword extraction)
+    quiz_tool = create_quiz_tool()
+    keywords_tool = create_keywords_tool(retriever)
+    tools = [quiz_tool, keywords_tool]
 
-
-# ------------------------------------------------------------------------
-# feat: connect to Pinecone index and prepare retriever
-# ------------------------------------------------------------------------
-pc = Pinecone(api_key=PINECONE_API_KEY)  # Initialize Pinecone client
-index = pc.Index(PINECONE_INDEX_NAME)  # Connect to target index
-embedding = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)  # Load embedding model
-vectorstore = PineconeVectorStore(index, embedding, text_key="text", namespace=namespace)
-retriever = vectorstore.as_retriever(search_kwargs={"k": 4})  # Create retriever from vectorstore
+    llm = ctx.llm or ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0)
+    return initialize_agent(tools, llm, agent=AgentType.OPENAI_FUNCTIONS, verbose=True)
 
 
 
 
 # ------------------------------------------------------------------------
-# feat: initialize tools (quiz + keyword extraction)
+# feat: stream an agent run step by step (tool calls as they start, then the answer)
 # ------------------------------------------------------------------------
-quiz_tool = create_quiz_tool()
-keywords_tool = create_keywords_tool(retriever)
-tools = [quiz_tool, keywords_tool]
-
+def stream_agent(agent, query: str) -> TokenStream:
+    def pieces():
+        for step in agent.stream({"input": query}):
+            for action in step.get("actions", []):
+                yield f"_Using {action.tool}…_\n\n"
+            if "output" in step:
+                yield step["output"]
 
-
-
-# ------------------------------------------------------------------------
-# feat: initialize agent with tools and LLM
-# ------------------------------------------------------------------------
-llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0)
-agent = initialize_agent(tools, llm, agent=AgentType.OPENAI_FUNCTIONS, verbose=True)
+    return TokenStream("agent", pieces())
 
 
 
@@ -64,14 +59,17 @@ agent = initialize_agent(tools, llm, agent=AgentType.OPENAI_FUNCTIONS, verbose=T
 # ------------------------------------------------------------------------
 # cli: run interactive console agent
 # ------------------------------------------------------------------------
-def run_agent_console():
+def run_agent_console(ctx: SessionContext = None):
+    agent = build_agent(ctx)
     print("Agent ready! Type your question or 'exit' to quit.")
     while True:
         query = input("\nYou: ").strip()
         if query.lower() in {"exit", "quit"}:
             break
-        answer = agent.run(query)
-        print(f"\nAgent: {answer}")
+        print("\nAgent: ", end="", flush=True)
+        for piece in stream_agent(agent, query):
+            print(piece, end="", flush=True)
+        print()
 
 if __name__ == "__main__":
     run_agent_console()
@@ -0,0 +1,182 @@
+import os
+import math
+
+import numpy as np
+
+
+# ------------------------------------------------------------------------
+# config: IVF defaults (recall/latency trade-off is mostly nprobe/nlist)
+# ------------------------------------------------------------------------
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))                 # lists scanned per query
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))                   # 0 = auto (≈ 4·√n)
+ANN_QUANTIZATION = os.getenv("ANN_QUANTIZATION", "none")      # none | int8
+ANN_KMEANS_ITERS = 12
+ANN_TRAIN_SAMPLE_PER_LIST = 64                                 # k-means sample size = nlist × this
+ANN_RETRAIN_GROWTH = 4.0                                       # retrain once the index is 4× its training size
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Spherical k-means (cosine) on L2-normalized rows
+# ------------------------------------------------------------------------
+def spherical_kmeans(vectors: np.ndarray, k: int, iters: int = ANN_KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, len(vectors)))
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        if empty.any():  # re-seed empty lists with random points
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Per-vector symmetric int8 quantization (4× smaller than float32)
+# ------------------------------------------------------------------------
+def quantize_int8(vectors: np.ndarray) -> tuple:
+    scales = np.abs(vectors).max(axis=1)
+    scales[scales == 0] = 1.0
+    codes = np.round(vectors / scales[:, None] * 127.0).astype(np.int8)
+    return codes, (scales / 127.0).astype(np.float32)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Inverted-file (IVF) index with incremental inserts and deletes
+# ------------------------------------------------------------------------
+class IVFIndex:
+    def __init__(self, dimension: int, nlist: int = ANN_NLIST, nprobe: int = ANN_NPROBE,
+                 quantization: str = ANN_QUANTIZATION, seed: int = 0):
+        if quantization not in ("none", "int8"):
+            raise ValueError(f"Unknown quantization '{quantization}' (expected 'none' or 'int8')")
+        self.dimension = dimension
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.quantization = quantization
+        self.seed = seed
+        self.centroids = None
+        self.trained_size = 0
+        self._lists = []           # per list: {"keys", "codes", "scales", "alive", "pending"}
+        self._where = {}           # key -> (list, position)
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        nlist = self.nlist or max(1, int(4 * math.sqrt(len(vectors))))
+        sample_size = min(len(vectors), nlist * ANN_TRAIN_SAMPLE_PER_LIST)
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[rng.choice(len(vectors), size=sample_size, replace=False)]
+        self.centroids = spherical_kmeans(sample, nlist, seed=self.seed)
+        self.trained_size = len(vectors)
+        self._lists = [self._empty_list() for _ in range(len(self.centroids))]
+        self._where = {}
+
+    def _empty_list(self) -> dict:
+        code_dtype = np.int8 if self.quantization == "int8" else np.float32
+        return {
+            "keys": [],
+            "codes": np.zeros((0, self.dimension), dtype=code_dtype),
+            "scales": np.zeros(0, dtype=np.float32),
+            "alive": np.zeros(0, dtype=bool),
+            "pending": [],         # (codes, scales) blocks not yet concatenated
+        }
+
+    def _consolidate(self, entry: dict):
+        if entry["pending"]:
+            entry["codes"] = np.concatenate([entry["codes"]] + [c for c, _ in entry["pending"]])
+            entry["scales"] = np.concatenate([entry["scales"]] + [s for _, s in entry["pending"]])
+            entry["alive"] = np.concatenate([entry["alive"], np.ones(sum(len(c) for c, _ in entry["pending"]), dtype=bool)])
+            entry["pending"] = []
+
+    def add(self, keys: list, vectors: np.ndarray):
+        # vectors must be L2-normalized float32 rows
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(keys), self.dimension)
+        if not len(keys):
+            return
+        if not self.trained:
+            self.train(vectors)
+
+        self.remove([key for key in keys if key in self._where])  # re-inserted keys replace old entries
+        assign = np.argmax(vectors @ self.centroids.T, axis=1)
+        if self.quantization == "int8":
+            codes, scales = quantize_int8(vectors)
+        else:
+            codes, scales = vectors, np.ones(len(vectors), dtype=np.float32)
+
+        for c in np.unique(assign):
+            rows = np.flatnonzero(assign == c)
+            entry = self._lists[c]
+            base = len(entry["keys"])
+            for offset, row in enumerate(rows):
+                self._where[keys[row]] = (int(c), base + offset)
+                entry["keys"].append(keys[row])
+            entry["pending"].append((codes[rows], scales[rows]))
+
+    def remove(self, keys: list):
+        for key in keys:
+            location = self._where.pop(key, None)
+            if location is None:
+                continue
+            entry = self._lists[location[0]]
+            self._consolidate(entry)
+            entry["alive"][location[1]] = False
+
+    def needs_rebuild(self) -> bool:
+        # Rebuild when the data outgrew the trained centroids or too many slots are tombstones
+        if not self.trained:
+            return False
+        slots = sum(len(entry["keys"]) for entry in self._lists)
+        return len(self) > ANN_RETRAIN_GROWTH * max(1, self.trained_size) or slots > 2 * max(1, len(self))
+
+    def search(self, query: np.ndarray, k: int, nprobe: int = None) -> list:
+        if not self.trained or not len(self):
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        coarse = self.centroids @ query
+        probes = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+
+        candidate_keys, candidate_scores = [], []
+        for c in probes:
+            entry = self._lists[c]
+            self._consolidate(entry)
+            if not len(entry["keys"]):
+                continue
+            if self.quantization == "int8":
+                scores = (entry["codes"].astype(np.float32) @ query) * entry["scales"]
+            else:
+                scores = entry["codes"] @ query
+            scores = np.where(entry["alive"], scores, -np.inf)
+            take = min(k, len(scores))
+            top = np.argpartition(-scores, take - 1)[:take]
+            for row in top:
+                if np.isfinite(scores[row]):
+                    candidate_keys.append(entry["keys"][row])
+                    candidate_scores.append(float(scores[row]))
+
+        order = np.argsort(-np.asarray(candidate_scores))[:k] if candidate_scores else []
+        return [(candidate_keys[i], candidate_scores[i]) for i in order]
+
+    def memory_bytes(self) -> int:
+        total = self.centroids.nbytes if self.trained else 0
+        for entry in self._lists:
+            self._consolidate(entry)
+            total += entry["codes"].nbytes + entry["scales"].nbytes + entry["alive"].nbytes
+        return total
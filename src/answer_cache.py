@@ -0,0 +1,168 @@
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import threading
+
+import numpy as np
+
+
+# ------------------------------------------------------------------------
+# config: Similarity threshold, size bound and storage location
+# ------------------------------------------------------------------------
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))   # cosine similarity of questions
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "256"))  # per namespace
+ANSWER_CACHE_DIR = os.getenv("ANSWER_CACHE_DIR", os.path.join("data", "answer_cache"))
+ANSWER_CACHE_TOUCH_FLUSH_SECONDS = float(os.getenv("ANSWER_CACHE_TOUCH_FLUSH_SECONDS", "30"))  # persist LRU order
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Order-independent hash of the retrieved context set
+# ------------------------------------------------------------------------
+def context_hash(docs) -> str:
+    texts = sorted(doc.page_content for doc in docs)
+    return hashlib.sha1("\x1e".join(texts).encode("utf-8")).hexdigest()
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Per-namespace semantic cache of LLM answers, persisted as JSON
+# ------------------------------------------------------------------------
+class SemanticAnswerCache:
+    def __init__(self, directory: str = ANSWER_CACHE_DIR, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 touch_flush_seconds: float = ANSWER_CACHE_TOUCH_FLUSH_SECONDS):
+        self.directory = directory
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.touch_flush_seconds = touch_flush_seconds
+        self._namespaces = {}          # namespace -> {"entries": [...], "vectors": ndarray}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, namespace: str) -> str:
+        safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", namespace) or "__default__"
+        return os.path.join(self.directory, f"{safe}.json")
+
+    def _load(self, namespace: str) -> dict:
+        state = self._namespaces.get(namespace)
+        if state is not None:
+            return state
+        entries = []
+        try:
+            with open(self._path(namespace), "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+        state = {"entries": entries, "vectors": self._stack(entries), "saved_at": time.monotonic(),
+                 "dirty": False}
+        self._namespaces[namespace] = state
+        return state
+
+    @staticmethod
+    def _stack(entries: list) -> np.ndarray:
+        if not entries:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.asarray([e["vector"] for e in entries], dtype=np.float32)
+
+    def _save(self, namespace: str, state: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(namespace)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state["entries"], f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+        state["saved_at"] = time.monotonic()
+        state["dirty"] = False
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, namespace: str, question_vector, ctx_hash: str):
+        query = self._normalize(question_vector)
+        with self._lock:
+            state = self._load(namespace)
+            if not state["entries"] or state["vectors"].shape[1] != len(query):  # empty, or embedding model changed
+                self.misses += 1
+                return None
+            scores = state["vectors"] @ query
+            # Only answers produced from the same retrieved context are eligible
+            eligible = np.array([e["context_hash"] == ctx_hash for e in state["entries"]])
+            scores = np.where(eligible, scores, -np.inf)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            state["entries"][best]["last_used"] = time.time()
+            state["dirty"] = True
+            # Persist touches (at most once per interval, rest at exit) so LRU order survives restarts
+            if time.monotonic() - state["saved_at"] >= self.touch_flush_seconds:
+                self._save(namespace, state)
+            return state["entries"][best]["answer"]
+
+    def put(self, namespace: str, question: str, question_vector, ctx_hash: str, answer: str):
+        entry = {
+            "question": question,
+            "vector": self._normalize(question_vector).tolist(),
+            "context_hash": ctx_hash,
+            "answer": answer,
+            "last_used": time.time(),
+        }
+        with self._lock:
+            state = self._load(namespace)
+            state["entries"].append(entry)
+            if len(state["entries"]) > self.max_entries:
+                # Evict least recently used answers
+                state["entries"].sort(key=lambda e: e["last_used"], reverse=True)
+                del state["entries"][self.max_entries:]
+            state["vectors"] = self._stack(state["entries"])
+            self._save(namespace, state)
+
+    def flush(self):
+        with self._lock:
+            for namespace, state in self._namespaces.items():
+                if state["dirty"]:
+                    self._save(namespace, state)
+
+    def invalidate(self, namespace: str):
+        with self._lock:
+            self._namespaces.pop(namespace, None)
+            try:
+                os.remove(self._path(namespace))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "namespaces": len(self._namespaces),
+                "entries": sum(len(s["entries"]) for s in self._namespaces.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "memory_bytes": sum(s["vectors"].nbytes for s in self._namespaces.values()),
+            }
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Shared process-wide instance
+# ------------------------------------------------------------------------
+_answer_cache = SemanticAnswerCache()
+atexit.register(_answer_cache.flush)
+
+
+def get_answer_cache():
+    return _answer_cache if ANSWER_CACHE_ENABLED else None
@@ -0,0 +1,410 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from bisect import bisect_right
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+import picone
+from picone import PipelineCancelled
+from pipeline_cache import get_pipeline_cache, extract_video_id
+from streaming_transcriber import transcribe_audio_streaming, TRANSCRIBE_WORKERS
+from transcript_store import Transcript, write_transcript
+from model_registry import get_embeddings, get_whisper_model
+from vector_backend import get_index
+from retrieval_cache import invalidate_namespace
+from resources import get_resources
+from vector_sync import VectorSync
+from segment_chunker import SegmentChunker
+from instrumentation import span
+
+
+# ------------------------------------------------------------------------
+# config: Queue bounds (backpressure) and per-stage concurrency
+# ------------------------------------------------------------------------
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))         # items buffered between two stages
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "2"))               # embed_documents() calls in flight
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", str(picone.UPSERT_MAX_WORKERS)))  # upserts in flight
+CHUNK_WINDOW_CHARS = int(os.getenv("CHUNK_WINDOW_CHARS", "4000"))          # text buffered before splitting
+CANCEL_POLL_SECONDS = 0.2
+_END = object()                                                            # end-of-stream marker
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Incremental character-window chunker over streamed segments (CHUNKER=text)
+# ------------------------------------------------------------------------
+class WindowChunker:
+    def __init__(self, chunk_size: int = picone.CHUNK_SIZE, chunk_overlap: int = picone.CHUNK_OVERLAP,
+                 window_chars: int = CHUNK_WINDOW_CHARS):
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                                       add_start_index=True)
+        self.window_chars = window_chars
+        self._buffer = ""          # text not yet emitted as complete chunks
+        self._offset = 0           # transcript char offset of _buffer[0]
+        self._char_starts = []     # per buffered segment: transcript char offset
+        self._times = []           # per buffered segment: (start, end) seconds
+        self._total_chars = 0
+
+    def add(self, segment: dict) -> list:
+        self._char_starts.append(self._total_chars)
+        self._times.append((segment["start"], segment["end"]))
+        self._buffer += segment["text"]
+        self._total_chars += len(segment["text"])
+        if len(self._buffer) >= self.window_chars:
+            return self._flush(final=False)
+        return []
+
+    def finish(self) -> list:
+        return self._flush(final=True)
+
+    def _flush(self, final: bool) -> list:
+        pieces = [(d.page_content, d.metadata["start_index"]) for d in self.splitter.create_documents([self._buffer])]
+        if not final and len(pieces) > 1:
+            # The last piece may still grow; re-split it with the next window
+            pieces, keep_from = pieces[:-1], pieces[-1][1]
+        else:
+            keep_from = len(self._buffer)
+
+        chunks = []
+        for text, local_start in pieces:
+            char_start = self._offset + local_start
+            first = max(0, bisect_right(self._char_starts, char_start) - 1)
+            last = max(0, bisect_right(self._char_starts, char_start + max(len(text), 1) - 1) - 1)
+            chunks.append({"text": text, "char_start": char_start,
+                           "start": self._times[first][0], "end": self._times[last][1]})
+
+        self._buffer = self._buffer[keep_from:]
+        self._offset += keep_from
+        drop = max(0, bisect_right(self._char_starts, self._offset) - 1)  # keep the segment holding _offset
+        del self._char_starts[:drop], self._times[:drop]
+        return chunks
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Blocking put from a worker thread that gives up once the pipeline stops
+# ------------------------------------------------------------------------
+def _put_from_thread(loop, queue: asyncio.Queue, item, stop: threading.Event):
+    future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+    while True:
+        try:
+            return future.result(timeout=CANCEL_POLL_SECONDS)  # waits while the queue is full (backpressure)
+        except TimeoutError:
+            if stop.is_set():
+                future.cancel()
+                raise PipelineCancelled("Pipeline stopped")
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Unwrap the error that stopped the task groups
+# ------------------------------------------------------------------------
+def first_error(group_error: BaseExceptionGroup) -> BaseException:
+    # Prefer a cancellation request, else the first real failure, from (nested) task groups
+    leaves = []
+    pending = [group_error]
+    while pending:
+        error = pending.pop(0)
+        if isinstance(error, BaseExceptionGroup):
+            pending.extend(error.exceptions)
+        elif not isinstance(error, asyncio.CancelledError):
+            leaves.append(error)
+    cancelled = [e for e in leaves if isinstance(e, PipelineCancelled)]
+    return (cancelled or leaves or [group_error])[0]
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Async pipeline — transcribe → chunk → embed → upload, connected by bounded queues
+# ------------------------------------------------------------------------
+class AsyncPipeline:
+    def __init__(self, video_url: str, use_cache: bool = True, progress=None, cancel_event=None, ctx=None,
+                 index=None, embeddings=None, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 embed_concurrency: int = EMBED_CONCURRENCY, upload_concurrency: int = UPLOAD_CONCURRENCY,
+                 embed_batch_size: int = picone.EMBED_BATCH_SIZE):
+        self.video_url = video_url
+        self.use_cache = use_cache
+        self.progress = progress
+        self.cancel_event = cancel_event
+        self.ctx = ctx
+        self.index = index
+        self.embeddings = embeddings
+        self.queue_size = queue_size
+        self.embed_concurrency = embed_concurrency
+        self.upload_concurrency = upload_concurrency
+        self.embed_batch_size = embed_batch_size
+        self.cache = get_pipeline_cache()
+        self.video_id = extract_video_id(video_url)
+        self.stop = threading.Event()  # tells worker threads to abandon their work
+        self.sync = None  # VectorSync for the namespace, created once the title is known
+        self.stats = {"segments": 0, "chunks": 0, "uploaded": 0, "stage_seconds": {}}
+
+    def report(self, stage: str, fraction: float, message: str = ""):
+        if self.progress:
+            self.progress(stage, min(1.0, max(0.0, fraction)), message)
+
+    async def _watch_cancel(self):
+        while not self.stop.is_set():
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                raise PipelineCancelled("Cancelled by request")
+            await asyncio.sleep(CANCEL_POLL_SECONDS)
+
+    def _timed(self, stage: str, started: float):
+        self.stats["stage_seconds"][stage] = round(time.perf_counter() - started, 3)
+
+    # -- stage: transcription (runs in a worker thread, streams segments out) --------------------
+    def _transcribe_thread(self, loop, segment_queue, workdir: str, duration: float) -> int:
+        audio_path = picone.run_audio_stage(self.cache, self.video_id, self.video_url)
+        self.report("download", 1.0, "Audio ready")
+        output_text_path = os.path.join(workdir, "transcription.txt")
+
+        if not picone.STREAMING_TRANSCRIPTION:
+            segments = get_whisper_model(picone.WHISPER_MODEL_SIZE).transcribe(audio_path)["segments"]
+            write_transcript(output_text_path, segments)
+        else:
+            segments = transcribe_audio_streaming(audio_path, output_text_path=output_text_path,
+                                                  model_size=picone.WHISPER_MODEL_SIZE, workers=TRANSCRIBE_WORKERS)
+        count = 0
+        try:
+            for segment in segments:
+                if self.stop.is_set():
+                    raise PipelineCancelled("Pipeline stopped")
+                _put_from_thread(loop, segment_queue, segment, self.stop)
+                count += 1
+                self.report("transcribe", segment["end"] / duration if duration else 0.0,
+                            f"{count} segments transcribed")
+        finally:
+            if hasattr(segments, "close"):
+                segments.close()  # stops the VAD worker pool when abandoned early
+        return count
+
+    async def transcribe_stage(self, segment_queue, transcript_hit, duration: float):
+        started = time.perf_counter()
+        params = picone.transcript_stage_params()
+        with span("transcribe", model=picone.WHISPER_MODEL_SIZE, audio_seconds=duration,
+                  cache_hit=transcript_hit is not None) as s:
+            if transcript_hit is not None:
+                # Cached transcript: replay its segments into the pipeline
+                transcript = Transcript(os.path.join(transcript_hit["path"], "transcription.txt"))
+                try:
+                    for segment in transcript.segments():
+                        await segment_queue.put(segment)
+                        self.stats["segments"] += 1
+                finally:
+                    transcript.close()
+                cached_path = os.path.join(transcript_hit["path"], "transcription.txt")
+            else:
+                workdir = self.cache.prepare(self.video_id, "transcript", params)
+                loop = asyncio.get_running_loop()
+                count = await asyncio.to_thread(self._transcribe_thread, loop, segment_queue, workdir, duration)
+                self.stats["segments"] = count
+                entry = self.cache.put(self.video_id, "transcript", params,
+                                       {"file": "transcription.txt", "segments": count})
+                cached_path = os.path.join(entry["path"], "transcription.txt")
+            s.set(segments=self.stats["segments"])
+
+        self.final_transcription_path = picone.publish_transcript(cached_path, self.namespace)
+        self.report("transcribe", 1.0, "Transcript ready")
+        await segment_queue.put(_END)
+        self._timed("transcribe", started)
+
+    # -- stage: chunking (cheap, runs on the event loop) -----------------------------------------
+    async def chunk_stage(self, segment_queue, chunk_queue, chunk_params: dict):
+        started = time.perf_counter()
+        chunker = SegmentChunker() if picone.CHUNKER == "segments" else WindowChunker()
+        chunks = []
+        busy = 0.0  # time spent chunking, as opposed to waiting for segments
+
+        async def emit(new_chunks):
+            for chunk in new_chunks:
+                chunk["id"], needs_upload = self.sync.assign(chunk)
+                chunks.append(chunk)
+                if needs_upload:  # unchanged chunks are already in the index
+                    await chunk_queue.put(chunk)
+
+        with span("chunk", chunker=chunk_params["chunker"], cache_hit=False) as s:
+            while True:
+                segment = await segment_queue.get()
+                if segment is _END:
+                    break
+                tick = time.perf_counter()
+                new_chunks = chunker.add(segment)
+                busy += time.perf_counter() - tick
+                await emit(new_chunks)
+            await emit(chunker.finish())
+
+            workdir = self.cache.prepare(self.video_id, "chunks", chunk_params)
+            with open(os.path.join(workdir, "chunks.json"), "w", encoding="utf-8") as f:
+                json.dump([{k: v for k, v in c.items() if k != "id"} for c in chunks], f, ensure_ascii=False)
+            self.cache.put(self.video_id, "chunks", chunk_params, {"count": len(chunks)})
+            s.set(chunks=len(chunks), busy_seconds=round(busy, 6))
+        self.stats["chunks"] = len(chunks)
+        self.report("chunk", 1.0, f"{len(chunks)} chunks")
+
+        for _ in range(self.embed_concurrency):
+            await chunk_queue.put(_END)
+        self._timed("chunk", started)
+
+    async def replay_chunks(self, chunk_entry, chunk_queue):
+        with span("chunk", cache_hit=True) as s:
+            with open(os.path.join(chunk_entry["path"], "chunks.json"), "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            s.set(chunks=len(chunks))
+        self.stats["chunks"] = len(chunks)
+        for chunk in chunks:
+            vector_id, needs_upload = self.sync.assign(chunk)
+            if needs_upload:
+                await chunk_queue.put({**chunk, "id": vector_id})
+        for _ in range(self.embed_concurrency):
+            await chunk_queue.put(_END)
+
+    # -- stage: embedding (batched, several batches in flight) -----------------------------------
+    async def embed_worker(self, chunk_queue, record_queue):
+        done = False
+        while not done:
+            batch = []
+            while len(batch) < self.embed_batch_size:
+                chunk = await chunk_queue.get()
+                if chunk is _END:
+                    done = True
+                    break
+                batch.append(chunk)
+            if not batch:
+                continue
+            with span("embed_batch", chunks=len(batch)) as s:
+                if s:
+                    s.set(chars=sum(len(c["text"]) for c in batch))
+                vectors = await asyncio.to_thread(self.embeddings.embed_documents, [c["text"] for c in batch])
+            for chunk, vector in zip(batch, vectors):
+                await record_queue.put((chunk["id"], vector, picone.chunk_metadata(chunk)))
+
+    async def embed_stage(self, chunk_queue, record_queue):
+        started = time.perf_counter()
+        await asyncio.gather(*(self.embed_worker(chunk_queue, record_queue) for _ in range(self.embed_concurrency)))
+        for _ in range(self.upload_concurrency):
+            await record_queue.put(_END)
+        self._timed("embed", started)
+
+    # -- stage: upload (size-bounded batches with retry) -----------------------------------------
+    async def upload_worker(self, record_queue):
+        done = False
+        while not done:
+            records = []
+            while len(records) < picone.UPSERT_BATCH_SIZE:
+                record = await record_queue.get()
+                if record is _END:
+                    done = True
+                    break
+                records.append(record)
+            for batch in picone.build_upsert_batches(records, max_vectors=picone.UPSERT_BATCH_SIZE):
+                await asyncio.to_thread(self.sync.manifest.mark_pending, [record[0] for record in batch])
+                uploaded = await asyncio.to_thread(picone.upsert_with_retry, self.index, batch, self.namespace)
+                self.stats["uploaded"] += uploaded
+                if self.stats["chunks"]:
+                    self.report("embed", (self.stats["uploaded"] + self.sync.stats["skipped"]) / self.stats["chunks"],
+                                f"{self.stats['uploaded']} chunks uploaded")
+
+    async def upload_stage(self, record_queue):
+        started = time.perf_counter()
+        await asyncio.gather(*(self.upload_worker(record_queue) for _ in range(self.upload_concurrency)))
+        self._timed("upload", started)
+
+    async def embed_upload_stage(self, chunk_queue, record_queue):
+        # One "embed" span over both stages, matching the sequential pipeline's embed + upload step
+        with span("embed", cache_hit=False) as s:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(self.embed_stage(chunk_queue, record_queue))
+                group.create_task(self.upload_stage(record_queue))
+            s.set(uploaded=self.stats["uploaded"])
+
+    # -- orchestration ---------------------------------------------------------------------------
+    async def run(self) -> str:
+        print(" Running YouTube video pipeline (async)...")
+        if not self.use_cache:
+            self.cache.invalidate(self.video_id)
+        chunk_params = picone.chunk_stage_params(chunker="segments" if picone.CHUNKER == "segments" else "window")
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                watcher = group.create_task(self._watch_cancel())
+
+                # Metadata + audio download overlaps with loading the models it will need next
+                self.report("download", 0.0, "Fetching metadata and audio")
+                warm = [asyncio.to_thread(get_embeddings, picone.EMBEDDING_MODEL_NAME)] if self.embeddings is None else []
+                if TRANSCRIBE_WORKERS <= 1 or not picone.STREAMING_TRANSCRIPTION:
+                    warm.append(asyncio.to_thread(get_whisper_model, picone.WHISPER_MODEL_SIZE))
+                started = time.perf_counter()
+                metadata, *models = await asyncio.gather(
+                    asyncio.to_thread(picone.run_metadata_stage, self.cache, self.video_id, self.video_url), *warm)
+                self._timed("download", started)
+                self.embeddings = self.embeddings or models[0]
+                self.index = self.index or await asyncio.to_thread(get_index)
+                self.namespace = picone.normalize_namespace(metadata["safe_title"])
+                embed_params = picone.embed_stage_params(chunk_params, self.namespace)
+
+                transcript_hit = self.cache.get(self.video_id, "transcript", picone.transcript_stage_params())
+                if transcript_hit is not None and self.cache.get(self.video_id, "embed", embed_params) is not None:
+                    # Everything already uploaded: just republish the transcript
+                    print(f"Cache hit: embed for {self.video_id}")
+                    with span("embed", cache_hit=True):
+                        self.final_transcription_path = picone.publish_transcript(
+                            os.path.join(transcript_hit["path"], "transcription.txt"), self.namespace)
+                    self.report("embed", 1.0, "Vectors already uploaded")
+                else:
+                    await self._run_stages(transcript_hit, chunk_params, embed_params, metadata)
+                chunk_entry = self.cache.get(self.video_id, "chunks", chunk_params)
+                if chunk_entry is not None:
+                    await asyncio.to_thread(picone.publish_lexical_index,
+                                            os.path.join(chunk_entry["path"], "chunks.json"), self.namespace)
+                self.stop.set()
+                watcher.cancel()
+        except BaseExceptionGroup as group_error:
+            self.stop.set()
+            raise first_error(group_error) from None  # callers see the original failure, not a task group
+
+        print(f"Async pipeline stage times: {self.stats['stage_seconds']}")
+        return picone.finish_workflow(self.namespace, self.final_transcription_path, self.ctx)
+
+    async def _run_stages(self, transcript_hit, chunk_params: dict, embed_params: dict, metadata: dict):
+        segment_queue = asyncio.Queue(maxsize=self.queue_size)
+        chunk_queue = asyncio.Queue(maxsize=self.queue_size)
+        record_queue = asyncio.Queue(maxsize=self.queue_size)
+        chunk_hit = self.cache.get(self.video_id, "chunks", chunk_params) if transcript_hit is not None else None
+        self.sync = VectorSync(self.namespace, self.index, picone.EMBEDDING_MODEL_NAME, full=not self.use_cache)
+        await asyncio.to_thread(self.sync.start)
+
+        async with asyncio.TaskGroup() as group:
+            if chunk_hit is not None:
+                # Chunks are cached: publish the transcript and start embedding right away
+                self.final_transcription_path = picone.publish_transcript(
+                    os.path.join(transcript_hit["path"], "transcription.txt"), self.namespace)
+                group.create_task(self.replay_chunks(chunk_hit, chunk_queue))
+            else:
+                group.create_task(self.transcribe_stage(segment_queue, transcript_hit, metadata.get("duration") or 0))
+                group.create_task(self.chunk_stage(segment_queue, chunk_queue, chunk_params))
+            group.create_task(self.embed_upload_stage(chunk_queue, record_queue))
+
+        print(f"Uploaded {self.stats['uploaded']} chunks (namespace='{self.namespace}').")
+        sync_report = await asyncio.to_thread(self.sync.finish)  # stale vectors go only after the new ones are in
+        invalidate_namespace(self.namespace)  # cached retrievals for this namespace are now stale
+        get_resources().invalidate(self.namespace)  # so is this process's vector store and QA chains
+        self.cache.put(self.video_id, "embed", embed_params, {"uploaded": self.stats["uploaded"], **sync_report})
+        self.report("embed", 1.0, f"Vectors uploaded ({sync_report['skipped']} unchanged chunks skipped)")
+
+
+
+
+# ------------------------------------------------------------------------
+# main: Synchronous entry point used by picone.main_workflow
+# ------------------------------------------------------------------------
+def run_workflow(video_url: str, use_cache: bool = True, progress=None, cancel_event=None, ctx=None, **options) -> str:
+    pipeline = AsyncPipeline(video_url, use_cache=use_cache, progress=progress, cancel_event=cancel_event,
+                             ctx=ctx, **options)
+    return asyncio.run(pipeline.run())
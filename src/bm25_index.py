@@ -0,0 +1,222 @@
+import os
+import re
+import json
+import threading
+from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from vector_backend import backend_id
+from instrumentation import span, bind_context
+
+
+# ------------------------------------------------------------------------
+# config: BM25 parameters, fusion settings and index location
+# ------------------------------------------------------------------------
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"      # fuse BM25 with dense results in QA
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", os.path.join("data", "bm25"))
+BM25_K1 = 1.5                                                     # term-frequency saturation
+BM25_B = 0.75                                                     # document-length normalization
+RRF_K = 60                                                        # reciprocal rank fusion damping constant
+BM25_MIN_SCORE_RATIO = 0.5                                        # drop lexical hits scoring under half the best
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))     # results taken from each leg before fusion
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,'\-][a-z0-9]+)*")     # keeps 3.5, gpt-4, o'neil as one token
+
+_loaded = {}                                                      # namespace -> (mtime, BM25Index)
+_loaded_lock = threading.Lock()
+_legs = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid")
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Tokenizer shared by indexing and querying, stored chunk fields
+# ------------------------------------------------------------------------
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def chunk_fields(chunk: dict) -> dict:
+    # The fields a vector hit carries as metadata (what QA sources and citations use)
+    return {key: chunk[key] for key in ("text", "start", "end", "char_start", "char_end") if chunk.get(key) is not None}
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Compact inverted index (CSR postings: term → doc ids + term frequencies)
+# ------------------------------------------------------------------------
+class BM25Index:
+    def __init__(self, terms: list, offsets: np.ndarray, postings: np.ndarray, frequencies: np.ndarray,
+                 doc_lengths: np.ndarray, docs: list):
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.terms = terms
+        self.offsets = offsets            # postings of term i: offsets[i]:offsets[i + 1]
+        self.postings = postings          # int32 chunk numbers
+        self.frequencies = frequencies    # uint16 term counts
+        self.doc_lengths = doc_lengths
+        self.docs = docs                  # chunk metadata (text, start, end, ...)
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, chunks: list) -> "BM25Index":
+        docs = [chunk_fields(chunk) if isinstance(chunk, dict) else {"text": chunk} for chunk in chunks]
+        term_postings = {}
+        doc_lengths = np.zeros(len(docs), dtype=np.int32)
+        for doc_number, doc in enumerate(docs):
+            counts = {}
+            tokens = tokenize(doc["text"])
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            doc_lengths[doc_number] = len(tokens)
+            for token, count in counts.items():
+                term_postings.setdefault(token, []).append((doc_number, count))
+
+        terms = sorted(term_postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(term_postings[term]) for term in terms])
+        postings = np.empty(int(offsets[-1]), dtype=np.int32)
+        frequencies = np.empty(int(offsets[-1]), dtype=np.uint16)
+        for i, term in enumerate(terms):
+            entries = term_postings[term]
+            postings[offsets[i]:offsets[i + 1]] = [doc_number for doc_number, _ in entries]
+            frequencies[offsets[i]:offsets[i + 1]] = [min(count, 65535) for _, count in entries]
+        return cls(terms, offsets, postings, frequencies, doc_lengths, docs)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = json.dumps({"terms": self.terms, "docs": self.docs}, ensure_ascii=False).encode("utf-8")
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, offsets=self.offsets, postings=self.postings, frequencies=self.frequencies,
+                                doc_lengths=self.doc_lengths, meta=np.frombuffer(meta, dtype=np.uint8))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            return cls(meta["terms"], data["offsets"], data["postings"], data["frequencies"],
+                       data["doc_lengths"], meta["docs"])
+
+    def search(self, query: str, k: int) -> list:
+        # (doc, score) pairs for the k best-scoring chunks that share at least one term with the query
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        total = len(self.docs)
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            lo, hi = self.offsets[term_id], self.offsets[term_id + 1]
+            docs, tf = self.postings[lo:hi], self.frequencies[lo:hi].astype(np.float32)
+            idf = np.log(1.0 + (total - (hi - lo) + 0.5) / ((hi - lo) + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_lengths[docs] / max(self.avg_length, 1.0))
+            scores[docs] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.docs[i], float(scores[i])) for i in matched]
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Per-namespace index files (built at ingestion, reloaded when rebuilt)
+# ------------------------------------------------------------------------
+def index_path(namespace: str) -> str:
+    backend = re.sub(r"[^A-Za-z0-9_.-]+", "_", backend_id())
+    return os.path.join(BM25_INDEX_DIR, backend, f"{namespace or '__default__'}.npz")
+
+
+def build_namespace_index(namespace: str, chunks: list) -> BM25Index:
+    index = BM25Index.build(chunks)
+    index.save(index_path(namespace))
+    with _loaded_lock:
+        _loaded.pop(namespace, None)
+    print(f"BM25 index for '{namespace}': {len(index.docs)} chunks, {len(index.terms)} terms.")
+    return index
+
+
+def get_namespace_index(namespace: str):
+    # None when the namespace was ingested before BM25 indexes existed (dense-only retrieval then)
+    path = index_path(namespace)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _loaded_lock:
+        cached = _loaded.get(namespace)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    index = BM25Index.load(path)
+    with _loaded_lock:
+        _loaded[namespace] = (mtime, index)
+    return index
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Hybrid retrieval — dense and BM25 legs in parallel, merged by reciprocal rank fusion
+# ------------------------------------------------------------------------
+def doc_key(text: str, start) -> tuple:
+    return text.strip(), start
+
+
+def rrf_fuse(ranked_lists: list, k: int) -> list:
+    # Each list holds (key, doc) in rank order; a doc's score is the sum of 1 / (RRF_K + rank)
+    scores, docs = {}, {}
+    for ranked in ranked_lists:
+        for rank, (key, doc) in enumerate(ranked, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+
+def hybrid_retrieve(vectordb, namespace: str, query: str, k: int = 4, embeddings=None,
+                    candidates: int = HYBRID_CANDIDATES) -> list:
+    from retrieval_cache import cached_retrieve
+    candidates = max(k, candidates)
+
+    def lexical_leg():
+        with span("bm25_search") as s:
+            index = get_namespace_index(namespace)
+            hits = index.search(query, candidates) if index is not None else []
+            # Hits far below the best one only share filler words; fusing them would just echo the dense leg
+            hits = [(chunk, score) for chunk, score in hits if score >= BM25_MIN_SCORE_RATIO * hits[0][1]]
+            s.set(hits=len(hits))
+            return hits
+
+    with span("hybrid_retrieval", namespace=namespace, k=k):
+        dense = _legs.submit(bind_context(cached_retrieve), vectordb, namespace, query, candidates, embeddings)
+        lexical = _legs.submit(bind_context(lexical_leg))
+
+        dense_ranked = [(doc_key(doc.page_content, doc.metadata.get("start")), doc) for doc in dense.result()]
+        lexical_ranked = [(doc_key(chunk["text"], chunk.get("start")), chunk_document(chunk))
+                          for chunk, _ in lexical.result()]
+        if not lexical_ranked:
+            return [doc for _, doc in dense_ranked[:k]]
+        return rrf_fuse([dense_ranked, lexical_ranked], k)
+
+
+def chunk_document(chunk: dict) -> Document:
+    # Same shape as a vector store hit, so sources and context hashing treat both legs alike
+    return Document(page_content=chunk["text"], metadata=chunk_fields(chunk))
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: LangChain retriever over hybrid_retrieve (for RetrievalQA-style chains)
+# ------------------------------------------------------------------------
+class HybridRetriever(BaseRetriever):
+    vectordb: Any
+    namespace: str = ""
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> list:
+        return hybrid_retrieve(self.vectordb, self.namespace, query, k=self.k)
@@ -0,0 +1,230 @@
+# bulk_ingest.py
+#
+# Command-line bulk ingestion of playlists, channels and URL lists:
+#   python src/bulk_ingest.py "https://www.youtube.com/playlist?list=..." --workers 2
+#   python src/bulk_ingest.py --file urls.txt --transcribe-workers 4 --run course-2024
+# Progress is checkpointed per video; re-running the same command resumes where it stopped.
+
+import os
+import re
+import sys
+import json
+import time
+import shlex
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+# ------------------------------------------------------------------------
+# config: Checkpoint location and default pool sizes
+# ------------------------------------------------------------------------
+BULK_INGEST_DIR = os.getenv("BULK_INGEST_DIR", os.path.join("data", "bulk_ingest"))
+BULK_VIDEO_WORKERS = int(os.getenv("BULK_VIDEO_WORKERS", "2"))   # videos processed concurrently
+COLLECTION_PATTERN = re.compile(r"[?&]list=|/playlist\b|/@[^/]+|/channel/|/c/|/user/")
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Expand playlists / channels / URL files into individual video URLs
+# ------------------------------------------------------------------------
+def is_collection_url(url: str) -> bool:
+    # watch?v=...&list=... is one video opened from a playlist; ingest just that video
+    return "watch?v=" not in url and bool(COLLECTION_PATTERN.search(url))
+
+
+def list_collection(url: str, ytdlp_cmd: str) -> list:
+    # --flat-playlist lists entries without resolving (or downloading) each video
+    result = subprocess.run(shlex.split(ytdlp_cmd) + ["--flat-playlist", "-J", url],
+                            capture_output=True, text=True, check=True)
+    info = json.loads(result.stdout)
+    urls = []
+    for entry in info.get("entries") or []:
+        if entry.get("_type") == "playlist" or entry.get("entries"):
+            urls.extend(list_collection(entry.get("url") or entry["webpage_url"], ytdlp_cmd))  # channel tabs
+            continue
+        video_url = entry.get("url") or entry.get("webpage_url")
+        if not video_url or not video_url.startswith("http"):
+            video_url = f"https://www.youtube.com/watch?v={entry['id']}"
+        urls.append(video_url)
+    print(f"Expanded {url} → {len(urls)} videos")
+    return urls
+
+
+def expand_sources(sources: list, url_files: list = (), ytdlp_cmd: str = "yt-dlp") -> list:
+    from pipeline_cache import extract_video_id
+
+    pending = list(sources)
+    for path in url_files:
+        with open(path, "r", encoding="utf-8") as f:
+            pending.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith("#"))
+
+    videos, seen = [], set()
+    for source in pending:
+        try:
+            urls = list_collection(source, ytdlp_cmd) if is_collection_url(source) else [source]
+        except (subprocess.CalledProcessError, ValueError) as e:
+            print(f"⚠️ Could not expand {source}: {e}")
+            continue
+        for url in urls:
+            video_id = extract_video_id(url)
+            if video_id not in seen:  # the same video in two playlists is ingested once
+                seen.add(video_id)
+                videos.append((video_id, url))
+    return videos
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Per-video checkpoint file (atomic JSON rewrite after every change)
+# ------------------------------------------------------------------------
+class Checkpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.videos = {}
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.videos = json.load(f).get("videos", {})
+
+    def get(self, video_id: str) -> dict:
+        with self._lock:
+            return dict(self.videos.get(video_id, {}))
+
+    def update(self, video_id: str, **fields):
+        with self._lock:
+            self.videos.setdefault(video_id, {}).update(fields, updated_at=time.time())
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"videos": self.videos}, f, indent=2, ensure_ascii=False)
+            os.replace(self.path + ".tmp", self.path)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Throughput report (videos/hour, audio-seconds per wall-clock second)
+# ------------------------------------------------------------------------
+def throughput_report(results: list, wall_seconds: float) -> dict:
+    done = [r for r in results if r["status"] == "done"]
+    audio_seconds = sum(r.get("audio_seconds") or 0 for r in done)
+    return {
+        "videos_total": len(results),
+        "videos_done": len(done),
+        "videos_skipped": sum(r["status"] == "skipped" for r in results),
+        "videos_failed": sum(r["status"] == "failed" for r in results),
+        "wall_seconds": round(wall_seconds, 2),
+        "videos_per_hour": round(len(done) * 3600 / wall_seconds, 2) if wall_seconds else 0.0,
+        "audio_seconds": round(audio_seconds, 1),
+        "audio_seconds_per_second": round(audio_seconds / wall_seconds, 2) if wall_seconds else 0.0,
+    }
+
+
+
+
+# ------------------------------------------------------------------------
+# main: Schedule videos on a bounded pool; stage pools come from the pipeline settings
+# ------------------------------------------------------------------------
+def ingest(videos: list, checkpoint: Checkpoint, workers: int = BULK_VIDEO_WORKERS,
+           retry_failed: bool = False, workflow=None) -> dict:
+    from picone import main_workflow, PipelineCancelled
+    from pipeline_cache import get_pipeline_cache
+    from session_context import SessionContext
+    workflow = workflow or main_workflow
+    cancel_event = threading.Event()
+
+    def run_one(video_id: str, url: str) -> dict:
+        state = checkpoint.get(video_id)
+        if state.get("status") == "done" or (state.get("status") == "failed" and not retry_failed):
+            return {"video_id": video_id, "status": "skipped"}
+
+        started = time.perf_counter()
+        checkpoint.update(video_id, url=url, status="running", stage=None)
+        progress = lambda stage, fraction, message="": checkpoint.update(video_id, stage=stage,
+                                                                       stage_progress=round(fraction, 3))
+        ctx = SessionContext()  # one per video: concurrent videos never share (or write) a namespace file
+        try:
+            workflow(url, progress=progress, cancel_event=cancel_event, ctx=ctx)
+        except PipelineCancelled:
+            checkpoint.update(video_id, status="interrupted")  # picked up again on the next run
+            return {"video_id": video_id, "status": "interrupted"}
+        except Exception as e:
+            print(f"❌ {url}: {e}")
+            checkpoint.update(video_id, status="failed", error=str(e))
+            return {"video_id": video_id, "status": "failed"}
+        finally:
+            ctx.close()
+
+        metadata = get_pipeline_cache().get(video_id, "metadata", {})
+        audio_seconds = (metadata or {}).get("value", {}).get("duration") or 0
+        namespace = ctx.namespace
+        seconds = round(time.perf_counter() - started, 2)
+        checkpoint.update(video_id, status="done", namespace=namespace, seconds=seconds,
+                          audio_seconds=audio_seconds, error=None)
+        print(f"✅ {url} ({seconds}s for {audio_seconds}s of audio)")
+        return {"video_id": video_id, "status": "done", "audio_seconds": audio_seconds}
+
+    started = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+    futures = [pool.submit(run_one, video_id, url) for video_id, url in videos]
+    try:
+        for finished, future in enumerate(as_completed(futures), start=1):
+            future.result()
+            print(f"[{finished}/{len(videos)}] videos finished")
+    except KeyboardInterrupt:
+        print("Interrupted: stopping running videos (progress is checkpointed)...")
+        cancel_event.set()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    results = [f.result() for f in futures if f.done() and not f.cancelled()]
+    return throughput_report(results, time.perf_counter() - started)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Bulk-ingest YouTube playlists, channels or URL lists.")
+    parser.add_argument("sources", nargs="*", help="video, playlist or channel URLs")
+    parser.add_argument("--file", action="append", default=[], help="text file with one URL per line")
+    parser.add_argument("--run", default="default", help="checkpoint name; reuse it to resume")
+    parser.add_argument("--workers", type=int, default=BULK_VIDEO_WORKERS, help="videos processed concurrently")
+    parser.add_argument("--transcribe-workers", type=int, help="Whisper processes per video")
+    parser.add_argument("--upload-workers", type=int, help="concurrent upsert requests per video")
+    parser.add_argument("--embed-concurrency", type=int, help="embedding batches in flight per video")
+    parser.add_argument("--retry-failed", action="store_true", help="retry videos that failed previously")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv if argv is not None else sys.argv[1:])
+    if not args.sources and not args.file:
+        print("Nothing to ingest: pass URLs and/or --file.")
+        return 2
+
+    # Stage pool sizes are read at import time by the pipeline modules
+    for option, env in (("transcribe_workers", "TRANSCRIBE_WORKERS"), ("upload_workers", "UPSERT_MAX_WORKERS"),
+                        ("embed_concurrency", "EMBED_CONCURRENCY")):
+        if getattr(args, option) is not None:
+            os.environ[env] = str(getattr(args, option))
+    from picone import YTDLP_CMD
+
+    videos = expand_sources(args.sources, args.file, YTDLP_CMD)
+    checkpoint = Checkpoint(os.path.join(BULK_INGEST_DIR, f"{args.run}.json"))
+    print(f"Ingesting {len(videos)} videos with {args.workers} worker(s); checkpoint: {checkpoint.path}")
+
+    report = ingest(videos, checkpoint, workers=args.workers, retry_failed=args.retry_failed)
+    os.makedirs(BULK_INGEST_DIR, exist_ok=True)  # not created yet if no video was expanded
+    report_path = os.path.join(BULK_INGEST_DIR, f"{args.run}_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print("\n Throughput report:")
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    return 1 if report["videos_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,16 @@
 import os
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.chat_models import ChatOpenAI
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain.memory import ConversationBufferWindowMemory
 from langsmith import traceable
+from model_registry import get_embeddings
+from vector_backend import get_vectorstore
+from retrieval_cache import CachedEmbeddings, cached_retrieve
+from bm25_index import HYBRID_RETRIEVAL, hybrid_retrieve
+from answer_cache import get_answer_cache, context_hash
+from token_stream import TokenStream, message_pieces
+from instrumentation import span
 
 
 # ------------------------------------------------------------------------
@@ -26,29 +30,40 @@ PINECONE_INDEX_NAME = os.environ["PINECONE_INDEX_NAME"]  # Dynamic index retriev
 
 
 # ------------------------------------------------------------------------
-# feat: load Pinecone vector store and prepare embedding model
+# feat: load vector store (Pinecone or local, per VECTOR_BACKEND) and prepare embedding model
 # ------------------------------------------------------------------------
 def load_vectorstore(namespace):
-    pc = Pinecone(api_key=os.environ["PINECONE_API_KEY"])  # Initialize Pinecone client
-    index = pc.Index(PINECONE_INDEX_NAME)  # Connect to specified Pinecone index
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)  # Load embedding model
-
-    vectordb = PineconeVectorStore(
-        index=index,
-        embedding=embeddings,
-        namespace=namespace,
-        text_key="text"
-    )
+    embeddings = get_embeddings(EMBEDDING_MODEL_NAME)  # Shared embedding model (loaded once per process)
+    vectordb = get_vectorstore(namespace, embeddings)  # Same backend the ingestion pipeline wrote to
     return vectordb  # Return ready-to-use vector store
 
 
 
 
+# ------------------------------------------------------------------------
+# util: Source reference (text + video timestamps) for a retrieved chunk
+# ------------------------------------------------------------------------
+def source_from_doc(doc):
+    return {
+        "text": doc.page_content,
+        "start": doc.metadata.get("start"),
+        "end": doc.metadata.get("end"),
+    }
+
+
+
+
 # ------------------------------------------------------------------------
 # feat: build LangChain-based QA system with retriever and memory
 # ------------------------------------------------------------------------
-def build_qa_chain(vectordb):
-    retriever = vectordb.as_retriever(search_kwargs={"k": 4})  # Define retriever with top-4 matches
+def new_memory():
+    return ConversationBufferWindowMemory(k=3, return_messages=True)  # Retain last 3 interactions
+
+
+def build_qa_chain(vectordb, namespace=None, llm=None, answer_cache="default", memory=None):
+    # Retrieval goes through the query-embedding and top-k caches (invalidated on re-ingestion)
+    namespace = namespace if namespace is not None else getattr(vectordb, "_namespace", "")
+    query_embeddings = CachedEmbeddings(vectordb.embeddings)
 
     # Prompt structure to ensure strict use of transcript context
     system_msg = (
@@ -62,20 +77,72 @@ def build_qa_chain(vectordb):
         HumanMessagePromptTemplate.from_template("Context:\n{context}\n\nQuestion:\n{question}")
     ])
 
-    llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0)  # Load deterministic LLM
-    memory = ConversationBufferWindowMemory(k=3, return_messages=True)  # Retain last 3 interactions
+    llm = llm or ChatOpenAI(model="gpt-3.5-turbo", temperature=0)  # Load deterministic LLM (injectable for offline use)
+    answer_cache = get_answer_cache() if answer_cache == "default" else answer_cache  # None disables
+    memory = memory if memory is not None else new_memory()  # per-session memory when shared resources build the chain
     document_chain = create_stuff_documents_chain(llm=llm, prompt=prompt)  # Create chain with prompt and LLM
 
+    def retrieve(query):
+        if HYBRID_RETRIEVAL:  # Top-4 chunks by fused dense + BM25 rank (exact names, numbers, jargon)
+            return hybrid_retrieve(vectordb, namespace, query, k=4, embeddings=query_embeddings)
+        return cached_retrieve(vectordb, namespace, query, k=4, embeddings=query_embeddings)  # Top-4 chunks
+
+    def lookup(query, docs):
+        # Reuse a stored answer for a near-identical question over the same retrieved context
+        if answer_cache is None:
+            return None, None, None
+        question_vector = query_embeddings.embed_query(query)  # cached, no extra model call
+        ctx_hash = context_hash(docs)
+        return answer_cache.lookup(namespace, question_vector, ctx_hash), question_vector, ctx_hash
+
+    def chain_inputs(query, docs):
+        return {"question": query, "context": docs, "chat_history": memory.load_memory_variables({})["history"]}
+
     # chore: enable LangSmith tracking for the QA function
     @traceable(name="qa_chain")
     def qa_chain(inputs):
-        docs = retriever.invoke(inputs["query"])  # Retrieve relevant chunks
-        return document_chain.invoke({
-            "question": inputs["query"],
-            "context": docs,
-            "chat_history": memory.load_memory_variables({})["history"]
-        })
-
+        with span("qa", namespace=namespace) as s:
+            docs = retrieve(inputs["query"])
+            answer, question_vector, ctx_hash = lookup(inputs["query"], docs)
+            s.set(cache_hit=answer is not None)
+            if answer is None:
+                with span("llm", feature="qa"):
+                    answer = document_chain.invoke(chain_inputs(inputs["query"], docs))
+                if answer_cache is not None:
+                    answer_cache.put(namespace, inputs["query"], question_vector, ctx_hash, answer)
+            memory.save_context({"input": inputs["query"]}, {"output": answer})
+        if inputs.get("return_sources"):
+            # Timestamps come from chunk metadata written at ingestion time
+            return {"answer": answer, "sources": [source_from_doc(doc) for doc in docs]}
+        return answer
+
+    # feat: streaming variant — tokens as the LLM produces them; sources filled in once retrieved
+    def stream_qa(inputs):
+        sources = []
+
+        def pieces():
+            with span("qa", namespace=namespace, streamed=True) as s:
+                docs = retrieve(inputs["query"])
+                sources.extend(source_from_doc(doc) for doc in docs)
+                answer, question_vector, ctx_hash = lookup(inputs["query"], docs)
+                s.set(cache_hit=answer is not None)
+                if answer is not None:
+                    yield answer  # cached answers arrive in one piece
+                else:
+                    parts = []
+                    with span("llm", feature="qa", streamed=True) as llm_span:
+                        for piece in message_pieces(document_chain.stream(chain_inputs(inputs["query"], docs))):
+                            parts.append(piece)
+                            yield piece
+                        llm_span.set(pieces=len(parts))
+                    answer = "".join(parts)
+                    if answer_cache is not None:
+                        answer_cache.put(namespace, inputs["query"], question_vector, ctx_hash, answer)
+                memory.save_context({"input": inputs["query"]}, {"output": answer})
+
+        return TokenStream("qa", pieces(), sources=sources)
+
+    qa_chain.stream = stream_qa  # for s in qa_chain.stream({"query": q}) / async for s in ...
     return qa_chain  # Return callable QA chain function
 
 
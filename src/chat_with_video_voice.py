@@ -1,11 +1,11 @@
 # chat_with_video_voice.py
 
 import os
-from pinecone import Pinecone
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_pinecone import Pinecone as PineconeVectorStore
 from langchain.chat_models import ChatOpenAI
 from langchain.chains import RetrievalQA
+from model_registry import get_embeddings
+from vector_backend import get_vectorstore
+from bm25_index import HYBRID_RETRIEVAL, HybridRetriever
 
 # ------------------------------------------------------------------------
 # config: define embedding model and index name
@@ -19,18 +19,11 @@ OPENAI_API_KEY = "<OPENAI_API_KEY>"          # replace with secure source
 
 
 # ------------------------------------------------------------------------
-# feat: load Pinecone vector store with HuggingFace embeddings
+# feat: load vector store (Pinecone or local, per VECTOR_BACKEND) with HuggingFace embeddings
 # ------------------------------------------------------------------------
 def load_vectorstore(namespace):
-    pc = Pinecone(api_key=PINECONE_API_KEY)  # initialize Pinecone client
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)  # use specified embedding model
-
-    vectordb = PineconeVectorStore(
-        index_name=PINECONE_INDEX_NAME,
-        embedding=embeddings,
-        namespace=namespace,
-        text_key="text"
-    )
+    embeddings = get_embeddings(EMBEDDING_MODEL_NAME)  # shared embedding model from the registry
+    vectordb = get_vectorstore(namespace, embeddings)  # same backend as ingestion
     return vectordb  # return ready-to-query vector store
 
 
@@ -46,9 +39,14 @@ def build_qa_chain(vectordb):
         openai_api_key=OPENAI_API_KEY
     )  # initialize LLM with deterministic response style
 
+    if HYBRID_RETRIEVAL:  # top 4 chunks by fused dense + BM25 rank
+        retriever = HybridRetriever(vectordb=vectordb, namespace=getattr(vectordb, "_namespace", ""), k=4)
+    else:
+        retriever = vectordb.as_retriever(search_kwargs={"k": 4})  # retrieve top 4 relevant chunks
+
     qa_chain = RetrievalQA.from_chain_type(
         llm=llm,
-        retriever=vectordb.as_retriever(search_kwargs={"k": 4}),  # retrieve top 4 relevant chunks
+        retriever=retriever,
         return_source_documents=False
     )
     return qa_chain  # return fully initialized QA pipeline
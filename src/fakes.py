@@ -0,0 +1,208 @@
+import math
+import re
+import time
+import hashlib
+import threading
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+
+
+# ------------------------------------------------------------------------
+# config: Offline stand-ins for Pinecone and the embedding model
+# ------------------------------------------------------------------------
+FAKE_EMBEDDING_DIM = 384  # matches all-MiniLM-L6-v2 output
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Cosine similarity for plain Python lists
+# ------------------------------------------------------------------------
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if not norm_a or not norm_b:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Deterministic bag-of-words embeddings (no model download needed)
+# ------------------------------------------------------------------------
+class HashEmbeddings:
+    def __init__(self, dimension: int = FAKE_EMBEDDING_DIM):
+        self.dimension = dimension
+        self.document_calls = 0  # number of embed_documents() round trips
+        self.query_calls = 0     # number of embed_query() round trips
+
+    def _embed(self, text: str) -> list:
+        vector = [0.0] * self.dimension
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            slot = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[slot] += 1.0 if digest[4] % 2 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: list) -> list:
+        self.document_calls += 1
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> list:
+        self.query_calls += 1
+        return self._embed(text)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: In-memory index mimicking the subset of the Pinecone Index API we use
+# ------------------------------------------------------------------------
+class InMemoryIndex:
+    def __init__(self, fail_times: int = 0):
+        self._namespaces = {}             # namespace -> {id: (vector, metadata)}
+        self._lock = threading.Lock()
+        self._fail_times = fail_times     # simulate transient upsert failures
+        self.upsert_calls = 0             # successful upsert round trips
+
+    def upsert(self, vectors, namespace: str = ""):
+        with self._lock:
+            if self._fail_times > 0:
+                self._fail_times -= 1
+                raise ConnectionError("Simulated transient upsert failure")
+
+            store = self._namespaces.setdefault(namespace, {})
+            for item in vectors:
+                if isinstance(item, dict):
+                    vector_id, values, metadata = item["id"], item["values"], item.get("metadata", {})
+                else:
+                    vector_id, values, metadata = (tuple(item) + ({},))[:3]
+                store[vector_id] = (list(values), dict(metadata or {}))
+            self.upsert_calls += 1
+            return {"upserted_count": len(vectors)}
+
+    def fetch(self, ids, namespace: str = ""):
+        store = self._namespaces.get(namespace, {})
+        return {
+            "vectors": {
+                i: {"id": i, "values": store[i][0], "metadata": store[i][1]}
+                for i in ids if i in store
+            }
+        }
+
+    def delete(self, ids=None, delete_all: bool = False, namespace: str = ""):
+        with self._lock:
+            if delete_all:
+                self._namespaces.pop(namespace, None)
+                return {}
+            store = self._namespaces.get(namespace, {})
+            for vector_id in ids or []:
+                store.pop(vector_id, None)
+            return {}
+
+    def query(self, vector, top_k: int = 4, namespace: str = "", include_metadata: bool = True, **kwargs):
+        store = self._namespaces.get(namespace, {})
+        scored = sorted(
+            ((_cosine(vector, values), vector_id, metadata) for vector_id, (values, metadata) in store.items()),
+            key=lambda item: item[0],
+            reverse=True
+        )[:top_k]
+        matches = []
+        for score, vector_id, metadata in scored:
+            match = {"id": vector_id, "score": score}
+            if include_metadata:
+                match["metadata"] = metadata
+            matches.append(match)
+        return {"matches": matches, "namespace": namespace}
+
+    def describe_index_stats(self):
+        namespaces = {ns: {"vector_count": len(store)} for ns, store in self._namespaces.items()}
+        return {
+            "dimension": FAKE_EMBEDDING_DIM,
+            "namespaces": namespaces,
+            "total_vector_count": sum(n["vector_count"] for n in namespaces.values())
+        }
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Fake chat model that replays canned answers and counts calls
+# ------------------------------------------------------------------------
+class FakeChatModel(FakeListChatModel):
+    calls: int = 0
+
+    def _call(self, *args, **kwargs):
+        self.calls += 1
+        return super()._call(*args, **kwargs)
+
+
+def make_fake_llm(responses: list = None) -> FakeChatModel:
+    return FakeChatModel(responses=responses or ["This is a fake answer from the video."])
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Fake streaming chat model (word-sized chunks with configurable latency)
+# ------------------------------------------------------------------------
+class FakeStreamingChatModel(FakeChatModel):
+    first_token_delay: float = 0.0  # seconds before the first chunk (simulated time to first token)
+    token_delay: float = 0.0        # seconds between chunks
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        response = self.responses[self.i]
+        self.i = self.i + 1 if self.i < len(self.responses) - 1 else 0
+        time.sleep(self.first_token_delay)
+        for i, word in enumerate(re.findall(r"\s*\S+\s*", response)):
+            if i and self.token_delay:
+                time.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+
+def make_fake_streaming_llm(responses: list = None, first_token_delay: float = 0.0,
+                            token_delay: float = 0.0) -> FakeStreamingChatModel:
+    return FakeStreamingChatModel(responses=responses or ["This is a fake answer from the video."],
+                                  first_token_delay=first_token_delay, token_delay=token_delay)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Fake Whisper model (timestamped segments sized to the audio, optional real-time factor)
+# ------------------------------------------------------------------------
+FAKE_WHISPER_WORDS = ("the model attention layer token vector query answer video transcript embedding index "
+                      "search result chunk segment speaker example data training loss gradient batch").split()
+
+
+class FakeWhisperModel:
+    def __init__(self, real_time_factor: float = 0.0, segment_seconds: float = 4.0, words_per_second: float = 2.5):
+        self.real_time_factor = real_time_factor  # seconds of "decoding" per second of audio
+        self.segment_seconds = segment_seconds
+        self.words_per_second = words_per_second
+        self.calls = 0
+
+    def transcribe(self, audio, **kwargs) -> dict:
+        if isinstance(audio, str):
+            from streaming_transcriber import load_pcm
+            audio = load_pcm(audio)
+        self.calls += 1
+        seconds = len(audio) / 16000
+        time.sleep(seconds * self.real_time_factor)
+
+        # Same audio length, same words: transcripts (and their chunk hashes) are reproducible
+        seed = int(hashlib.md5(str(len(audio)).encode("utf-8")).hexdigest()[:8], 16)
+        segments, start = [], 0.0
+        while start < seconds:
+            end = min(seconds, start + self.segment_seconds)
+            count = max(1, int((end - start) * self.words_per_second))
+            words = [FAKE_WHISPER_WORDS[(seed + int(start * 7) + i * 13) % len(FAKE_WHISPER_WORDS)] for i in range(count)]
+            segments.append({"start": round(start, 3), "end": round(end, 3), "text": " " + " ".join(words) + "."})
+            start = end
+        return {"text": "".join(s["text"] for s in segments), "segments": segments}
@@ -0,0 +1,366 @@
+import os
+import sys
+import json
+import time
+import itertools
+import atexit
+import argparse
+import threading
+import functools
+import contextvars
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# ------------------------------------------------------------------------
+# config: Tracing switch, span log location and optional /metrics endpoint
+# ------------------------------------------------------------------------
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "0") == "1"           # off: span() returns a shared no-op object
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join("data", "traces", "spans.jsonl"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))                # > 0: serve Prometheus text on :port/metrics
+TRACE_FLUSH_EVERY = 64                                            # buffered span lines per file write
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+METRIC_PREFIX = "yva"
+
+_enabled = False
+_current = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)                                    # with the pid: unique across processes sharing a log
+_recorder = None
+_server = None
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Spans (duration, sizes, cache hits; nested through contextvars)
+# ------------------------------------------------------------------------
+class Span:
+    __slots__ = ("name", "attrs", "trace", "id", "parent", "video", "started", "wall", "duration", "error")
+
+    def __init__(self, name: str, attrs: dict):
+        parent = _current.get()
+        self.name = name
+        self.attrs = attrs
+        self.id = f"{os.getpid():x}-{next(_span_ids):x}"
+        self.parent = parent
+        self.trace = parent.trace if parent is not None else self.id
+        # Every span in a video's pipeline run carries its ID, so stages can be totalled per video
+        self.video = attrs.get("video") or (parent.video if parent is not None else None)
+        self.duration = None
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key: str, amount=1):
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def __bool__(self):
+        return True
+
+    def __enter__(self):
+        _current.set(self)
+        self.wall = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        # set() rather than reset(token): generator spans may be resumed from another context
+        _current.set(self.parent)
+        if _recorder is not None:
+            _recorder.record(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "trace": self.trace, "id": self.id,
+                "parent": self.parent.id if self.parent is not None else None, "video": self.video,
+                "start": round(self.wall, 6), "duration": round(self.duration, 6), "error": self.error,
+                "attrs": self.attrs}
+
+
+class NullSpan:
+    # Returned while tracing is off; falsy so callers can skip computing expensive attributes
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, key: str, amount=1):
+        pass
+
+    def __bool__(self):
+        return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name: str, **attrs):
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, attrs)
+
+
+def traced(name: str, **attrs):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name, dict(attrs)):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bind_context(fn):
+    # Thread pools don't copy contextvars; bound callables keep their spans under the caller's
+    if not _enabled:
+        return fn
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def record_usage(active_span, message):
+    # Token counts when the provider reports them (LangChain usage_metadata)
+    usage = getattr(message, "usage_metadata", None)
+    if active_span and usage:
+        active_span.set(input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0))
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Recorder (JSON lines + in-memory aggregates for Prometheus)
+# ------------------------------------------------------------------------
+class SpanRecorder:
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self._lines = []
+        self._lock = threading.Lock()
+        self._durations = {}   # span name -> [bucket counts..., +Inf count], sum
+        self._errors = {}      # span name -> count
+        self._cache = {}       # (span name, "hit" | "miss") -> count
+        self._sizes = {}       # (span name, attribute) -> sum of numeric attribute values
+
+    def record(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str) if self.path else None
+        with self._lock:
+            self._aggregate(span.name, span.duration, span.error, span.attrs)
+            if line is not None:
+                self._lines.append(line)
+            if span.parent is None or len(self._lines) >= TRACE_FLUSH_EVERY:
+                self._flush_locked()  # root spans end a pipeline run or a request: write it out
+
+    def record_logged(self, logged: dict):
+        # Aggregate a span read back from a JSON-lines log
+        with self._lock:
+            self._aggregate(logged["name"], logged["duration"], logged.get("error"), logged["attrs"])
+
+    def _aggregate(self, name: str, duration: float, error, attrs: dict):
+        counts, total = self._durations.get(name, ([0] * (len(DURATION_BUCKETS) + 1), 0.0))
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                counts[i] += 1
+        counts[-1] += 1
+        self._durations[name] = (counts, total + duration)
+        if error:
+            self._errors[name] = self._errors.get(name, 0) + 1
+        for key, value in attrs.items():
+            if key == "cache_hit":
+                result = "hit" if value else "miss"
+                self._cache[(name, result)] = self._cache.get((name, result), 0) + 1
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                self._sizes[(name, key)] = self._sizes.get((name, key), 0) + value
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._lines or not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(self._lines) + "\n")
+        self._lines = []
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            durations = {name: (list(counts), total) for name, (counts, total) in self._durations.items()}
+            errors, cache, sizes = dict(self._errors), dict(self._cache), dict(self._sizes)
+
+        p = METRIC_PREFIX
+        lines = [f"# HELP {p}_span_seconds Span duration by pipeline stage / request step",
+                 f"# TYPE {p}_span_seconds histogram"]
+        for name, (counts, total) in sorted(durations.items()):
+            for bound, count in zip(DURATION_BUCKETS, counts):
+                lines.append(f'{p}_span_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'{p}_span_seconds_bucket{{span="{name}",le="+Inf"}} {counts[-1]}')
+            lines.append(f'{p}_span_seconds_sum{{span="{name}"}} {total:.6f}')
+            lines.append(f'{p}_span_seconds_count{{span="{name}"}} {counts[-1]}')
+        lines += [f"# HELP {p}_span_errors_total Spans that ended with an exception",
+                  f"# TYPE {p}_span_errors_total counter"]
+        lines += [f'{p}_span_errors_total{{span="{name}"}} {count}' for name, count in sorted(errors.items())]
+        lines += [f"# HELP {p}_cache_total Cache lookups recorded on spans",
+                  f"# TYPE {p}_cache_total counter"]
+        lines += [f'{p}_cache_total{{span="{name}",result="{result}"}} {count}'
+                  for (name, result), count in sorted(cache.items())]
+        lines += [f"# HELP {p}_span_size_total Summed size attributes (audio seconds, chunks, tokens, bytes)",
+                  f"# TYPE {p}_span_size_total counter"]
+        lines += [f'{p}_span_size_total{{span="{name}",field="{key}"}} {value}'
+                  for (name, key), value in sorted(sizes.items())]
+        return "\n".join(lines) + "\n"
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Turn tracing on/off at runtime (env TRACE_ENABLED=1 does this at import)
+# ------------------------------------------------------------------------
+def enable(path: str = TRACE_FILE, metrics_port: int = METRICS_PORT) -> SpanRecorder:
+    global _enabled, _recorder
+    if _recorder is None or _recorder.path != path:
+        if _recorder is not None:
+            _recorder.flush()
+        _recorder = SpanRecorder(path)
+    _enabled = True
+    if metrics_port:
+        serve_metrics(metrics_port)
+    return _recorder
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    if _recorder is not None:
+        _recorder.flush()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def get_recorder():
+    return _recorder
+
+
+def prometheus_text() -> str:
+    return _recorder.prometheus_text() if _recorder is not None else ""
+
+
+@atexit.register
+def _flush_at_exit():
+    if _recorder is not None:
+        _recorder.flush()
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Prometheus-style text endpoint (GET /metrics on a daemon thread)
+# ------------------------------------------------------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the console
+
+
+def serve_metrics(port: int = METRICS_PORT):
+    global _server
+    if _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on port {port}: {e}")  # e.g. another Streamlit worker has it
+        return None
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    print(f"Serving metrics on http://localhost:{port}/metrics")
+    return _server
+
+
+if TRACE_ENABLED:
+    enable()
+
+
+
+
+# ------------------------------------------------------------------------
+# cli: Per-video stage breakdown from a span log (which stage dominates)
+# ------------------------------------------------------------------------
+def load_spans(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def stage_breakdown(spans: list) -> dict:
+    # video -> {"runs", "wall": seconds of its workflow spans, "stages": {name: {count, seconds, errors, cache_hits, sizes}}}
+    videos = {}
+    for s in spans:
+        if not s.get("video"):
+            continue
+        video = videos.setdefault(s["video"], {"runs": 0, "wall": 0.0, "stages": {}})
+        if s["name"] == "workflow":
+            video["runs"] += 1
+            video["wall"] += s["duration"]
+            continue
+        stage = video["stages"].setdefault(s["name"], {"count": 0, "seconds": 0.0, "errors": 0,
+                                                       "cache_hits": 0, "sizes": {}})
+        stage["count"] += 1
+        stage["seconds"] += s["duration"]
+        stage["errors"] += bool(s.get("error"))
+        stage["cache_hits"] += bool(s["attrs"].get("cache_hit"))
+        for key, value in s["attrs"].items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                stage["sizes"][key] = stage["sizes"].get(key, 0) + value
+    return videos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-video stage timings from a span log")
+    parser.add_argument("path", nargs="?", default=TRACE_FILE)
+    parser.add_argument("--video", help="only this video ID")
+    parser.add_argument("--prometheus", action="store_true", help="print aggregate metrics instead")
+    args = parser.parse_args(argv)
+
+    spans = load_spans(args.path)
+    if args.prometheus:
+        recorder = SpanRecorder(path=None)
+        for logged in spans:
+            recorder.record_logged(logged)
+        sys.stdout.write(recorder.prometheus_text())
+        return
+
+    for video, breakdown in stage_breakdown(spans).items():
+        if args.video and video != args.video:
+            continue
+        wall = breakdown["wall"]
+        print(f"\n{video}: {breakdown['runs']} run(s), {wall:.2f}s end to end")
+        for name, stage in sorted(breakdown["stages"].items(), key=lambda item: -item[1]["seconds"]):
+            # Async stages overlap, so shares can add up to more than 100%
+            share = f"{100 * stage['seconds'] / wall:5.1f}%" if wall else "    -"
+            sizes = ", ".join(f"{key}={value:g}" for key, value in sorted(stage["sizes"].items()))
+            print(f"  {name:<12} {stage['seconds']:9.3f}s {share}  x{stage['count']:<4} "
+                  f"hits={stage['cache_hits']} errors={stage['errors']}  {sizes}")
+
+
+if __name__ == "__main__":
+    main()
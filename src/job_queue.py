@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline_cache import extract_video_id
+from session_context import SessionContext
+
+
+# ------------------------------------------------------------------------
+# config: Job store location, worker pool size and stage weights
+# ------------------------------------------------------------------------
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join("data", "jobs.db"))
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "2"))          # videos processed concurrently
+STAGE_WEIGHTS = {"download": 0.15, "transcribe": 0.55, "chunk": 0.05, "embed": 0.25}  # share of overall progress
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))  # owners refresh their active jobs
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "120"))         # no heartbeat this long = owner gone
+ACTIVE_STATUSES = ("queued", "running")
+FINAL_STATUSES = ("done", "failed", "cancelled", "interrupted")
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Overall progress from the current stage and its own fraction
+# ------------------------------------------------------------------------
+def overall_progress(stage: str, fraction: float) -> float:
+    done = 0.0
+    for name, weight in STAGE_WEIGHTS.items():
+        if name == stage:
+            return done + weight * fraction
+        done += weight
+    return done
+
+
+def owner_alive(owner: str) -> bool:
+    # Owners are "<host>:<pid>"; only processes on this host can be checked directly
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True  # unknown here: rely on the heartbeat instead
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Persistent job records (SQLite) + bounded worker pool running main_workflow
+# ------------------------------------------------------------------------
+class JobQueue:
+    def __init__(self, db_path: str = JOB_DB_PATH, max_workers: int = JOB_MAX_WORKERS, runner=None):
+        self.db_path = db_path
+        self._runner = runner                     # defaults to picone.main_workflow (imported lazily)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._cancel_events = {}                  # job_id -> threading.Event (live jobs only)
+        self._lock = threading.Lock()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY, video_id TEXT, url TEXT, status TEXT,
+                    stage TEXT, stage_progress REAL, progress REAL, message TEXT,
+                    result TEXT, error TEXT, created_at REAL, updated_at REAL, namespace TEXT
+                )""")
+            columns = [c["name"] for c in self._db.execute("PRAGMA table_info(jobs)")]
+            if "namespace" not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN namespace TEXT")  # stores from before namespaces
+            if "owner" not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")      # stores from before owners
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_video ON jobs (video_id, created_at)")
+        self.interrupt_orphans()
+
+        # Keep this process's active jobs fresh so other processes sharing the DB leave them alone
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def interrupt_orphans(self) -> int:
+        # Jobs whose owning process is gone (or silent past JOB_STALE_SECONDS) can no longer finish
+        now = time.time()
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "SELECT id, owner, updated_at FROM jobs WHERE status IN ('queued', 'running') AND owner IS NOT ?",
+                (self.owner,)
+            ).fetchall()
+            orphans = [row["id"] for row in rows
+                       if now - (row["updated_at"] or 0) > JOB_STALE_SECONDS or not owner_alive(row["owner"])]
+            self._db.executemany("UPDATE jobs SET status = 'interrupted', updated_at = ? WHERE id = ?",
+                                 [(now, job_id) for job_id in orphans])
+        return len(orphans)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                with self._lock, self._db:
+                    self._db.execute("UPDATE jobs SET updated_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                                     (time.time(), self.owner))
+                self.interrupt_orphans()
+            except sqlite3.Error as e:
+                print(f"Job heartbeat failed: {e}")
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def submit(self, video_url: str, use_cache: bool = True) -> str:
+        video_id = extract_video_id(video_url)
+        with self._lock, self._db:
+            # Deduplicate: a video already queued or running is not submitted twice
+            row = self._db.execute(
+                "SELECT id FROM jobs WHERE video_id = ? AND status IN ('queued', 'running') "
+                "ORDER BY created_at DESC LIMIT 1", (video_id,)
+            ).fetchone()
+            if row is not None:
+                return row["id"]
+
+            job_id = uuid.uuid4().hex[:12]
+            now = time.time()
+            self._db.execute(
+                "INSERT INTO jobs (id, video_id, url, status, stage_progress, progress, message, created_at, updated_at, "
+                "owner) VALUES (?, ?, ?, 'queued', 0, 0, 'Waiting for a worker', ?, ?, ?)",
+                (job_id, video_id, video_url, now, now, self.owner)
+            )
+            self._cancel_events[job_id] = threading.Event()
+
+        self._pool.submit(self._run, job_id, video_url, use_cache)
+        print(f"Job {job_id} queued for video {video_id}")
+        return job_id
+
+    def _run(self, job_id: str, video_url: str, use_cache: bool):
+        from picone import main_workflow, PipelineCancelled
+        runner = self._runner or main_workflow
+        cancel_event = self._cancel_events[job_id]
+        try:
+            if cancel_event.is_set():
+                raise PipelineCancelled("Cancelled before start")
+            self._update(job_id, status="running", message="Starting")
+
+            def progress(stage: str, fraction: float, message: str = ""):
+                self._update(job_id, stage=stage, stage_progress=fraction,
+                             progress=overall_progress(stage, fraction), message=message)
+
+            # Each job gets its own context; sessions read the namespace from the job record
+            ctx = SessionContext()
+            result = runner(video_url, use_cache=use_cache, progress=progress, cancel_event=cancel_event, ctx=ctx)
+            self._update(job_id, status="done", progress=1.0, message="Completed", result=json.dumps(result),
+                         namespace=ctx.namespace)
+            ctx.close()
+        except PipelineCancelled as e:
+            self._update(job_id, status="cancelled", message=str(e))
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self._update(job_id, status="failed", message="Failed", error=str(e))
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+
+    def cancel(self, job_id: str) -> bool:
+        # Takes effect at the next progress checkpoint of the running pipeline
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        self._update(job_id, message="Cancelling...")
+        return True
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def latest_for_video(self, video_url: str):
+        # Lets a reconnected browser find the job it started before disconnecting
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM jobs WHERE video_id = ? ORDER BY created_at DESC LIMIT 1",
+                (extract_video_id(video_url),)
+            ).fetchone()
+        return self.get(row["id"]) if row else None
+
+    def list_jobs(self, limit: int = 20) -> list:
+        with self._lock:
+            rows = self._db.execute("SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self.get(row["id"]) for row in rows]
+
+    def shutdown(self, cancel: bool = True):
+        if cancel:
+            with self._lock:
+                events = list(self._cancel_events.values())
+            for event in events:
+                event.set()
+        self._pool.shutdown(wait=True)
+        self._stop.set()
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Shared process-wide queue (survives Streamlit reruns and reconnects)
+# ------------------------------------------------------------------------
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
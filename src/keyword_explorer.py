@@ -3,7 +3,7 @@
 import re
 import streamlit as st
 from summary_and_email import load_transcript
-from keybert import KeyBERT
+from model_registry import get_keybert
 
 
 
@@ -12,7 +12,7 @@ from keybert import KeyBERT
 # feat: extract top keywords using KeyBERT
 # ------------------------------------------------------------------------
 def extract_keywords(text, num_keywords=5):
-    kw_model = KeyBERT()  # Initialize keyword extraction model
+    kw_model = get_keybert()  # Shared keyword model (reuses the MiniLM embedding weights)
     keywords = kw_model.extract_keywords(text, top_n=num_keywords, stop_words='english')  # Extract keywords
     return [kw[0] for kw in keywords]  # Return only keyword strings
 
@@ -23,12 +23,12 @@ def extract_keywords(text, num_keywords=5):
 # ------------------------------------------------------------------------
 # ui: Streamlit interface to explore keywords from video transcript
 # ------------------------------------------------------------------------
-def keyword_explorer():
+def keyword_explorer(ctx=None):
     st.markdown("### Top 5 Keywords from Video")
 
     try:
         # Load transcript from source
-        transcript, _ = load_transcript()
+        transcript, _ = load_transcript(ctx)
 
         # Clean up whitespace for better keyword extraction
         clean_text = re.sub(r'\s+', ' ', transcript)
@@ -0,0 +1,511 @@
+import os
+import re
+import json
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+from ann_index import IVFIndex
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+
+# ------------------------------------------------------------------------
+# config: Local index layout (one directory per namespace)
+#   vectors.f32     contiguous float32 rows, L2-normalized (cosine = dot product)
+#   records.jsonl   append-only log of {"id", "row", "metadata"} / {"id", "deleted": true}
+#   .lock           held exclusively by whichever process is writing the namespace
+# ------------------------------------------------------------------------
+LOCAL_VECTOR_DIM = 384                   # all-MiniLM-L6-v2
+VECTORS_FILE = "vectors.f32"
+RECORDS_FILE = "records.jsonl"
+LOCK_FILE = ".lock"
+COMPACT_DEAD_RATIO = 0.5                 # rewrite files once half the rows are dead
+
+# Approximate search: per-namespace IVF above a size threshold, plus a cross-video global index
+LOCAL_ANN = os.getenv("LOCAL_ANN", "1") == "1"
+ANN_MIN_VECTORS = int(os.getenv("ANN_MIN_VECTORS", "20000"))   # below this, brute force is faster
+ANN_RERANK_FACTOR = 4                                          # exact re-scoring of k × this candidates
+GLOBAL_NAMESPACE = "__all__"                                   # query every namespace at once
+
+
+
+
+# ------------------------------------------------------------------------
+# util: L2-normalize rows so cosine similarity is a plain dot product
+# ------------------------------------------------------------------------
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Exclusive cross-process file lock (the app, bulk ingestion and job workers share namespaces)
+# ------------------------------------------------------------------------
+@contextmanager
+def exclusive_lock(path: str):
+    with open(path, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: One namespace: memory-mapped vectors + in-memory id/metadata tables
+# ------------------------------------------------------------------------
+class _Namespace:
+    def __init__(self, path: str, dimension: int):
+        self.path = path
+        self.dimension = dimension
+        self.ids = []            # row -> id
+        self.metadata = []       # row -> metadata dict
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_of = {}         # id -> row
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.ann = None          # IVFIndex keyed by row, built lazily for large namespaces
+        self._records_end = 0    # bytes of records.jsonl replayed so far
+        self._records_stat = None
+        os.makedirs(path, exist_ok=True)
+        with self._locked():
+            self._load()
+
+    @property
+    def vectors_path(self):
+        return os.path.join(self.path, VECTORS_FILE)
+
+    @property
+    def records_path(self):
+        return os.path.join(self.path, RECORDS_FILE)
+
+    def _locked(self):
+        return exclusive_lock(os.path.join(self.path, LOCK_FILE))
+
+    def _stat_records(self):
+        try:
+            st = os.stat(self.records_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def _replay(self, start: int) -> tuple:
+        # Apply log records from byte offset `start`: later records win, deletions retire the id's row
+        added, retired = [], []
+        alive = self.alive.tolist()
+        end = start
+        with open(self.records_path, "rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn last line from a crash mid-write: truncated by _load
+                end += len(line)
+                try:
+                    record = json.loads(line) if line.strip() else None
+                except ValueError:
+                    print(f"Skipping unreadable record in {self.records_path}")
+                    continue
+                if record is None:
+                    continue
+                previous = self.row_of.pop(record["id"], None)
+                if previous is not None:
+                    alive[previous] = False
+                    retired.append(previous)
+                if record.get("deleted"):
+                    continue
+                row = record["row"]
+                while len(self.ids) <= row:
+                    self.ids.append(None)
+                    self.metadata.append(None)
+                    alive.append(False)
+                self.ids[row], self.metadata[row] = record["id"], record.get("metadata", {})
+                alive[row] = True
+                self.row_of[record["id"]] = row
+                added.append(row)
+        self.alive = np.asarray(alive, dtype=bool)
+        self._records_end = end
+        return added, retired
+
+    def _load(self):
+        # Full replay; caller holds the lock
+        self.ids, self.metadata, self.row_of = [], [], {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.ann = None
+        self._records_end = 0
+        if os.path.isfile(self.records_path):
+            self._replay(0)
+            if self._records_end < os.path.getsize(self.records_path):
+                with open(self.records_path, "r+b") as f:
+                    f.truncate(self._records_end)
+        self._records_stat = self._stat_records()
+        self._truncate_vectors()
+        self._map_vectors()
+
+    def _refresh_locked(self) -> bool:
+        # Pick up records written by other processes (or by our own append); caller holds the lock
+        stat = self._stat_records()
+        if stat == self._records_stat:
+            return False
+        if stat is None or self._records_stat is None or stat[0] != self._records_stat[0] \
+                or stat[1] < self._records_end:
+            self._load()  # replaced by a compaction (or removed): replay from scratch
+            return True
+        added, retired = self._replay(self._records_end)
+        self._records_stat = self._stat_records()
+        self._map_vectors()
+        if self.ann is not None:  # keep a built ANN index current incrementally
+            self.ann.remove(retired)
+            added = sorted(row for row in set(added) if self.alive[row])  # skip rows retired in the same batch
+            if added:
+                self.ann.add(added, np.asarray(self.vectors[added]))
+        return True
+
+    def refresh(self) -> bool:
+        # Cheap stat on every access; the lock is only taken when records.jsonl changed
+        if self._stat_records() == self._records_stat:
+            return False
+        with self._locked():
+            return self._refresh_locked()
+
+    def _truncate_vectors(self):
+        # Rows written before a crash but never logged in records.jsonl would shift every later row
+        expected = len(self.ids) * self.dimension * 4
+        if os.path.isfile(self.vectors_path) and os.path.getsize(self.vectors_path) > expected:
+            self.vectors = np.zeros((0, self.dimension), dtype=np.float32)  # release the mapping first
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(expected)
+
+    def _map_vectors(self):
+        rows = len(self.ids)
+        if rows and os.path.isfile(self.vectors_path):
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+        else:
+            self.vectors = np.zeros((0, self.dimension), dtype=np.float32)
+
+    def upsert(self, items: list):
+        new_ids, new_vectors, new_meta = [], [], []
+        for vector_id, values, metadata in items:
+            new_ids.append(vector_id)
+            new_vectors.append(values)
+            new_meta.append(metadata or {})
+        matrix = normalize_rows(np.asarray(new_vectors, dtype=np.float32).reshape(len(items), -1))
+        if matrix.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {matrix.shape[1]} does not match index dimension {self.dimension}")
+
+        # Append rows; a re-upserted id gets a fresh row and its old row is retired
+        with self._locked():
+            self._refresh_locked()  # rows another process appended come first
+            self._truncate_vectors()
+            size = os.path.getsize(self.vectors_path) if os.path.isfile(self.vectors_path) else 0
+            first_row = size // (self.dimension * 4)
+            with open(self.vectors_path, "r+b" if size else "wb") as f:
+                f.seek(first_row * self.dimension * 4)  # the row number and the byte offset always agree
+                f.write(matrix.tobytes())
+            with open(self.records_path, "a", encoding="utf-8") as f:
+                for offset, (vector_id, metadata) in enumerate(zip(new_ids, new_meta)):
+                    f.write(json.dumps({"id": vector_id, "row": first_row + offset, "metadata": metadata},
+                                       ensure_ascii=False) + "\n")
+            self._refresh_locked()  # applies our own records (and updates the ANN index)
+            self._maybe_compact()
+        return new_ids, matrix
+
+    def delete(self, ids: list):
+        with self._locked():
+            self._refresh_locked()
+            with open(self.records_path, "a", encoding="utf-8") as f:
+                for vector_id in ids:
+                    if vector_id in self.row_of:
+                        f.write(json.dumps({"id": vector_id, "deleted": True}) + "\n")
+            self._refresh_locked()
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        dead = len(self.ids) - int(self.alive.sum())
+        if dead and dead >= COMPACT_DEAD_RATIO * len(self.ids):
+            self._compact()
+
+    def compact(self):
+        with self._locked():
+            self._refresh_locked()
+            self._compact()
+
+    def _compact(self):
+        # Caller holds the lock; other processes see the new inode and replay from scratch
+        rows = np.flatnonzero(self.alive)
+        vectors = np.array(self.vectors[rows]) if len(rows) else np.zeros((0, self.dimension), dtype=np.float32)
+        ids = [self.ids[r] for r in rows]
+        metadata = [self.metadata[r] for r in rows]
+
+        self.vectors = np.zeros((0, self.dimension), dtype=np.float32)  # release the old mapping first
+        tmp_vectors, tmp_records = self.vectors_path + ".tmp", self.records_path + ".tmp"
+        with open(tmp_vectors, "wb") as f:
+            f.write(vectors.tobytes())
+        with open(tmp_records, "w", encoding="utf-8") as f:
+            for row, (vector_id, meta) in enumerate(zip(ids, metadata)):
+                f.write(json.dumps({"id": vector_id, "row": row, "metadata": meta}, ensure_ascii=False) + "\n")
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_records, self.records_path)
+
+        self.ids, self.metadata = ids, metadata
+        self.alive = np.ones(len(ids), dtype=bool)
+        self.row_of = {vector_id: row for row, vector_id in enumerate(ids)}
+        self.ann = None  # row numbers changed; rebuilt on the next large query
+        self._records_end = os.path.getsize(self.records_path)
+        self._records_stat = self._stat_records()
+        self._map_vectors()
+
+    def ensure_ann(self) -> IVFIndex:
+        if self.ann is None or self.ann.needs_rebuild():
+            rows = np.flatnonzero(self.alive)
+            self.ann = IVFIndex(self.dimension)
+            self.ann.add([int(r) for r in rows], np.asarray(self.vectors[rows]))
+            print(f"Built ANN index over {len(rows)} vectors ({len(self.ann.centroids)} lists).")
+        return self.ann
+
+    def exact_scores(self, rows, query: np.ndarray) -> np.ndarray:
+        return np.asarray(self.vectors[np.asarray(rows, dtype=np.int64)]) @ query
+
+    def query(self, vector, top_k: int, exact: bool = None, nprobe: int = None) -> list:
+        if not len(self.row_of):
+            return []
+        query = normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        if exact is None:
+            exact = not LOCAL_ANN or len(self.row_of) < ANN_MIN_VECTORS
+        if not exact:
+            # Approximate candidates from the IVF index, re-scored exactly against the float32 rows
+            candidates = self.ensure_ann().search(query, top_k * ANN_RERANK_FACTOR, nprobe=nprobe)
+            rows = [row for row, _ in candidates]
+            if rows:
+                scores = self.exact_scores(rows, query)
+                order = np.argsort(-scores)[:top_k]
+                return [(self.ids[rows[i]], float(scores[i]), self.metadata[rows[i]], rows[i]) for i in order]
+            return []
+
+        scores = self.vectors @ query                      # one BLAS matrix-vector product
+        scores = np.where(self.alive, scores, -np.inf)
+        k = min(top_k, len(self.row_of))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[r], float(scores[r]), self.metadata[r], r) for r in top]
+
+    def count(self) -> int:
+        return len(self.row_of)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Local index exposing the subset of the Pinecone Index API we use
+# ------------------------------------------------------------------------
+class LocalVectorIndex:
+    def __init__(self, root: str, dimension: int = LOCAL_VECTOR_DIM):
+        self.root = root
+        self.dimension = dimension
+        self._namespaces = {}
+        self._global_ann = None  # IVFIndex keyed by (namespace, id), built on the first global query
+        self._lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+
+    def _namespace_dir(self, namespace: str) -> str:
+        # Namespaces come from normalize_namespace(), but keep the path safe regardless
+        safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", namespace) or "__default__"
+        return os.path.join(self.root, safe)
+
+    def _get(self, namespace: str, create: bool = True):
+        ns = self._namespaces.get(namespace)
+        if ns is None and (create or os.path.isdir(self._namespace_dir(namespace))):
+            ns = _Namespace(self._namespace_dir(namespace), self.dimension)
+            self._namespaces[namespace] = ns
+            if ns.count():
+                self._global_ann = None  # holds rows another process wrote; rebuilt on the next global query
+        elif ns is not None and ns.refresh():
+            self._global_ann = None  # another process changed this namespace
+        return ns
+
+    def upsert(self, vectors, namespace: str = ""):
+        items = []
+        for item in vectors:
+            if isinstance(item, dict):
+                items.append((item["id"], item["values"], item.get("metadata", {})))
+            else:
+                items.append((tuple(item) + ({},))[:3])
+        if namespace == GLOBAL_NAMESPACE:
+            raise ValueError(f"'{GLOBAL_NAMESPACE}' is a read-only view over all namespaces")
+        with self._lock:
+            ids, matrix = self._get(namespace).upsert(items)
+            if self._global_ann is not None:  # incremental insert as new videos finish ingestion
+                self._global_ann.add([(namespace, vector_id) for vector_id in ids], matrix)
+        return {"upserted_count": len(items)}
+
+    def delete(self, ids=None, delete_all: bool = False, namespace: str = ""):
+        with self._lock:
+            ns = self._get(namespace, create=False)
+            if ns is None:
+                return {}
+            ids = list(ns.row_of) if delete_all else list(ids or [])
+            ns.delete(ids)
+            if self._global_ann is not None:
+                self._global_ann.remove([(namespace, vector_id) for vector_id in ids])
+        return {}
+
+    def fetch(self, ids, namespace: str = ""):
+        with self._lock:
+            ns = self._get(namespace, create=False)
+            vectors = {}
+            for vector_id in ids:
+                row = ns.row_of.get(vector_id) if ns else None
+                if row is not None:
+                    vectors[vector_id] = {"id": vector_id, "values": ns.vectors[row].tolist(),
+                                          "metadata": ns.metadata[row]}
+        return {"vectors": vectors, "namespace": namespace}
+
+    def query(self, vector, top_k: int = 4, namespace: str = "", include_metadata: bool = True,
+              include_values: bool = False, exact: bool = None, nprobe: int = None, **kwargs):
+        with self._lock:
+            if namespace == GLOBAL_NAMESPACE:
+                return self._query_global(vector, top_k, include_metadata, include_values, nprobe)
+            ns = self._get(namespace, create=False)
+            hits = ns.query(vector, top_k, exact=exact, nprobe=nprobe) if ns else []
+            matches = []
+            for vector_id, score, metadata, row in hits:
+                match = {"id": vector_id, "score": score}
+                if include_metadata:
+                    match["metadata"] = metadata
+                if include_values:
+                    match["values"] = ns.vectors[row].tolist()
+                matches.append(match)
+        return {"matches": matches, "namespace": namespace}
+
+    def _ensure_global_ann(self) -> IVFIndex:
+        if self._global_ann is None or self._global_ann.needs_rebuild():
+            keys, blocks = [], []
+            for name in self.list_namespaces():
+                ns = self._get(name, create=False)
+                rows = np.flatnonzero(ns.alive) if ns else []
+                if len(rows):
+                    keys.extend((name, ns.ids[r]) for r in rows)
+                    blocks.append(np.asarray(ns.vectors[rows]))
+            ann = IVFIndex(self.dimension)
+            if keys:
+                ann.add(keys, np.concatenate(blocks))
+            self._global_ann = ann
+            print(f"Built global ANN index over {len(keys)} vectors.")
+        return self._global_ann
+
+    def _query_global(self, vector, top_k, include_metadata, include_values, nprobe):
+        # Cross-video search: IVF candidates, re-scored exactly per namespace
+        query = normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        for name in self.list_namespaces():
+            self._get(name, create=False)  # pick up namespaces other processes created or appended to
+        candidates = self._ensure_global_ann().search(query, top_k * ANN_RERANK_FACTOR, nprobe=nprobe)
+        scored = []
+        for name, vector_id in (key for key, _ in candidates):
+            ns = self._get(name, create=False)
+            row = ns.row_of.get(vector_id) if ns else None
+            if row is not None:
+                scored.append((float(ns.exact_scores([row], query)[0]), name, vector_id, ns, row))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        matches = []
+        for score, name, vector_id, ns, row in scored[:top_k]:
+            match = {"id": vector_id, "score": score, "namespace": name}
+            if include_metadata:
+                match["metadata"] = {**ns.metadata[row], "namespace": name}
+            if include_values:
+                match["values"] = ns.vectors[row].tolist()
+            matches.append(match)
+        return {"matches": matches, "namespace": GLOBAL_NAMESPACE}
+
+    def list_namespaces(self) -> list:
+        with self._lock:
+            on_disk = {name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name))}
+            return sorted(on_disk | set(self._namespaces))
+
+    def describe_index_stats(self):
+        with self._lock:
+            namespaces = {}
+            for name in self.list_namespaces():
+                ns = self._get(name, create=False)
+                namespaces[name] = {"vector_count": ns.count() if ns else 0}
+        return {
+            "dimension": self.dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(n["vector_count"] for n in namespaces.values())
+        }
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: LangChain VectorStore adapter so retrievers work unchanged
+# ------------------------------------------------------------------------
+
+class LocalVectorStore(VectorStore):
+    def __init__(self, index: LocalVectorIndex, embedding, namespace: str = "", text_key: str = "text"):
+        self._index = index
+        self._embedding = embedding
+        self._namespace = namespace
+        self._text_key = text_key
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [f"doc-{self._index.describe_index_stats()['total_vector_count'] + i}" for i in range(len(texts))]
+        vectors = self._embedding.embed_documents(texts)
+        self._index.upsert(
+            vectors=[(i, v, {**m, self._text_key: t}) for i, v, m, t in zip(ids, vectors, metadatas, texts)],
+            namespace=self._namespace
+        )
+        return ids
+
+    def similarity_search_by_vector_with_score(self, embedding, k: int = 4):
+        result = self._index.query(embedding, top_k=k, namespace=self._namespace, include_metadata=True)
+        docs = []
+        for match in result["matches"]:
+            metadata = dict(match["metadata"])
+            text = metadata.pop(self._text_key, "")
+            docs.append((Document(page_content=text, metadata=metadata), match["score"]))
+        return docs
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k)
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1.0) / 2.0  # cosine in [-1, 1] → relevance in [0, 1]
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, index: LocalVectorIndex = None,
+                   namespace: str = "", **kwargs):
+        store = cls(index=index, embedding=embedding, namespace=namespace)
+        store.add_texts(texts, metadatas=metadatas)
+        return store
@@ -0,0 +1,347 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
+
+from token_stream import message_pieces
+from instrumentation import span, bind_context, record_usage
+
+
+# ------------------------------------------------------------------------
+# config: Token budgets, concurrency, rate limit and cache location
+# ------------------------------------------------------------------------
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-3.5-turbo")
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "2500"))      # transcript tokens per map call
+SUMMARY_REDUCE_TOKENS = int(os.getenv("SUMMARY_REDUCE_TOKENS", "3000"))    # partial-summary tokens per reduce call
+SUMMARY_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "4"))           # concurrent LLM calls
+SUMMARY_REQUESTS_PER_MINUTE = float(os.getenv("SUMMARY_REQUESTS_PER_MINUTE", "60"))
+SUMMARY_MAX_RETRIES = 4                                                    # attempts per call before giving up
+SUMMARY_BACKOFF_SECONDS = 1.0                                              # base delay, doubled on each retry
+SUMMARY_CACHE_DIR = os.getenv("SUMMARY_CACHE_DIR", os.path.join("data", "summary_cache"))
+ANCHOR_MODULUS = 4                                                         # ~1 in 4 sentences may end a chunk
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Token counting with tiktoken, falling back to a whitespace estimate
+# ------------------------------------------------------------------------
+def get_token_counter(model: str = SUMMARY_MODEL):
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except ImportError:
+        return lambda text: int(len(text.split()) * 4 / 3) + 1  # ~0.75 words per token for English
+
+
+def model_name(llm) -> str:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+
+def split_sentences(text: str) -> list:
+    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
+    return [s for s in sentences if s]
+
+
+def _hard_split(sentence: str, budget: int, count_tokens) -> list:
+    # A single "sentence" over budget (e.g. unpunctuated ASR output): cut on word boundaries
+    pieces, words = [], []
+    for word in sentence.split():
+        words.append(word)
+        if count_tokens(" ".join(words)) >= budget:
+            pieces.append(" ".join(words))
+            words = []
+    if words:
+        pieces.append(" ".join(words))
+    return pieces
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Content-defined grouping (boundaries depend on content, not position)
+# ------------------------------------------------------------------------
+def content_defined_groups(items: list, sizes: list, budget: int) -> list:
+    # Cut after an "anchor" item once a group is half full, or when the next item would overflow.
+    # An edit then only moves the boundaries next to it, so untouched groups keep their cache keys.
+    groups, current, current_size = [], [], 0
+    for item, size in zip(items, sizes):
+        if current and current_size + size > budget:
+            groups.append(current)
+            current, current_size = [], 0
+        current.append(item)
+        current_size += size
+        anchor = int(hashlib.sha1(item.encode("utf-8")).hexdigest()[:8], 16) % ANCHOR_MODULUS == 0
+        if anchor and current_size >= budget // 2:
+            groups.append(current)
+            current, current_size = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+
+def split_by_tokens(text: str, budget: int = SUMMARY_CHUNK_TOKENS, count_tokens=None) -> list:
+    count_tokens = count_tokens or get_token_counter()
+    sentences = []
+    for sentence in split_sentences(text):
+        if count_tokens(sentence) > budget:
+            sentences.extend(_hard_split(sentence, budget, count_tokens))
+        else:
+            sentences.append(sentence)
+    sizes = [count_tokens(s) + 1 for s in sentences]
+    return [" ".join(group) for group in content_defined_groups(sentences, sizes, budget)]
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Thread-safe request rate limiter (spaces calls to stay under the RPM quota)
+# ------------------------------------------------------------------------
+class RateLimiter:
+    def __init__(self, requests_per_minute: float = SUMMARY_REQUESTS_PER_MINUTE):
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+        self.set_rate(requests_per_minute)
+
+    def set_rate(self, requests_per_minute: float):
+        with self._lock:
+            self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def penalize(self, seconds: float):
+        # A 429 from the provider pushes every waiting caller back, not just the one that hit it
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    # One quota for every summary, quiz and evaluation call in the process, so a 429 slows them all
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "ratelimit" in type(error).__name__.lower() or "rate limit" in str(error).lower()
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: On-disk cache of partial summaries keyed by content hash
+# ------------------------------------------------------------------------
+class SummaryCache:
+    def __init__(self, directory: str = SUMMARY_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts) -> str:
+        return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                value = json.load(f)["summary"]
+            self.hits += 1
+            return value
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+    def put(self, key: str, summary: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"summary": summary}, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+
+
+# ------------------------------------------------------------------------
+# config: Prompts for the map, intermediate reduce and final steps
+# ------------------------------------------------------------------------
+MAP_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessagePromptTemplate.from_template(
+        "You summarize one part of a longer video transcript. Keep the key points, names, numbers and "
+        "conclusions. Use only information from this part."
+    ),
+    HumanMessagePromptTemplate.from_template("Transcript part:\n{text}\n\nSummary of this part:")
+])
+
+REDUCE_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessagePromptTemplate.from_template(
+        "You merge consecutive partial summaries of a video transcript into one summary that keeps "
+        "every important point in order. Use only information from the partial summaries."
+    ),
+    HumanMessagePromptTemplate.from_template("Partial summaries:\n{text}\n\nMerged summary:")
+])
+
+FINAL_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessagePromptTemplate.from_template(
+        "You are a helpful assistant. Summarize the transcript in 5-7 sentences using only the information from the transcript."
+    ),
+    HumanMessagePromptTemplate.from_template("Transcript:\n{text}\n\nSummary:")
+])
+
+
+
+
+def prompt_templates_hash(prompts=None) -> str:
+    # Part of every cache key: editing a prompt must not serve summaries written under the old one
+    templates = [message.prompt.template for prompt in (prompts or (MAP_PROMPT, REDUCE_PROMPT, FINAL_PROMPT))
+                 for message in prompt.messages]
+    return hashlib.sha1("\x1f".join(templates).encode("utf-8")).hexdigest()[:12]
+
+
+PROMPTS_HASH = prompt_templates_hash()
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Hierarchical map-reduce summarizer (concurrent, rate limited, cached)
+# ------------------------------------------------------------------------
+class MapReduceSummarizer:
+    def __init__(self, llm=None, model: str = SUMMARY_MODEL, chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+                 reduce_tokens: int = SUMMARY_REDUCE_TOKENS, max_workers: int = SUMMARY_MAX_WORKERS,
+                 rate_limiter: RateLimiter = None, cache: SummaryCache = None, use_cache: bool = True,
+                 temperature: float = 0.4):
+        if llm is None:
+            from langchain_community.chat_models import ChatOpenAI
+            llm = ChatOpenAI(model=model, temperature=temperature, openai_api_key=os.getenv("OPENAI_API_KEY"))
+        self.llm = llm
+        self.model = model_name(llm)  # cache keys follow the model actually answering, never a default name
+        self.chunk_tokens = chunk_tokens
+        self.reduce_tokens = reduce_tokens
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.cache = (cache or SummaryCache()) if use_cache else None
+        self.count_tokens = get_token_counter(self.model)
+        self.llm_calls = 0
+
+    def _invoke(self, prompt, text: str) -> str:
+        for attempt in range(SUMMARY_MAX_RETRIES):
+            self.rate_limiter.acquire()
+            try:
+                self.llm_calls += 1
+                with span("llm", feature="summary", attempt=attempt + 1) as s:
+                    if s:
+                        s.set(prompt_tokens=self.count_tokens(text))
+                    message = self.llm.invoke(prompt.format_messages(text=text))
+                    record_usage(s, message)
+                return message.content.strip()
+            except Exception as e:
+                if attempt == SUMMARY_MAX_RETRIES - 1:
+                    raise
+                delay = SUMMARY_BACKOFF_SECONDS * (2 ** attempt) * (1 + random.random())
+                if is_rate_limit_error(e):
+                    self.rate_limiter.penalize(delay)
+                print(f"Summary call failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _summarize(self, kind: str, prompt, text: str) -> str:
+        key = SummaryCache.key(self.model, PROMPTS_HASH, kind, text)
+        with span("summary_part", kind=kind) as s:
+            summary = self.cache.get(key) if self.cache else None
+            s.set(cache_hit=summary is not None)
+            if summary is None:
+                summary = self._invoke(prompt, text)
+                if self.cache:
+                    self.cache.put(key, summary)
+            return summary
+
+    def _summarize_all(self, kind: str, prompt, texts: list) -> list:
+        if len(texts) == 1:
+            return [self._summarize(kind, prompt, texts[0])]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            summarize = bind_context(lambda text: self._summarize(kind, prompt, text))
+            return list(pool.map(summarize, texts))
+
+    def _final_input(self, text: str) -> str:
+        if self.count_tokens(text) <= self.chunk_tokens:
+            return text  # short transcripts: one call, as before
+
+        # Map: summarize every transcript chunk concurrently
+        chunks = split_by_tokens(text, self.chunk_tokens, self.count_tokens)
+        partials = self._summarize_all("map", MAP_PROMPT, chunks)
+        print(f"Summarized {len(chunks)} transcript chunks")
+
+        # Reduce: merge neighbouring partials until they fit in one final call
+        while sum(self.count_tokens(p) for p in partials) > self.reduce_tokens and len(partials) > 1:
+            sizes = [self.count_tokens(p) + 1 for p in partials]
+            groups = content_defined_groups(partials, sizes, self.reduce_tokens)
+            if len(groups) == len(partials):  # every partial alone fills the budget; pair them up
+                groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+            partials = self._summarize_all("reduce", REDUCE_PROMPT, ["\n\n".join(g) for g in groups])
+            print(f"Reduced to {len(partials)} partial summaries")
+        return "\n\n".join(partials)
+
+    def summarize(self, text: str) -> str:
+        text = text.strip()
+        if not text:
+            return ""
+        return self._summarize("final", FINAL_PROMPT, self._final_input(text))
+
+    def stream(self, text: str):
+        # Map/reduce calls still run to completion; only the final summary streams token by token
+        text = text.strip()
+        if not text:
+            return
+        final_input = self._final_input(text)
+        key = SummaryCache.key(self.model, PROMPTS_HASH, "final", final_input)
+        summary = self.cache.get(key) if self.cache else None
+        if summary is not None:
+            yield summary
+            return
+
+        parts = []
+        for attempt in range(SUMMARY_MAX_RETRIES):
+            self.rate_limiter.acquire()
+            try:
+                self.llm_calls += 1
+                with span("llm", feature="summary", attempt=attempt + 1, streamed=True) as s:
+                    for piece in message_pieces(self.llm.stream(FINAL_PROMPT.format_messages(text=final_input))):
+                        parts.append(piece)
+                        yield piece
+                    s.set(pieces=len(parts))
+                break
+            except Exception as e:
+                if parts or attempt == SUMMARY_MAX_RETRIES - 1:
+                    raise  # text already shown cannot be taken back; only retry before the first token
+                delay = SUMMARY_BACKOFF_SECONDS * (2 ** attempt) * (1 + random.random())
+                if is_rate_limit_error(e):
+                    self.rate_limiter.penalize(delay)
+                print(f"Summary call failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+        if self.cache:
+            self.cache.put(key, "".join(parts).strip())
@@ -0,0 +1,180 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from whisper_backends import WHISPER_BACKEND, backend_kind, load_int8, load_ctranslate2
+
+
+# ------------------------------------------------------------------------
+# config: Memory budget and optional startup warm-up list
+# ------------------------------------------------------------------------
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "2048"))   # LRU eviction threshold
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "")                                # e.g. "whisper:tiny,embeddings:all-MiniLM-L6-v2"
+DEFAULT_DEVICE = os.getenv("MODEL_DEVICE", "cpu")
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Loaders for each supported model kind (heavy imports stay lazy)
+# ------------------------------------------------------------------------
+def _load_whisper(name, device):
+    import whisper
+    return whisper.load_model(name, device=device)
+
+
+def _load_embeddings(name, device):
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=name, model_kwargs={"device": device})
+
+
+def _load_keybert(name, device):
+    from keybert import KeyBERT
+    # Reuse the sentence-transformer behind the shared embeddings instead of loading a second copy
+    return KeyBERT(model=get_embeddings(name, device=device).client)
+
+
+LOADERS = {
+    "whisper": _load_whisper,
+    "whisper-int8": load_int8,          # dynamic int8 quantized PyTorch (CPU)
+    "whisper-ct2": load_ctranslate2,    # CTranslate2 via faster-whisper
+    "embeddings": _load_embeddings,
+    "keybert": _load_keybert,
+}
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Estimate resident size of a model from its torch parameters
+# ------------------------------------------------------------------------
+def estimate_model_bytes(model, _depth=0) -> int:
+    parameters = getattr(model, "parameters", None)
+    if callable(parameters):
+        try:
+            return sum(p.numel() * p.element_size() for p in parameters())
+        except Exception:
+            pass
+
+    # Wrappers (HuggingFaceEmbeddings.client, KeyBERT.model.embedding_model) hold the module one level down
+    if _depth < 3:
+        for attr in ("client", "model", "embedding_model"):
+            inner = getattr(model, attr, None)
+            if inner is not None and inner is not model:
+                size = estimate_model_bytes(inner, _depth + 1)
+                if size:
+                    return size
+    return 0
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Thread-safe, lazily populated LRU registry of loaded models
+# ------------------------------------------------------------------------
+class ModelRegistry:
+    def __init__(self, memory_budget_mb: int = MODEL_MEMORY_BUDGET_MB, loaders: dict = None):
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self.loaders = dict(loaders or LOADERS)
+        self._models = OrderedDict()    # (kind, name, device) -> (model, size_bytes), oldest first
+        self._lock = threading.Lock()   # guards _models, _key_locks and stats
+        self._key_locks = {}            # one lock per key so a model is only loaded once
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "load_seconds": 0.0}
+
+    def get(self, kind: str, name: str, device: str = DEFAULT_DEVICE):
+        key = (kind, name, device)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._models[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the global lock so other models stay available meanwhile
+        with key_lock:
+            with self._lock:
+                if key in self._models:  # another thread finished loading while we waited
+                    self._models.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return self._models[key][0]
+
+            if kind not in self.loaders:
+                raise ValueError(f"Unknown model kind: {kind}")
+
+            start = time.perf_counter()
+            model = self.loaders[kind](name, device)
+            elapsed = time.perf_counter() - start
+            size = estimate_model_bytes(model)
+            print(f"Loaded {kind} model '{name}' on {device} in {elapsed:.2f}s ({size / 1e6:.0f} MB).")
+
+            with self._lock:
+                self.stats["misses"] += 1
+                self.stats["load_seconds"] += elapsed
+                self._models[key] = (model, size)
+                self._evict_over_budget()
+            return model
+
+    def _evict_over_budget(self):
+        # Drop least recently used models, but never the one just inserted
+        while len(self._models) > 1 and self.memory_bytes() > self.memory_budget_bytes:
+            key, _ = self._models.popitem(last=False)
+            self.stats["evictions"] += 1
+            print(f"Evicted {key[0]} model '{key[1]}' to stay under memory budget.")
+
+    def memory_bytes(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def evict(self, kind: str, name: str, device: str = DEFAULT_DEVICE) -> bool:
+        with self._lock:
+            return self._models.pop((kind, name, device), None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def warm_up(self, specs):
+        # specs: iterable of (kind, name) or (kind, name, device)
+        for spec in specs:
+            kind, name, device = (tuple(spec) + (DEFAULT_DEVICE,))[:3]
+            self.get(kind, name, device)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_ratio": self.stats["hits"] / lookups if lookups else 0.0,
+                "loaded": [f"{k}:{n}@{d}" for k, n, d in self._models],
+                "memory_mb": self.memory_bytes() / 1e6,
+            }
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Process-wide registry and convenience accessors
+# ------------------------------------------------------------------------
+_registry = ModelRegistry()
+
+
+def get_registry() -> ModelRegistry:
+    return _registry
+
+
+def get_whisper_model(model_size: str = "tiny", device: str = DEFAULT_DEVICE, backend: str = None):
+    return _registry.get(backend_kind(backend or WHISPER_BACKEND), model_size, device)
+
+
+def get_embeddings(model_name: str = "all-MiniLM-L6-v2", device: str = DEFAULT_DEVICE):
+    return _registry.get("embeddings", model_name, device)
+
+
+def get_keybert(model_name: str = "all-MiniLM-L6-v2", device: str = DEFAULT_DEVICE):
+    return _registry.get("keybert", model_name, device)
+
+
+def warm_up_from_env(spec: str = MODEL_WARMUP):
+    # Parse "kind:name[,kind:name...]" and preload each model
+    specs = [item.strip().split(":", 1) for item in spec.split(",") if ":" in item]
+    _registry.warm_up(specs)
@@ -1,24 +1,62 @@
 import os
 import re
 import json
+import time
+import shlex
+import shutil
 import subprocess
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
-from pinecone import Pinecone
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-import whisper
+from model_registry import get_whisper_model, get_embeddings
+from pipeline_cache import get_pipeline_cache, extract_video_id
+from streaming_transcriber import transcribe_audio_streaming, TRANSCRIBE_WORKERS
+from whisper_backends import WHISPER_BACKEND, WHISPER_BATCH_SIZE
+from transcript_store import Transcript, write_transcript, segments_path_for
+from vector_backend import get_index, backend_id
+from retrieval_cache import invalidate_namespace
+from resources import get_resources
+from vector_sync import VectorSync
+from segment_chunker import chunk_segments, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
+from bm25_index import build_namespace_index
+from session_context import (SessionContext, resolve_context, write_namespace_file, normalize_namespace,
+                             EMBEDDING_MODEL_NAME)
+from instrumentation import span, bind_context
 
 
 # ------------------------------------------------------------------------
 # config: Load API keys and configuration from environment or defaults
 # ------------------------------------------------------------------------
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")                  # Pinecone API key (required)
-PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "youtube-video-index")  # Vector DB index name
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")                      # OpenAI key (optional for Whisper large)
-EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"                         # HuggingFace embedding model
-PINECONE_CLOUD = "aws"                                            # Pinecone cloud provider
-PINECONE_REGION = "us-east-1"                                     # Pinecone region for serverless
+
+# Batched ingestion settings (embedding + upsert)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))       # chunks per embed_documents() call
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))    # max vectors per upsert request
+UPSERT_MAX_BYTES = 2 * 1024 * 1024                                # Pinecone request payload limit (2 MB)
+# Vector backend (Pinecone or local) is chosen in vector_backend.py via VECTOR_BACKEND
+UPSERT_MAX_WORKERS = int(os.getenv("UPSERT_MAX_WORKERS", "4"))    # concurrent upsert requests
+UPSERT_MAX_RETRIES = 3                                            # attempts per batch before giving up
+UPSERT_BACKOFF_SECONDS = 0.5                                      # base delay, doubled on each retry
+
+# Pipeline stage parameters (also part of the per-stage cache keys)
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "tiny")      # tiny/base/small/medium/large
+STREAMING_TRANSCRIPTION = os.getenv("STREAMING_TRANSCRIPTION", "1") == "1"  # VAD segments on a worker pool
+CHUNKER = os.getenv("CHUNKER", "segments")                        # segments (token budget, timestamps) | text
+CHUNK_SIZE = 400                                                  # characters per chunk (text chunker)
+CHUNK_OVERLAP = 100                                               # characters shared between chunks (text chunker)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "async")               # async (overlapping stages) | sequential
+
+# Audio extraction: one yt-dlp pass; "native" keeps the source stream, "pcm" decodes to 16 kHz mono WAV
+YTDLP_CMD = os.getenv("YTDLP_CMD", "yt-dlp")                      # override with a local stub for offline runs
+AUDIO_MODE = os.getenv("AUDIO_MODE", "native")                    # native | pcm | mp3
+AUDIO_MODE_ARGS = {
+    "native": ["-f", "bestaudio/best"],
+    "pcm": ["-f", "bestaudio/best", "--extract-audio", "--audio-format", "wav",
+            "--postprocessor-args", "ExtractAudio:-ar 16000 -ac 1"],
+    "mp3": ["--extract-audio", "--audio-format", "mp3", "--audio-quality", "7"],
+}
+AUDIO_PARAMS = {"mode": AUDIO_MODE}                               # cache key for the audio stage
 
 # Optional LangSmith observability config
 os.environ["LANGCHAIN_TRACING_V2"] = "true"
@@ -29,34 +67,55 @@ os.environ["LANGCHAIN_PROJECT"] = "pr-grumpy-simple-26"
 
 
 # ------------------------------------------------------------------------
-# feat: Download audio from YouTube video and extract video metadata
+# util: Sanitize a video title for file-safe names
 # ------------------------------------------------------------------------
-def download_audio_from_video(video_url: str) -> tuple:
-    try:
-        # Run yt-dlp to get video info without downloading content
-        result = subprocess.run(
-            ["yt-dlp", "--no-playlist", "--skip-download", "--print-json", video_url],
-            capture_output=True, text=True, check=True
-        )
-        video_info = json.loads(result.stdout)
-        title = video_info.get("title", "downloaded_audio")  # fallback title if missing
-    except Exception as e:
-        raise RuntimeError(f"Failed to fetch video info: {e}")
+def safe_title_from_info(video_info: dict) -> str:
+    title = video_info.get("title") or "downloaded_audio"  # fallback title if missing
+    return re.sub(r'[\\/*?:"<>|]', "_", title).replace(" ", "_")
+
+
 
-    # refactor: Sanitize title for file-safe names
-    safe_title = re.sub(r'[\\/*?:"<>|]', "_", title).replace(" ", "_")
-    output_filename = f"{safe_title}.mp3"
 
-    # feat: Extract audio using yt-dlp and convert to MP3
-    command = [
-        "yt-dlp", "--no-playlist",
-        "--extract-audio", "--audio-format", "mp3", "--audio-quality", "7",
-        "-o", output_filename, video_url
+
+# ------------------------------------------------------------------------
+# feat: Single yt-dlp pass returning video metadata and the audio file together
+# ------------------------------------------------------------------------
+def extract_audio_and_metadata(video_url: str, output_dir: str = ".", mode: str = AUDIO_MODE) -> tuple:
+    if mode not in AUDIO_MODE_ARGS:
+        raise ValueError(f"Unknown audio mode '{mode}' (expected one of {sorted(AUDIO_MODE_ARGS)})")
+
+    os.makedirs(output_dir, exist_ok=True)
+    command = shlex.split(YTDLP_CMD) + [
+        "--no-playlist", "--no-simulate", "--no-progress",
+        "--print", "after_move:%()j",                              # full info JSON once the file is final
+        "-o", os.path.join(output_dir, "%(id)s.%(ext)s"),          # name audio by video ID
+        *AUDIO_MODE_ARGS[mode],
+        video_url
     ]
-    subprocess.run(command, check=True)  # raises error if command fails
-    print(f"Audio saved as: {output_filename}")
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        json_lines = [line for line in result.stdout.splitlines() if line.strip().startswith("{")]
+        video_info = json.loads(json_lines[-1])
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to extract audio: {e.stderr.strip()[-500:] or e}")
+    except (IndexError, ValueError) as e:
+        raise RuntimeError(f"Failed to parse video info: {e}")
+
+    audio_path = video_info.get("filepath") or video_info.get("_filename")
+    if not audio_path or not os.path.isfile(audio_path):
+        raise RuntimeError(f"yt-dlp reported no audio file for {video_url}")
+
+    print(f"Audio saved as: {audio_path}")
+    return video_info, audio_path
 
-    # feat: Save key metadata to JSON file
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Save key video metadata to data/<title>_metadata.json
+# ------------------------------------------------------------------------
+def save_video_metadata(video_info: dict, video_url: str, safe_title: str) -> str:
     metadata = {
         "title": video_info.get("title"),
         "description": video_info.get("description"),
@@ -75,26 +134,36 @@ def download_audio_from_video(video_url: str) -> tuple:
     with open(metadata_path, "w", encoding="utf-8") as f:
         json.dump(metadata, f, indent=2, ensure_ascii=False)
     print(f"Metadata saved to: {metadata_path}")
+    return metadata_path
 
-    return output_filename, safe_title
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Download audio from YouTube video and extract video metadata
+# ------------------------------------------------------------------------
+def download_audio_from_video(video_url: str, output_dir: str = ".", mode: str = AUDIO_MODE) -> tuple:
+    video_info, audio_path = extract_audio_and_metadata(video_url, output_dir, mode)
+    safe_title = safe_title_from_info(video_info)
+    save_video_metadata(video_info, video_url, safe_title)
+    return audio_path, safe_title
 
 
 
 
 
 # ------------------------------------------------------------------------
-# feat: Transcribe MP3 audio file using OpenAI Whisper
+# feat: Transcribe an audio file (any ffmpeg-readable format) using OpenAI Whisper
 # ------------------------------------------------------------------------
 def transcribe_audio(audio_path: str, output_text_path: str = "transcription.txt", model_size: str = "tiny") -> str:
-    print(f"Loading Whisper model: {model_size}...")
-    model = whisper.load_model(model_size)  # can be tiny/base/small/medium/large
+    model = get_whisper_model(model_size)  # can be tiny/base/small/medium/large (loaded once per process)
     print(f"Transcribing audio file: {audio_path}...")
 
-    result = model.transcribe(audio_path)  # returns a dict with 'text'
+    result = model.transcribe(audio_path)  # returns a dict with 'text' and timestamped 'segments'
 
-    # Save transcript to file
-    with open(output_text_path, "w", encoding="utf-8") as f:
-        f.write(result["text"])
+    # Save transcript text plus its segment index (start/end times per segment)
+    write_transcript(output_text_path, result["segments"])
 
     print(f"Transcription completed: {output_text_path}")
     return result["text"]
@@ -106,13 +175,19 @@ def transcribe_audio(audio_path: str, output_text_path: str = "transcription.txt
 # ------------------------------------------------------------------------
 # feat: Split large transcript into overlapping text chunks
 # ------------------------------------------------------------------------
-def split_text_into_chunks(text_path: str, chunk_size: int = 400, chunk_overlap: int = 100) -> list:
+def split_text_into_chunks(text_path: str, chunk_size: int = 400, chunk_overlap: int = 100,
+                           with_offsets: bool = False) -> list:
     with open(text_path, "r", encoding="utf-8") as f:
         text = f.read()
 
     # Use LangChain's RecursiveCharacterTextSplitter to handle large text
-    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    chunks = splitter.split_text(text)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                              add_start_index=with_offsets)
+    if with_offsets:
+        docs = splitter.create_documents([text])
+        chunks = [(doc.page_content, doc.metadata["start_index"]) for doc in docs]
+    else:
+        chunks = splitter.split_text(text)
 
     print(f"Text split into {len(chunks)} chunks.")
     return chunks
@@ -122,46 +197,150 @@ def split_text_into_chunks(text_path: str, chunk_size: int = 400, chunk_overlap:
 
 
 # ------------------------------------------------------------------------
-# feat: Embed transcript chunks and store them in Pinecone vector DB
+# feat: Attach start/end timestamps to chunks via the transcript segment index
 # ------------------------------------------------------------------------
-def embed_chunks_and_upload_to_pinecone(chunks: list, namespace: str):
-    pc = Pinecone(api_key=PINECONE_API_KEY)
+def attach_timestamps(chunks_with_offsets: list, text_path: str) -> list:
+    try:
+        transcript = Transcript(text_path)
+    except FileNotFoundError:
+        transcript = None  # older transcripts have no segment index
+
+    chunks = []
+    for text, char_start in chunks_with_offsets:
+        chunk = {"text": text, "char_start": char_start}
+        if transcript is not None and len(transcript):
+            chunk["start"], chunk["end"] = transcript.time_range(char_start, char_start + len(text))
+        chunks.append(chunk)
+
+    if transcript is not None:
+        transcript.close()
+    return chunks
 
-    # fix: Create index if it doesn't exist yet
-    if PINECONE_INDEX_NAME not in [index.name for index in pc.list_indexes()]:
-        print(f"Creating index '{PINECONE_INDEX_NAME}'...")
-        pc.create_index(
-            name=PINECONE_INDEX_NAME,
-            dimension=384,  # matches embedding output
-            metric="cosine",
-            spec={"serverless": {"cloud": PINECONE_CLOUD, "region": PINECONE_REGION}}
-        )
-        print(f"Index '{PINECONE_INDEX_NAME}' created.")
-    else:
-        print(f"Using existing index '{PINECONE_INDEX_NAME}'.")
 
-    # Initialize index and embedding model
-    index = pc.Index(PINECONE_INDEX_NAME)
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
 
-    # Loop through each chunk, embed, and upload with unique ID
-    for idx, chunk in enumerate(chunks):
-        vector_id = f"chunk-{idx}"
-        vector = embeddings.embed_query(chunk)
-        metadata = {"text": chunk}
-        index.upsert(vectors=[(vector_id, vector, metadata)], namespace=namespace)
 
-    print(f"Uploaded {len(chunks)} chunks to Pinecone (namespace='{namespace}').")
+
+# ------------------------------------------------------------------------
+# util: Yield consecutive slices of a list
+# ------------------------------------------------------------------------
+def batched(items: list, batch_size: int):
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Group (id, vector, metadata) records into size-bounded upsert batches
+# ------------------------------------------------------------------------
+def build_upsert_batches(records: list, max_vectors: int = UPSERT_BATCH_SIZE, max_bytes: int = UPSERT_MAX_BYTES):
+    batch, batch_bytes = [], 0
+    for record in records:
+        vector_id, vector, metadata = record
+        # Rough wire size: ~4 bytes per float plus the JSON-encoded metadata
+        record_bytes = len(vector_id) + 4 * len(vector) + len(json.dumps(metadata, ensure_ascii=False))
+        if batch and (len(batch) >= max_vectors or batch_bytes + record_bytes > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(record)
+        batch_bytes += record_bytes
+    if batch:
+        yield batch
+
+
+
+
+
+# ------------------------------------------------------------------------
+# fix: Upsert one batch, retrying transient failures with exponential backoff
+# ------------------------------------------------------------------------
+def upsert_with_retry(index, batch: list, namespace: str,
+                      max_retries: int = UPSERT_MAX_RETRIES, backoff: float = UPSERT_BACKOFF_SECONDS) -> int:
+    with span("upsert", vectors=len(batch)) as s:
+        for attempt in range(1, max_retries + 1):
+            try:
+                index.upsert(vectors=batch, namespace=namespace)
+                s.set(attempts=attempt)
+                return len(batch)
+            except Exception as e:
+                if attempt == max_retries:
+                    raise RuntimeError(f"Upsert failed after {max_retries} attempts: {e}") from e
+                delay = backoff * (2 ** (attempt - 1))
+                print(f"⚠️ Upsert attempt {attempt} failed ({e}); retrying in {delay:.1f}s...")
+                time.sleep(delay)
 
 
 
 
 
 # ------------------------------------------------------------------------
-# util: Clean and normalize titles for namespace use
+# util: Vector metadata for a chunk (plain string or dict with timestamps)
 # ------------------------------------------------------------------------
-def normalize_namespace(title: str) -> str:
-    return re.sub(r"[^a-z0-9]+", "_", title.lower().replace("&", "and")).strip("_")
+def chunk_metadata(chunk) -> dict:
+    if not isinstance(chunk, dict):
+        return {"text": chunk}
+    # Pinecone rejects null metadata values, so only keep fields that are set
+    return {key: chunk[key] for key in ("text", "start", "end", "char_start", "char_end") if chunk.get(key) is not None}
+
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Embed new transcript chunks in batches and upload them concurrently
+# ------------------------------------------------------------------------
+def embed_chunks_and_upload_to_pinecone(chunks: list, namespace: str, index=None, embeddings=None,
+                                        embed_batch_size: int = EMBED_BATCH_SIZE,
+                                        upsert_batch_size: int = UPSERT_BATCH_SIZE,
+                                        max_workers: int = UPSERT_MAX_WORKERS, on_batch=None,
+                                        full: bool = False) -> dict:
+    # Allow callers (and offline tests) to inject an index / embedding model
+    if index is None:
+        index = get_index()  # Pinecone or local, per VECTOR_BACKEND
+    if embeddings is None:
+        embeddings = get_embeddings(EMBEDDING_MODEL_NAME)
+
+    # Content-hash IDs: only chunks not already in the namespace manifest are embedded
+    sync = VectorSync(namespace, index, EMBEDDING_MODEL_NAME, full=full)
+    sync.start()
+    new_chunks = []
+    for chunk in chunks:
+        vector_id, needs_upload = sync.assign(chunk)
+        if needs_upload:
+            new_chunks.append((vector_id, chunk))
+
+    # Embed batch by batch on this thread; uploads overlap on the worker pool
+    futures = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        done = len(chunks) - len(new_chunks)
+        for chunk_batch in batched(new_chunks, embed_batch_size):
+            texts = [chunk["text"] if isinstance(chunk, dict) else chunk for _, chunk in chunk_batch]
+            with span("embed_batch", chunks=len(texts)) as s:
+                if s:
+                    s.set(chars=sum(len(text) for text in texts))
+                vectors = embeddings.embed_documents(texts)
+            records = [
+                (vector_id, vector, chunk_metadata(chunk))
+                for (vector_id, chunk), vector in zip(chunk_batch, vectors)
+            ]
+            sync.manifest.mark_pending([vector_id for vector_id, _ in chunk_batch])
+            done += len(chunk_batch)
+
+            for upsert_batch in build_upsert_batches(records, max_vectors=upsert_batch_size):
+                futures.append(pool.submit(bind_context(upsert_with_retry), index, upsert_batch, namespace))
+            if on_batch:
+                on_batch(done, len(chunks))  # progress hook (may raise to cancel)
+
+        uploaded = sum(future.result() for future in futures)  # re-raises the first failed batch
+
+    print(f"Uploaded {uploaded} chunks to {backend_id()} in {len(futures)} batches (namespace='{namespace}').")
+    report = sync.finish()  # stale vectors are deleted only after the new ones are in
+    invalidate_namespace(namespace)  # cached retrievals for this namespace are now stale
+    get_resources().invalidate(namespace)  # so is this process's vector store and QA chains
+    return {"uploaded": uploaded, **report}
 
 
 
@@ -170,11 +349,9 @@ def normalize_namespace(title: str) -> str:
 # ------------------------------------------------------------------------
 # fix: Ensure transcript file has a normalized name for future tools
 # ------------------------------------------------------------------------
-def normalize_transcript_filename():
+def normalize_transcript_filename(ctx: SessionContext = None):
     try:
-        with open("current_namespace.txt", "r", encoding="utf-8") as f:
-            raw_namespace = f.read().strip()
-        normalized = normalize_namespace(raw_namespace)
+        normalized = normalize_namespace(resolve_context(ctx).namespace)
 
         for filename in os.listdir("data"):
             if filename.endswith("_transcription.txt") and normalized in filename.lower():
@@ -196,37 +373,225 @@ def normalize_transcript_filename():
 
 
 # ------------------------------------------------------------------------
-# main: End-to-end video processing pipeline (audio → vector store)
+# feat: Progress reporting and cooperative cancellation for main_workflow
 # ------------------------------------------------------------------------
-def main_workflow(video_url: str) -> str:
-    print(" Running YouTube video pipeline...")
+class PipelineCancelled(Exception):
+    pass
+
+
+def make_reporter(progress=None, cancel_event=None):
+    # progress(stage, fraction, message) is called at checkpoints; a set cancel_event aborts there
+    def report(stage: str, fraction: float, message: str = ""):
+        if progress:
+            progress(stage, min(1.0, max(0.0, fraction)), message)
+        if cancel_event is not None and cancel_event.is_set():
+            raise PipelineCancelled(f"Cancelled during {stage}")
+    return report
+
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Stage cache parameters (each key includes everything upstream that shapes its output)
+# ------------------------------------------------------------------------
+def transcript_stage_params() -> dict:
+    # Quantized / CTranslate2 backends and batched decoding change the transcript, so they key the cache too
+    return {"whisper_model": WHISPER_MODEL_SIZE, "audio_mode": AUDIO_MODE, "streaming": STREAMING_TRANSCRIPTION,
+            "whisper_backend": WHISPER_BACKEND, "whisper_batch": WHISPER_BATCH_SIZE}
+
+
+def chunk_stage_params(chunker: str = "text") -> dict:
+    params = {**transcript_stage_params(), "timestamps": True}
+    if chunker == "segments":
+        params.update(chunk_tokens=CHUNK_TOKENS, chunk_overlap_tokens=CHUNK_OVERLAP_TOKENS)
+    else:
+        params.update(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    if chunker != "text":
+        params["chunker"] = chunker  # chunk boundaries differ between chunkers
+    return params
+
+
+def embed_stage_params(chunk_params: dict, namespace: str) -> dict:
+    return {**chunk_params, "embedding_model": EMBEDDING_MODEL_NAME, "index": backend_id(), "namespace": namespace}
 
-    # Step 1: Download video and extract metadata
-    audio_path, safe_title = download_audio_from_video(video_url)
 
-    # Step 2: Transcribe audio to text
+
+
+
+# ------------------------------------------------------------------------
+# feat: Shared pipeline steps (sequential and async pipelines use the same cache entries)
+# ------------------------------------------------------------------------
+def extract_audio_stage(video_url: str, audio_dir: str) -> tuple:
+    video_info, audio_path = extract_audio_and_metadata(video_url, audio_dir, AUDIO_MODE)
+    return video_info, {"file": os.path.basename(audio_path)}
+
+
+def run_metadata_stage(cache, video_id: str, video_url: str) -> dict:
+    # One yt-dlp pass for metadata (title drives the namespace) and audio
+    def fetch_metadata(workdir):
+        audio_dir = cache.prepare(video_id, "audio", AUDIO_PARAMS)
+        video_info, audio_value = extract_audio_stage(video_url, audio_dir)
+        entry = cache.put(video_id, "audio", AUDIO_PARAMS, audio_value)  # audio came along in the same pass
+        if s:
+            s.set(bytes=os.path.getsize(os.path.join(entry["path"], audio_value["file"])))
+        safe_title = safe_title_from_info(video_info)
+        save_video_metadata(video_info, video_url, safe_title)
+        return {"title": video_info.get("title"), "safe_title": safe_title, "duration": video_info.get("duration")}
+
+    with span("download", mode=AUDIO_MODE) as s:
+        metadata_entry, hit = cache.run_stage(video_id, "metadata", {}, fetch_metadata)
+        s.set(cache_hit=hit, audio_seconds=metadata_entry["value"].get("duration") or 0)
+    return metadata_entry["value"]
+
+
+def run_audio_stage(cache, video_id: str, video_url: str) -> str:
+    # Audio is only re-downloaded when the cached file was evicted
+    with span("download", mode=AUDIO_MODE) as s:
+        audio_entry, hit = cache.run_stage(video_id, "audio", AUDIO_PARAMS,
+                                           lambda d: extract_audio_stage(video_url, d)[1])
+        s.set(cache_hit=hit)
+    return os.path.join(audio_entry["path"], audio_entry["value"]["file"])
+
+
+def publish_transcript(cached_transcription_path: str, namespace: str) -> str:
+    # Copy the transcript (and its segment index) under the normalized name for tool compatibility
     os.makedirs("data", exist_ok=True)
-    raw_transcription_path = f"data/{safe_title}_transcription.txt"
-    transcribe_audio(audio_path, output_text_path=raw_transcription_path)
+    final_transcription_path = f"data/{namespace}_transcription.txt"
+    shutil.copyfile(cached_transcription_path, final_transcription_path)
+    if os.path.isfile(segments_path_for(cached_transcription_path)):
+        shutil.copyfile(segments_path_for(cached_transcription_path), segments_path_for(final_transcription_path))
+    return final_transcription_path
 
-    # Step 2.5: Normalize filename for tool compatibility
-    normalized_title = normalize_namespace(safe_title)
-    final_transcription_path = f"data/{normalized_title}_transcription.txt"
-    if raw_transcription_path != final_transcription_path:
-        os.rename(raw_transcription_path, final_transcription_path)
 
-    # Step 3: Break long transcript into manageable chunks
-    chunks = split_text_into_chunks(final_transcription_path)
+def publish_lexical_index(chunks_path: str, namespace: str):
+    # BM25 index over the namespace's chunks for hybrid retrieval (cheap, so rebuilt on every run)
+    with span("bm25_index") as s, open(chunks_path, "r", encoding="utf-8") as f:
+        chunks = json.load(f)
+        s.set(chunks=len(chunks))
+        build_namespace_index(namespace, chunks)
 
-    # Step 4: Embed chunks and upload to vector DB
-    embed_chunks_and_upload_to_pinecone(chunks, namespace=normalized_title)
 
-    # Step 5: Store current namespace for downstream tools
-    with open("current_namespace.txt", "w", encoding="utf-8") as f:
-        f.write(normalized_title)
+def finish_workflow(namespace: str, final_transcription_path: str, ctx: SessionContext = None) -> str:
+    # Hand the namespace to the caller's session (the file is a single-user fallback)
+    if ctx is not None:
+        ctx.set_namespace(namespace)
+    else:
+        write_namespace_file(namespace)
 
     #  Summary message
     return f""" All steps completed!
 Transcript saved to: {final_transcription_path}
-Pinecone namespace: {normalized_title}
+Vector namespace: {namespace}
 """
+
+
+
+
+
+# ------------------------------------------------------------------------
+# main: Sequential pipeline (one stage after another)
+# ------------------------------------------------------------------------
+def run_sequential_workflow(video_url: str, use_cache: bool = True, progress=None, cancel_event=None,
+                            ctx: SessionContext = None) -> str:
+    print(" Running YouTube video pipeline...")
+    report = make_reporter(progress, cancel_event)
+    cache = get_pipeline_cache()
+    video_id = extract_video_id(video_url)
+    if not use_cache:
+        cache.invalidate(video_id)
+    transcript_params = transcript_stage_params()
+
+    # Step 1: Metadata + audio in one yt-dlp pass
+    report("download", 0.0, "Fetching metadata and audio")
+    metadata = run_metadata_stage(cache, video_id, video_url)
+    normalized_title = normalize_namespace(metadata["safe_title"])
+    duration = metadata.get("duration") or 0
+
+    # Step 2: Transcribe audio to text (audio is only downloaded on a transcript miss)
+    def transcribe(workdir):
+        audio_path = run_audio_stage(cache, video_id, video_url)
+        report("download", 1.0, "Audio ready")
+        output_text_path = os.path.join(workdir, "transcription.txt")
+        if STREAMING_TRANSCRIPTION:
+            # Segments are written to disk as each one completes
+            segment_count = 0
+            for segment in transcribe_audio_streaming(audio_path, output_text_path=output_text_path,
+                                                      model_size=WHISPER_MODEL_SIZE, workers=TRANSCRIBE_WORKERS):
+                segment_count += 1
+                report("transcribe", segment["end"] / duration if duration else 0.0,
+                       f"{segment_count} segments transcribed")
+            return {"file": "transcription.txt", "segments": segment_count}
+        transcribe_audio(audio_path, output_text_path=output_text_path, model_size=WHISPER_MODEL_SIZE)
+        return {"file": "transcription.txt"}
+
+    report("transcribe", 0.0, "Transcribing audio")
+    with span("transcribe", model=WHISPER_MODEL_SIZE, audio_seconds=duration) as s:
+        transcript_entry, hit = cache.run_stage(video_id, "transcript", transcript_params, transcribe)
+        s.set(cache_hit=hit, segments=transcript_entry["value"].get("segments", 0))
+    report("transcribe", 1.0, "Transcript ready")
+
+    # Step 2.5: Publish transcript under the normalized name
+    final_transcription_path = publish_transcript(os.path.join(transcript_entry["path"], "transcription.txt"),
+                                                  normalized_title)
+
+    # Step 3: Break long transcript into manageable chunks (segment-aligned when the index exists)
+    use_segments = CHUNKER == "segments" and os.path.isfile(segments_path_for(final_transcription_path))
+    chunk_params = chunk_stage_params("segments" if use_segments else "text")
+
+    def chunk(workdir):
+        if use_segments:
+            with Transcript(final_transcription_path) as transcript:
+                chunks = list(chunk_segments(transcript.segments()))
+            print(f"Text split into {len(chunks)} chunks.")
+        else:
+            chunks = attach_timestamps(
+                split_text_into_chunks(final_transcription_path, chunk_size=CHUNK_SIZE,
+                                       chunk_overlap=CHUNK_OVERLAP, with_offsets=True),
+                final_transcription_path
+            )
+        with open(os.path.join(workdir, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump(chunks, f, ensure_ascii=False)
+        return {"count": len(chunks)}
+
+    report("chunk", 0.0, "Splitting transcript")
+    with span("chunk", chunker=chunk_params.get("chunker", "text")) as s:
+        chunk_entry, hit = cache.run_stage(video_id, "chunks", chunk_params, chunk)
+        s.set(cache_hit=hit, chunks=chunk_entry["value"]["count"])
+    publish_lexical_index(os.path.join(chunk_entry["path"], "chunks.json"), normalized_title)
+    report("chunk", 1.0, f"{chunk_entry['value']['count']} chunks")
+
+    # Step 4: Embed chunks and upload to vector DB (skipped if this exact upload already happened)
+    def embed(workdir):
+        with open(os.path.join(chunk_entry["path"], "chunks.json"), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        on_batch = lambda done, total: report("embed", done / total, f"{done}/{total} chunks embedded")
+        return embed_chunks_and_upload_to_pinecone(chunks, namespace=normalized_title, on_batch=on_batch,
+                                                   full=not use_cache)
+
+    report("embed", 0.0, "Embedding chunks")
+    with span("embed") as s:
+        embed_entry, hit = cache.run_stage(video_id, "embed", embed_stage_params(chunk_params, normalized_title), embed)
+        s.set(cache_hit=hit, **embed_entry["value"])
+    report("embed", 1.0, f"Vectors uploaded ({embed_entry['value'].get('skipped', 0)} unchanged chunks skipped)")
+
+    # Step 5: Hand over the namespace
+    return finish_workflow(normalized_title, final_transcription_path, ctx)
+
+
+
+
+
+# ------------------------------------------------------------------------
+# main: End-to-end video processing pipeline (audio → vector store)
+# ------------------------------------------------------------------------
+def main_workflow(video_url: str, use_cache: bool = True, progress=None, cancel_event=None,
+                  ctx: SessionContext = None) -> str:
+    # Root span: every stage span below is attributed to this video
+    with span("workflow", video=extract_video_id(video_url), mode=PIPELINE_MODE, use_cache=use_cache):
+        if PIPELINE_MODE == "async":
+            # Overlapping stages connected by bounded queues (see async_pipeline.py)
+            from async_pipeline import run_workflow
+            return run_workflow(video_url, use_cache=use_cache, progress=progress, cancel_event=cancel_event, ctx=ctx)
+        return run_sequential_workflow(video_url, use_cache=use_cache, progress=progress,
+                                       cancel_event=cancel_event, ctx=ctx)
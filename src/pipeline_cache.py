@@ -0,0 +1,212 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+
+# ------------------------------------------------------------------------
+# config: Cache location and size budget
+# ------------------------------------------------------------------------
+PIPELINE_CACHE_DIR = os.getenv("PIPELINE_CACHE_DIR", os.path.join("data", "cache"))
+PIPELINE_CACHE_MAX_MB = int(os.getenv("PIPELINE_CACHE_MAX_MB", "2048"))   # evict LRU entries above this
+PIPELINE_CACHE_MIN_IDLE_SECONDS = float(os.getenv("PIPELINE_CACHE_MIN_IDLE_SECONDS", "3600"))  # never evict fresher
+MANIFEST_NAME = "manifest.json"
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Extract the 11-character YouTube video ID from common URL shapes
+# ------------------------------------------------------------------------
+_VIDEO_ID_PATTERNS = [
+    r"[?&]v=([A-Za-z0-9_-]{11})",
+    r"youtu\.be/([A-Za-z0-9_-]{11})",
+    r"youtube\.com/(?:shorts|embed|live|v)/([A-Za-z0-9_-]{11})",
+]
+
+
+def extract_video_id(video_url: str) -> str:
+    for pattern in _VIDEO_ID_PATTERNS:
+        match = re.search(pattern, video_url)
+        if match:
+            return match.group(1)
+    # Non-YouTube URLs still get a stable, file-safe key
+    return "url-" + hashlib.sha1(video_url.strip().encode("utf-8")).hexdigest()[:16]
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Stable hash of stage parameters (order-independent)
+# ------------------------------------------------------------------------
+def params_key(params: dict) -> str:
+    encoded = json.dumps(params or {}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Persistent per-stage cache keyed by video ID + stage parameters
+# ------------------------------------------------------------------------
+class PipelineCache:
+    def __init__(self, root: str = PIPELINE_CACHE_DIR, max_mb: int = PIPELINE_CACHE_MAX_MB,
+                 min_idle_seconds: float = PIPELINE_CACHE_MIN_IDLE_SECONDS):
+        self.root = root
+        self.max_bytes = max_mb * 1024 * 1024
+        self.min_idle_seconds = min_idle_seconds
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def entry_dir(self, video_id: str, stage: str, params: dict) -> str:
+        return os.path.join(self.root, video_id, f"{stage}-{params_key(params)}")
+
+    def get(self, video_id: str, stage: str, params: dict):
+        entry_path = self.entry_dir(video_id, stage, params)
+        manifest_path = os.path.join(entry_path, MANIFEST_NAME)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # An entry is only valid if every recorded output is still present and intact
+        for name, size in manifest.get("files", {}).items():
+            file_path = os.path.join(entry_path, name)
+            if not os.path.isfile(file_path) or os.path.getsize(file_path) != size:
+                print(f"⚠️ Cache entry {stage} for {video_id} is incomplete; discarding.")
+                shutil.rmtree(entry_path, ignore_errors=True)
+                return None
+
+        os.utime(manifest_path)  # mark as recently used for LRU eviction
+        manifest["path"] = entry_path
+        return manifest
+
+    def put(self, video_id: str, stage: str, params: dict, value: dict) -> dict:
+        entry_path = self.entry_dir(video_id, stage, params)
+        os.makedirs(entry_path, exist_ok=True)
+        files = {
+            name: os.path.getsize(os.path.join(entry_path, name))
+            for name in os.listdir(entry_path)
+            if name != MANIFEST_NAME and os.path.isfile(os.path.join(entry_path, name))
+        }
+        manifest = {
+            "video_id": video_id,
+            "stage": stage,
+            "params": params,
+            "value": value,
+            "files": files,
+            "created": time.time(),
+        }
+
+        # Write the manifest last and atomically: its presence marks the entry as valid
+        tmp_path = os.path.join(entry_path, MANIFEST_NAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(entry_path, MANIFEST_NAME))
+
+        self.evict()
+        manifest["path"] = entry_path
+        return manifest
+
+    def prepare(self, video_id: str, stage: str, params: dict) -> str:
+        # Fresh, empty working directory for an entry about to be (re)computed
+        workdir = self.entry_dir(video_id, stage, params)
+        shutil.rmtree(workdir, ignore_errors=True)  # clear leftovers from an interrupted run
+        os.makedirs(workdir, exist_ok=True)
+        return workdir
+
+    def run_stage(self, video_id: str, stage: str, params: dict, compute) -> tuple:
+        # compute(workdir) writes its files into workdir and returns a JSON-serializable value
+        entry = self.get(video_id, stage, params)
+        if entry is not None:
+            with self._lock:
+                self.stats["hits"] += 1
+            print(f"Cache hit: {stage} for {video_id}")
+            return entry, True
+
+        with self._lock:
+            self.stats["misses"] += 1
+        workdir = self.prepare(video_id, stage, params)
+        try:
+            value = compute(workdir)
+        except Exception:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        return self.put(video_id, stage, params, value), False
+
+    def invalidate(self, video_id: str, stage: str = None) -> int:
+        # Remove every entry for a video, or only the entries of one stage
+        video_dir = os.path.join(self.root, video_id)
+        if not os.path.isdir(video_dir):
+            return 0
+        if stage is None:
+            removed = len(os.listdir(video_dir))
+            shutil.rmtree(video_dir, ignore_errors=True)
+            return removed
+
+        removed = 0
+        for name in os.listdir(video_dir):
+            if name.startswith(f"{stage}-"):
+                shutil.rmtree(os.path.join(video_dir, name), ignore_errors=True)
+                removed += 1
+        return removed
+
+    def _entries(self) -> list:
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for video_id in os.listdir(self.root):
+            video_dir = os.path.join(self.root, video_id)
+            if not os.path.isdir(video_dir):
+                continue
+            for name in os.listdir(video_dir):
+                entry_path = os.path.join(video_dir, name)
+                manifest_path = os.path.join(entry_path, MANIFEST_NAME)
+                if not os.path.isfile(manifest_path):
+                    continue
+                size = sum(
+                    os.path.getsize(os.path.join(entry_path, f))
+                    for f in os.listdir(entry_path)
+                    if os.path.isfile(os.path.join(entry_path, f))
+                )
+                entries.append((os.path.getmtime(manifest_path), size, entry_path))
+        return entries
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_bytes: int = None, min_idle_seconds: float = None) -> int:
+        # Drop least recently used entries until the cache fits its budget. Entries read or written
+        # within min_idle_seconds are kept even over budget: a job (in any process) may still be
+        # reading their files, e.g. the memory-mapped transcript segments.
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        min_idle = self.min_idle_seconds if min_idle_seconds is None else min_idle_seconds
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            now = time.time()
+            for last_used, size, entry_path in entries:
+                if total <= limit or now - last_used < min_idle:
+                    break  # sorted by last use: every remaining entry is newer still
+                shutil.rmtree(entry_path, ignore_errors=True)
+                total -= size
+                evicted += 1
+            self.stats["evictions"] += evicted
+            return evicted
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Shared cache instance used by the pipeline
+# ------------------------------------------------------------------------
+_cache = PipelineCache()
+
+
+def get_pipeline_cache() -> PipelineCache:
+    return _cache
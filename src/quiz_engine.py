@@ -0,0 +1,330 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
+
+from map_reduce_summary import RateLimiter, get_rate_limiter, get_token_counter, split_by_tokens
+from token_stream import get_stream_metrics
+from instrumentation import span, bind_context, record_usage
+
+
+# ------------------------------------------------------------------------
+# config: Section size, pool size, concurrency, dedupe threshold and cache location
+# ------------------------------------------------------------------------
+QUIZ_MODEL = os.getenv("QUIZ_MODEL", "gpt-3.5-turbo")
+QUIZ_SECTION_TOKENS = int(os.getenv("QUIZ_SECTION_TOKENS", "600"))     # transcript tokens per quiz section
+QUIZ_POOL_SIZE = int(os.getenv("QUIZ_POOL_SIZE", "3"))                 # candidate questions generated per section
+QUIZ_MAX_WORKERS = int(os.getenv("QUIZ_MAX_WORKERS", "4"))             # concurrent LLM calls
+QUIZ_MAX_ROUNDS = 3                                                    # attempts for slots that failed
+QUIZ_DUP_THRESHOLD = float(os.getenv("QUIZ_DUP_THRESHOLD", "0.9"))     # cosine similarity counted as a duplicate
+QUIZ_CACHE_DIR = os.getenv("QUIZ_CACHE_DIR", os.path.join("data", "quiz_cache"))
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+OPTION_LETTERS = "ABCD"
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Split a transcript into sections (with timestamps when segments exist)
+# ------------------------------------------------------------------------
+def build_sections(text: str = None, transcript=None, section_tokens: int = QUIZ_SECTION_TOKENS) -> list:
+    count_tokens = get_token_counter(QUIZ_MODEL)
+    if transcript is None:
+        return [{"text": t, "start": None, "end": None} for t in split_by_tokens(text, section_tokens, count_tokens)]
+
+    # Group whole Whisper segments so every section maps to a playable time range
+    sections, parts, size, start = [], [], 0, None
+    for segment in transcript.segments():
+        tokens = count_tokens(segment["text"])
+        if parts and size + tokens > section_tokens:
+            sections.append({"text": " ".join(parts), "start": start, "end": end})
+            parts, size = [], 0
+        if not parts:
+            start = segment["start"]
+        parts.append(segment["text"].strip())
+        size += tokens
+        end = segment["end"]
+    if parts:
+        sections.append({"text": " ".join(parts), "start": start, "end": end})
+    return sections
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Coverage-balanced, topically diverse section sampling
+# ------------------------------------------------------------------------
+def _normalize_rows(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def sample_sections(section_vectors: np.ndarray, count: int) -> list:
+    # One pick per equal-width stratum of the timeline (coverage); inside a stratum take the
+    # section least similar to everything already picked (diversity). Deterministic, so a
+    # regenerated quiz hits the same cached pools.
+    total = len(section_vectors)
+    count = min(count, total)
+    bounds = np.linspace(0, total, count + 1).astype(int)
+    chosen = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        candidates = list(range(lo, max(hi, lo + 1)))
+        if not chosen:  # most representative section of the first stratum
+            centrality = (section_vectors[candidates] @ section_vectors[candidates].T).mean(axis=1)
+            chosen.append(candidates[int(np.argmax(centrality))])
+            continue
+        similarity = section_vectors[candidates] @ section_vectors[chosen].T
+        chosen.append(candidates[int(np.argmin(similarity.max(axis=1)))])
+    return chosen
+
+
+def rank_backups(section_vectors: np.ndarray, chosen: list) -> list:
+    # Unused sections, most novel first, to replace slots whose section yields nothing usable
+    unused = [i for i in range(len(section_vectors)) if i not in chosen]
+    if not unused or not chosen:
+        return unused
+    similarity = (section_vectors[unused] @ section_vectors[chosen].T).max(axis=1)
+    return [unused[i] for i in np.argsort(similarity)]
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Parse and validate structured (JSON) question output
+# ------------------------------------------------------------------------
+def parse_json_questions(raw: str) -> list:
+    match = re.search(r"\[.*\]", raw, re.S) or re.search(r"\{.*\}", raw, re.S)
+    if not match:
+        return []
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return []
+    items = data if isinstance(data, list) else data.get("questions", [data])
+
+    questions = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        question = str(item.get("question", "")).strip()
+        options = [re.sub(r"^\s*[A-Da-d][\).:]\s*", "", str(o)).strip() for o in item.get("options", [])]
+        answer = str(item.get("answer", "")).strip()[:1].upper()
+        if question and len(options) == 4 and all(options) and answer in OPTION_LETTERS:
+            questions.append({
+                "question": question,
+                "options": [f"{letter}) {option}" for letter, option in zip(OPTION_LETTERS, options)],
+                "answer": answer,
+            })
+    return questions
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: On-disk cache of per-section question pools
+# ------------------------------------------------------------------------
+class QuestionPoolCache:
+    def __init__(self, directory: str = QUIZ_CACHE_DIR):
+        self.directory = directory
+
+    @staticmethod
+    def key(model: str, pool_size: int, section_text: str) -> str:
+        return hashlib.sha1(f"{model}\x1f{pool_size}\x1f{section_text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, pool: list):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(pool, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+
+
+# ------------------------------------------------------------------------
+# config: Prompt asking for a JSON pool of questions about one section
+# ------------------------------------------------------------------------
+QUIZ_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessagePromptTemplate.from_template(
+        "You are a quiz generator. Only use the transcript section provided. "
+        "Return ONLY a JSON array of {n} objects, each with keys \"question\" (string), "
+        "\"options\" (array of exactly 4 answer strings without letters) and \"answer\" "
+        "(the letter A, B, C or D of the correct option). Questions must differ from each other."
+    ),
+    HumanMessagePromptTemplate.from_template("Transcript section:\n{section}\n\nJSON:")
+])
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Quiz engine (sample sections → concurrent JSON pools → dedupe → assemble)
+# ------------------------------------------------------------------------
+class QuizEngine:
+    def __init__(self, llm=None, embeddings=None, model: str = QUIZ_MODEL, pool_size: int = QUIZ_POOL_SIZE,
+                 max_workers: int = QUIZ_MAX_WORKERS, rate_limiter: RateLimiter = None,
+                 cache: QuestionPoolCache = None, dup_threshold: float = QUIZ_DUP_THRESHOLD):
+        if llm is None:
+            from langchain_community.chat_models import ChatOpenAI
+            llm = ChatOpenAI(model=model, temperature=0.3, openai_api_key=os.getenv("OPENAI_API_KEY"))
+        if embeddings is None:
+            from model_registry import get_embeddings
+            embeddings = get_embeddings(EMBEDDING_MODEL_NAME)
+        self.llm = llm
+        self.embeddings = embeddings
+        self.model = model
+        self.pool_size = pool_size
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.cache = cache if cache is not None else QuestionPoolCache()
+        self.dup_threshold = dup_threshold
+        self.llm_calls = 0
+
+    def question_pool(self, section: dict, size: int = None) -> list:
+        # size: more candidates when several quiz slots draw from this one section
+        size = max(self.pool_size, size or 0)
+        key = QuestionPoolCache.key(self.model, size, section["text"])
+        with span("quiz_pool") as s:
+            pool = self.cache.get(key) if self.cache else None
+            s.set(cache_hit=bool(pool))
+            if pool:
+                return pool
+            self.rate_limiter.acquire()
+            self.llm_calls += 1
+            with span("llm", feature="quiz") as llm_span:
+                message = self.llm.invoke(QUIZ_PROMPT.format_messages(section=section["text"], n=size))
+                record_usage(llm_span, message)
+            pool = parse_json_questions(message.content)
+            s.set(questions=len(pool))
+            if pool and self.cache:
+                self.cache.put(key, pool)  # only well-formed pools are cached
+            return pool
+
+    def _safe_pool(self, section: dict, size: int = None) -> list:
+        try:
+            return self.question_pool(section, size)
+        except Exception as e:
+            print(f"Quiz section failed: {e}")
+            return []
+
+    def generate(self, sections: list, num_questions: int = 5, seed: int = None) -> list:
+        # Keep questions in timeline order
+        accepted = sorted(self._iter_accepted(sections, num_questions, seed),
+                          key=lambda item: sections[item[0]]["start"] or item[0])
+        return [question for _, question in accepted]
+
+    def stream(self, sections: list, num_questions: int = 5, seed: int = None):
+        # Questions in completion order, each as soon as its section's pool is back and deduped
+        for _, question in self._iter_accepted(sections, num_questions, seed):
+            yield question
+
+    def _iter_accepted(self, sections: list, num_questions: int, seed: int):
+        if not sections:
+            return
+        rng = random.Random(seed)  # a new seed re-draws questions from the cached pools: instant regeneration
+        section_vectors = _normalize_rows(self.embeddings.embed_documents([s["text"] for s in sections]))
+        slots = sample_sections(section_vectors, num_questions)
+        # Fewer sections than questions: several slots share a section and draw distinct questions from its pool
+        slots += [slots[i % len(slots)] for i in range(num_questions - len(slots))]
+        backups = rank_backups(section_vectors, slots)
+        slot_seeds = [rng.random() for _ in slots]  # per-slot shuffles don't depend on completion order
+
+        accepted_vectors = []
+        pending = list(range(len(slots)))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for round_number in range(QUIZ_MAX_ROUNDS):
+                if not pending:
+                    break
+                groups = {}  # section index -> its pending slots (one pool request per section)
+                for slot in pending:
+                    groups.setdefault(slots[slot], []).append(slot)
+                futures = {pool.submit(bind_context(self._safe_pool), sections[index], len(group)): group
+                           for index, group in groups.items()}
+
+                failed = []
+                for future in as_completed(futures):
+                    pool_questions = future.result()
+                    for slot in futures[future]:
+                        candidates = list(pool_questions)
+                        random.Random(slot_seeds[slot] + round_number).shuffle(candidates)
+                        picked = self._pick_unique(candidates, accepted_vectors)
+                        if picked is None:
+                            failed.append(slot)
+                            continue
+                        section = sections[slots[slot]]
+                        yield slots[slot], {**picked, "start": section["start"], "end": section["end"]}
+
+                # Retry only the failed slots, on fresh sections when any are left
+                for slot in failed:
+                    if backups:
+                        slots[slot] = backups.pop(0)
+                pending = failed
+                if failed:
+                    print(f"Quiz round {round_number + 1}: retrying {len(failed)} slot(s)")
+
+    def _pick_unique(self, candidates: list, accepted_vectors: list):
+        if not candidates:
+            return None
+        vectors = _normalize_rows(self.embeddings.embed_documents([c["question"] for c in candidates]))
+        for candidate, vector in zip(candidates, vectors):
+            if accepted_vectors and max(float(vector @ v) for v in accepted_vectors) >= self.dup_threshold:
+                continue  # near-duplicate of a question already in the quiz
+            accepted_vectors.append(vector)
+            return candidate
+        return None
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Convenience entry point for a session (uses segment timestamps when available)
+# ------------------------------------------------------------------------
+def _session_sections(ctx):
+    transcript = ctx.transcript
+    if transcript is not None:
+        return build_sections(transcript=transcript)
+    return build_sections(text=ctx.read_transcript())
+
+
+def generate_quiz(ctx=None, num_questions: int = 5, seed: int = None, engine: QuizEngine = None) -> list:
+    from session_context import resolve_context
+    ctx = resolve_context(ctx)
+    engine = engine or QuizEngine(llm=ctx.llm, embeddings=ctx.embeddings, rate_limiter=get_rate_limiter())
+    return engine.generate(_session_sections(ctx), num_questions=num_questions, seed=seed)
+
+
+def stream_quiz(ctx=None, num_questions: int = 5, seed: int = None, engine: QuizEngine = None):
+    # Generator: each question as soon as it is ready (completion order, not timeline order)
+    from session_context import resolve_context
+    ctx = resolve_context(ctx)
+    engine = engine or QuizEngine(llm=ctx.llm, embeddings=ctx.embeddings, rate_limiter=get_rate_limiter())
+    started, first, count = time.perf_counter(), None, 0
+    for question in engine.stream(_session_sections(ctx), num_questions=num_questions, seed=seed):
+        if first is None:
+            first = time.perf_counter() - started
+        count += 1
+        yield question
+    get_stream_metrics().record("quiz", first, time.perf_counter() - started, count)
+
+
+def as_tuples(questions: list) -> list:
+    # (question, options, correct_letter), the shape parse_questions() returns
+    return [(q["question"], q["options"], q["answer"]) for q in questions]
@@ -1,91 +1,23 @@
-import os
 import re
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-
-
-
-# ------------------------------------------------------------------------
-# util: Normalize namespace and filenames from video title or ID
-# ------------------------------------------------------------------------
-def normalize_namespace(title):
-    return re.sub(r"[^a-z0-9]+", "_", title.lower().replace("&", "and")).strip("_")
+from session_context import resolve_context, normalize_namespace  # noqa: F401 (re-exported)
 
+QUESTION_HEADER = re.compile(r"\n\s*\d+\.\s")  # "1. " at the start of a line
 
 
 
 # ------------------------------------------------------------------------
-# feat: Load transcript file based on current namespace
+# feat: Load transcript file for the caller's session
 # ------------------------------------------------------------------------
-def load_transcript():
+def load_transcript(ctx=None):
     try:
-        # Read the namespace used in the last pipeline run
-        with open("current_namespace.txt", "r", encoding="utf-8") as f:
-            raw_namespace = f.read().strip()
-
-        namespace = normalize_namespace(raw_namespace)
-        expected_filename = f"{namespace}_transcription.txt"
-        data_dir = "data"
-
-        # Search for the exact file in the /data directory
-        for filename in os.listdir(data_dir):
-            if filename.lower() == expected_filename.lower():
-                with open(os.path.join(data_dir, filename), "r", encoding="utf-8") as f:
-                    return f.read()
-
-        raise FileNotFoundError(f"No matching transcript file found for: {expected_filename}")
-
+        # Session namespace, or the last pipeline run's namespace file as a fallback
+        return resolve_context(ctx).read_transcript()
     except Exception as e:
         raise FileNotFoundError(f"Could not load transcript: {e}")
 
 
 
 
-# ------------------------------------------------------------------------
-# feat: Generate quiz questions from transcript using OpenAI LLM
-# ------------------------------------------------------------------------
-def generate_quiz_questions(transcript_text, num_questions=5):
-    # Define prompt template for the quiz generator
-    prompt = ChatPromptTemplate.from_messages([
-        SystemMessagePromptTemplate.from_template(
-            "You are a quiz generator. Only use the transcript provided. "
-            "Create {n} multiple-choice questions with four options (A, B, C, D). Include the correct answer for each."
-        ),
-        HumanMessagePromptTemplate.from_template(
-            "Transcript:\n{transcript}\n\nGenerate {n} multiple-choice questions."
-        )
-    ])
-
-    # Initialize LLM with moderate creativity
-    llm = ChatOpenAI(
-        model="gpt-3.5-turbo",
-        temperature=0.3,
-        openai_api_key=os.getenv("OPENAI_API_KEY")  # 🔐 Use environment variable for safety
-    )
-
-    # Format the input prompt (truncate if needed)
-    formatted_prompt = prompt.format_messages(transcript=transcript_text[:4000], n=num_questions)
-
-    # Debug: show prompt sent to the LLM
-    print("\nPrompt sent to LLM >>>")
-    for m in formatted_prompt:
-        print(m)
-
-    try:
-        # Send prompt to OpenAI
-        response = llm.invoke(formatted_prompt)
-
-        # Debug: display the raw response
-        print("\nLLM Response >>>\n", response.content)
-
-        return response.content
-    except Exception as e:
-        print(f"OpenAI error: {e}")
-        return ""
-
-
-
-
 # ------------------------------------------------------------------------
 # feat: Parse quiz response text into structured question format
 # ------------------------------------------------------------------------
@@ -93,7 +25,7 @@ def parse_questions(text):
     questions = []
 
     # Split based on lines starting with a number and period (e.g., "1. ")
-    blocks = re.split(r"\n\s*\d+\.\s", text)
+    blocks = QUESTION_HEADER.split(text)
 
     for block in blocks[1:]:  # skip intro section if present
         lines = block.strip().split("\n")
@@ -0,0 +1,118 @@
+import os
+import time
+import threading
+
+from session_context import EMBEDDING_MODEL_NAME
+
+
+# ------------------------------------------------------------------------
+# config: Idle eviction for per-namespace resources and per-session chains
+# ------------------------------------------------------------------------
+RESOURCE_IDLE_SECONDS = float(os.getenv("RESOURCE_IDLE_SECONDS", "1800"))   # drop namespaces unused this long
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "3600"))     # drop a session's chain + memory
+QA_MODEL_NAME = "gpt-3.5-turbo"
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Shared vector stores, LLM clients and per-session QA chains
+# ------------------------------------------------------------------------
+class ResourceManager:
+    def __init__(self, idle_seconds: float = RESOURCE_IDLE_SECONDS, session_idle_seconds: float = SESSION_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.session_idle_seconds = session_idle_seconds
+        self._namespaces = {}      # namespace -> {"vectordb", "sessions": {session_id: {...}}, "last_used"}
+        self._llms = {}            # model name -> chat client (stateless, shared by every namespace)
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _entry(self, namespace: str) -> dict:
+        from retrieval_cache import namespace_generation
+        generation = namespace_generation(namespace)
+        entry = self._namespaces.get(namespace)
+        if entry is not None and entry["generation"] != generation:
+            entry = None  # re-ingested (possibly by another process) since this store was opened
+        if entry is None:
+            from model_registry import get_embeddings
+            from vector_backend import get_vectorstore
+            entry = {"vectordb": get_vectorstore(namespace, get_embeddings(EMBEDDING_MODEL_NAME)), "sessions": {},
+                     "generation": generation}
+            self._namespaces[namespace] = entry
+        entry["last_used"] = time.monotonic()
+        return entry
+
+    def get_vectorstore(self, namespace: str):
+        with self._lock:
+            self.evict_idle()
+            return self._entry(namespace)["vectordb"]
+
+    def get_llm(self, model: str = QA_MODEL_NAME):
+        with self._lock:
+            if model not in self._llms:
+                from langchain_community.chat_models import ChatOpenAI
+                self._llms[model] = ChatOpenAI(model=model, temperature=0)
+            return self._llms[model]
+
+    def get_qa_chain(self, namespace: str, session_id: str, llm=None):
+        # Chains are per (namespace, session) so conversation memory never leaks between users
+        with self._lock:
+            self.evict_idle()
+            entry = self._entry(namespace)
+            session = entry["sessions"].get(session_id)
+            if session is None:
+                from chat_with_video import build_qa_chain, new_memory
+                self.stats["misses"] += 1
+                memory = new_memory()
+                chain = build_qa_chain(entry["vectordb"], namespace=namespace,
+                                       llm=llm or self.get_llm(), memory=memory)
+                session = {"qa_chain": chain, "memory": memory}
+                entry["sessions"][session_id] = session
+            else:
+                self.stats["hits"] += 1
+            session["last_used"] = time.monotonic()
+            return session["qa_chain"]
+
+    def release_session(self, session_id: str, namespace: str = None):
+        with self._lock:
+            for name, entry in self._namespaces.items():
+                if namespace is None or name == namespace:
+                    entry["sessions"].pop(session_id, None)
+
+    def invalidate(self, namespace: str):
+        # Re-ingested namespaces get a fresh vector store on next use
+        with self._lock:
+            self._namespaces.pop(namespace, None)
+
+    def evict_idle(self) -> int:
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            for name in list(self._namespaces):
+                entry = self._namespaces[name]
+                for session_id in [s for s, v in entry["sessions"].items()
+                                   if now - v["last_used"] > self.session_idle_seconds]:
+                    del entry["sessions"][session_id]
+                if now - entry["last_used"] > self.idle_seconds and not entry["sessions"]:
+                    del self._namespaces[name]
+                    evicted += 1
+            self.stats["evictions"] += evicted
+        if evicted:
+            print(f"Evicted {evicted} idle namespace(s) from the resource cache")
+        return evicted
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: len(entry["sessions"]) for name, entry in self._namespaces.items()}
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Shared process-wide instance (outlives Streamlit reruns)
+# ------------------------------------------------------------------------
+_resources = ResourceManager()
+
+
+def get_resources() -> ResourceManager:
+    return _resources
@@ -0,0 +1,194 @@
+import os
+import re
+import sys
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from instrumentation import span
+
+
+# ------------------------------------------------------------------------
+# config: Cache sizes and time-to-live
+# ------------------------------------------------------------------------
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2048"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "1024"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "900"))
+RETRIEVAL_GENERATION_DIR = os.getenv("RETRIEVAL_GENERATION_DIR", os.path.join("data", "retrieval_generations"))
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Thread-safe LRU cache with per-entry time-to-live
+# ------------------------------------------------------------------------
+class LRUTTLCache:
+    def __init__(self, max_entries: int, ttl_seconds: float, sizeof=sys.getsizeof):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._sizeof = sizeof
+        self._data = OrderedDict()     # key -> (expires_at, value, size)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:  # expired
+                    self._pop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries:
+                self._pop(next(iter(self._data)))
+
+    def _pop(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def discard_where(self, predicate) -> int:
+        with self._lock:
+            doomed = [key for key in self._data if predicate(key)]
+            for key in doomed:
+                self._pop(key)
+            return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "memory_bytes": self._bytes,
+            }
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Size estimates for cached values
+# ------------------------------------------------------------------------
+def _vector_size(vector) -> int:
+    return sys.getsizeof(vector) + 24 * len(vector)  # list of Python floats
+
+
+def _docs_size(docs) -> int:
+    return sum(sys.getsizeof(doc.page_content) + sys.getsizeof(str(doc.metadata)) for doc in docs)
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Normalize question text so trivially different phrasings share an entry
+# ------------------------------------------------------------------------
+def normalize_query(text: str) -> str:
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip("?!. ")
+
+
+def vector_hash(vector) -> str:
+    return hashlib.sha1(np.asarray(vector, dtype=np.float32).tobytes()).hexdigest()
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Process-wide caches + shared namespace generations for invalidation
+# ------------------------------------------------------------------------
+query_embedding_cache = LRUTTLCache(QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS, sizeof=_vector_size)
+retrieval_cache = LRUTTLCache(RETRIEVAL_CACHE_MAX_ENTRIES, RETRIEVAL_CACHE_TTL_SECONDS, sizeof=_docs_size)
+
+
+# One small file per namespace holds its current generation token. Any process that
+# re-ingests rewrites it, so every other process's cached keys stop matching too.
+def _generation_path(namespace: str) -> str:
+    return os.path.join(RETRIEVAL_GENERATION_DIR, re.sub(r"[^A-Za-z0-9_.-]+", "_", namespace or "__default__"))
+
+
+def namespace_generation(namespace: str) -> str:
+    try:
+        with open(_generation_path(namespace), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def invalidate_namespace(namespace: str) -> int:
+    # Called after (re-)ingestion: write a new generation so stale keys can never match, then purge them
+    path = _generation_path(namespace)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(uuid.uuid4().hex)
+    os.replace(tmp_path, path)
+    return retrieval_cache.discard_where(lambda key: key[0] == namespace)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Embeddings wrapper that caches embed_query by normalized text
+# ------------------------------------------------------------------------
+class CachedEmbeddings:
+    def __init__(self, embeddings, cache: LRUTTLCache = query_embedding_cache, model_name: str = ""):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or getattr(embeddings, "model_name", type(embeddings).__name__)
+
+    def embed_query(self, text: str) -> list:
+        key = (self.model_name, normalize_query(text))
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+    def embed_documents(self, texts: list) -> list:
+        return self.embeddings.embed_documents(texts)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Cached top-k retrieval keyed by (namespace, generation, query-vector hash, k)
+# ------------------------------------------------------------------------
+def cached_retrieve(vectordb, namespace: str, query: str, k: int = 4, embeddings: CachedEmbeddings = None) -> list:
+    with span("retrieval", namespace=namespace, k=k) as s:
+        embeddings = embeddings or CachedEmbeddings(vectordb.embeddings)
+        vector = embeddings.embed_query(query)
+        key = (namespace, namespace_generation(namespace), vector_hash(vector), k)
+        docs = retrieval_cache.get(key)
+        s.set(cache_hit=docs is not None)
+        if docs is None:
+            docs = vectordb.similarity_search_by_vector(vector, k=k)
+            retrieval_cache.put(key, docs)
+        return docs
+
+
+def cache_stats() -> dict:
+    return {"query_embeddings": query_embedding_cache.stats(), "retrieval": retrieval_cache.stats()}
@@ -0,0 +1,126 @@
+import os
+import re
+
+from map_reduce_summary import get_token_counter
+
+
+# ------------------------------------------------------------------------
+# config: Token budget per chunk and overlap carried into the next chunk
+# ------------------------------------------------------------------------
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "100"))                  # ~400 characters of English
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "20"))   # trailing units repeated in the next chunk
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*(?=\s|$)")
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Split one Whisper segment into sentence pieces with transcript offsets
+# ------------------------------------------------------------------------
+def segment_units(segment: dict, char_start: int, count_tokens, max_tokens: int) -> list:
+    text = segment["text"]
+    cuts = [match.end() for match in SENTENCE_END.finditer(text)]
+    if not cuts or cuts[-1] < len(text):
+        cuts.append(len(text))  # trailing words (or whitespace) stay with this segment
+
+    units, previous = [], 0
+    for cut in cuts:
+        piece = text[previous:cut]
+        if piece.strip():
+            unit = {"text": piece, "char_start": char_start + previous, "start": segment["start"],
+                    "end": segment["end"], "tokens": count_tokens(piece),
+                    "sentence_end": SENTENCE_END.search(piece.rstrip()) is not None}
+            units.extend(_split_long_unit(unit, count_tokens, max_tokens) if unit["tokens"] > max_tokens else [unit])
+        elif units:
+            units[-1]["text"] += piece  # keep whitespace so offsets stay contiguous
+        previous = cut
+    return units
+
+
+def _split_long_unit(unit: dict, count_tokens, max_tokens: int) -> list:
+    # An unpunctuated run over budget: cut on word boundaries, one token count per word
+    pieces, start, tokens = [], 0, 0
+    for match in re.finditer(r"\s*\S+", unit["text"]):
+        word_tokens = count_tokens(match.group(0))
+        if tokens and tokens + word_tokens > max_tokens:
+            pieces.append((start, match.start(), tokens))
+            start, tokens = match.start(), 0
+        tokens += word_tokens
+    pieces.append((start, len(unit["text"]), tokens))
+    return [{**unit, "text": unit["text"][lo:hi], "char_start": unit["char_start"] + lo, "tokens": tokens,
+             "sentence_end": unit["sentence_end"] and hi == len(unit["text"])} for lo, hi, tokens in pieces]
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Streaming token-budget chunker over segments (sentence/segment boundaries)
+# ------------------------------------------------------------------------
+class SegmentChunker:
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                 count_tokens=None):
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = min(overlap_tokens, chunk_tokens // 2)
+        self.count_tokens = count_tokens or get_token_counter()
+        self._units = []       # units of the chunk being built (overlap first)
+        self._tokens = 0
+        self._fresh = 0        # units not yet part of an emitted chunk
+        self._chars = 0        # transcript char offset of the next segment
+
+    def add(self, segment: dict) -> list:
+        chunks = []
+        for unit in segment_units(segment, self._chars, self.count_tokens, self.chunk_tokens):
+            while self._fresh and self._tokens + unit["tokens"] > self.chunk_tokens:
+                chunks.append(self._emit())
+            while self._units and self._tokens + unit["tokens"] > self.chunk_tokens and not self._fresh:
+                self._tokens -= self._units.pop(0)["tokens"]  # overlap would overflow the budget
+            self._units.append(unit)
+            self._tokens += unit["tokens"]
+            self._fresh += 1
+        self._chars += len(segment["text"])
+        return chunks
+
+    def finish(self) -> list:
+        chunks = []
+        while self._fresh:
+            chunks.append(self._emit())
+        return chunks
+
+    def _emit(self) -> dict:
+        # Cut after the last sentence end once the chunk is half full, else at the last unit
+        cut, tokens = len(self._units), 0
+        first_fresh = len(self._units) - self._fresh  # the cut must make progress past the overlap
+        for i, unit in enumerate(self._units):
+            tokens += unit["tokens"]
+            if unit["sentence_end"] and tokens >= self.chunk_tokens // 2 and i >= first_fresh:
+                cut = i + 1
+        units, rest = self._units[:cut], self._units[cut:]
+
+        overlap, overlap_tokens = [], 0
+        for unit in reversed(units[1:]):  # never repeat the whole chunk
+            if overlap_tokens + unit["tokens"] > self.overlap_tokens:
+                break
+            overlap.insert(0, unit)
+            overlap_tokens += unit["tokens"]
+
+        self._units = overlap + rest
+        self._tokens = sum(unit["tokens"] for unit in self._units)
+        self._fresh = len(rest)
+        return self._chunk(units)
+
+    @staticmethod
+    def _chunk(units: list) -> dict:
+        raw = "".join(unit["text"] for unit in units)
+        text = raw.strip()
+        char_start = units[0]["char_start"] + (len(raw) - len(raw.lstrip()))
+        return {"text": text, "char_start": char_start, "char_end": char_start + len(text),
+                "start": units[0]["start"], "end": units[-1]["end"], "tokens": sum(u["tokens"] for u in units)}
+
+
+def chunk_segments(segments, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                   count_tokens=None):
+    # Generator: yields chunks while segments are still being read (one pass, linear time)
+    chunker = SegmentChunker(chunk_tokens, overlap_tokens, count_tokens)
+    for segment in segments:
+        yield from chunker.add(segment)
+    yield from chunker.finish()
@@ -0,0 +1,140 @@
+import os
+import re
+import uuid
+import threading
+
+
+# ------------------------------------------------------------------------
+# config: Legacy single-user handoff file (read only as a fallback)
+# ------------------------------------------------------------------------
+NAMESPACE_FILE = "current_namespace.txt"
+DATA_DIR = "data"
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Same normalization the ingestion pipeline applies to titles
+# ------------------------------------------------------------------------
+def normalize_namespace(title: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", title.lower().replace("&", "and")).strip("_")
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Per-session / per-request context (namespace + lazily opened handles)
+# ------------------------------------------------------------------------
+class SessionContext:
+    def __init__(self, namespace: str = None, session_id: str = None, data_dir: str = DATA_DIR,
+                 embedding_model: str = EMBEDDING_MODEL_NAME, llm=None):
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.namespace = normalize_namespace(namespace) if namespace else None
+        self.data_dir = data_dir
+        self.embedding_model = embedding_model
+        self.llm = llm                      # optional injected chat model (None = module default)
+        self._transcript = None
+        self._vectorstore = None
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"SessionContext(session_id={self.session_id!r}, namespace={self.namespace!r})"
+
+    def set_namespace(self, namespace: str):
+        # Switching videos drops handles that belong to the previous namespace
+        with self._lock:
+            namespace = normalize_namespace(namespace)
+            if namespace != self.namespace:
+                if self.namespace:
+                    from resources import get_resources
+                    get_resources().release_session(self.session_id, self.namespace)
+                self._close_handles()
+                self.namespace = namespace
+
+    def require_namespace(self) -> str:
+        if not self.namespace:
+            raise RuntimeError("No video has been processed in this session yet.")
+        return self.namespace
+
+    @property
+    def transcript_path(self) -> str:
+        expected = f"{self.require_namespace()}_transcription.txt"
+        for filename in os.listdir(self.data_dir):
+            if filename.lower() == expected.lower():
+                return os.path.join(self.data_dir, filename)
+        raise FileNotFoundError(f"No matching transcript file found for: {expected}")
+
+    @property
+    def transcript(self):
+        # Memory-mapped transcript with segment timestamps (None for legacy text-only transcripts)
+        with self._lock:
+            if self._transcript is None:
+                from transcript_store import Transcript
+                try:
+                    self._transcript = Transcript(self.transcript_path)
+                except FileNotFoundError:
+                    return None
+            return self._transcript
+
+    def read_transcript(self) -> str:
+        transcript = self.transcript
+        if transcript is not None:
+            return transcript.text
+        with open(self.transcript_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    @property
+    def embeddings(self):
+        from model_registry import get_embeddings
+        return get_embeddings(self.embedding_model)  # shared across sessions by the registry
+
+    @property
+    def vectorstore(self):
+        with self._lock:
+            if self._vectorstore is None:
+                from resources import get_resources
+                self._vectorstore = get_resources().get_vectorstore(self.require_namespace())  # shared per namespace
+            return self._vectorstore
+
+    def qa_chain(self):
+        # Shared vector store + LLM client, conversation memory private to this session
+        from resources import get_resources
+        return get_resources().get_qa_chain(self.require_namespace(), self.session_id, llm=self.llm)
+
+    def _close_handles(self):
+        if self._transcript is not None:
+            self._transcript.close()
+        self._transcript = None
+        self._vectorstore = None
+
+    def close(self):
+        with self._lock:
+            self._close_handles()
+
+    @classmethod
+    def from_namespace_file(cls, path: str = NAMESPACE_FILE, **kwargs):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(namespace=f.read().strip(), **kwargs)
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Use the given context, else fall back to the legacy namespace file
+# ------------------------------------------------------------------------
+def resolve_context(ctx: SessionContext = None) -> SessionContext:
+    if ctx is not None and ctx.namespace:
+        return ctx
+    try:
+        fallback = SessionContext.from_namespace_file()
+    except FileNotFoundError:
+        raise RuntimeError("No session context given and no current_namespace.txt to fall back to.")
+    print(f"⚠️ No session context given; falling back to {NAMESPACE_FILE} ({fallback.namespace})")
+    return fallback
+
+
+def write_namespace_file(namespace: str, path: str = NAMESPACE_FILE):
+    # Kept for single-user CLI scripts; multi-session code passes a SessionContext instead
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(namespace)
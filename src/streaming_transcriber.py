@@ -0,0 +1,185 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from transcript_store import TranscriptStoreWriter
+from whisper_backends import WHISPER_THREADS, WHISPER_BATCH_SIZE, set_threads, transcribe_batch
+
+
+# ------------------------------------------------------------------------
+# config: VAD and worker-pool defaults
+# ------------------------------------------------------------------------
+SAMPLE_RATE = 16000                      # Whisper's native input rate
+VAD_FRAME_MS = 30                        # energy is measured per 30 ms frame
+VAD_MIN_SILENCE_MS = 500                 # a pause this long ends a speech segment
+VAD_ENERGY_RATIO = 0.1                   # silence = frame RMS below 10% of the loud-frame level
+VAD_MIN_RMS = 1e-3                       # absolute floor so digital silence never counts as speech
+MAX_SEGMENT_SECONDS = 30.0               # Whisper decodes 30 s windows; longer speech is cut
+MIN_SEGMENT_SECONDS = 0.3                # drop clicks and breaths
+SEGMENT_PADDING_MS = 200                 # keep a little context around each cut
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Decode any ffmpeg-readable file to 16 kHz mono float32 PCM
+# ------------------------------------------------------------------------
+def load_pcm(audio_path: str) -> np.ndarray:
+    import whisper
+    return whisper.load_audio(audio_path, sr=SAMPLE_RATE)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Energy-based voice activity detection → (start_sample, end_sample) spans
+# ------------------------------------------------------------------------
+def vad_segments(samples: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                 frame_ms: int = VAD_FRAME_MS, min_silence_ms: int = VAD_MIN_SILENCE_MS,
+                 max_segment_seconds: float = MAX_SEGMENT_SECONDS) -> list:
+    frame_len = int(sample_rate * frame_ms / 1000)
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+    threshold = max(VAD_MIN_RMS, VAD_ENERGY_RATIO * float(np.percentile(rms, 95)))
+    voiced = rms >= threshold
+
+    min_silence_frames = max(1, min_silence_ms // frame_ms)
+    max_frames = max(1, int(max_segment_seconds * 1000 / frame_ms))
+    pad = SEGMENT_PADDING_MS // frame_ms
+
+    spans, start, silence = [], None, 0
+    for i, is_voiced in enumerate(voiced):
+        if is_voiced:
+            if start is None:
+                start = i
+            silence = 0
+        elif start is not None:
+            silence += 1
+            if silence >= min_silence_frames:
+                spans.append((start, i - silence + 1))
+                start, silence = None, 0
+        # Never hand Whisper more than one window; cut at the quietest recent frame
+        if start is not None and i - start + 1 >= max_frames:
+            window = rms[start + max_frames // 2:i + 1]
+            cut = start + max_frames // 2 + int(np.argmin(window)) + 1
+            spans.append((start, cut))
+            start, silence = (cut if cut <= i else None), 0
+    if start is not None:
+        spans.append((start, n_frames))
+
+    min_frames = int(MIN_SEGMENT_SECONDS * 1000 / frame_ms)
+    segments = []
+    for s, e in spans:
+        if e - s < min_frames:
+            continue
+        s_sample = max(0, (s - pad) * frame_len)
+        e_sample = min(len(samples), (e + pad) * frame_len)
+        if segments and s_sample < segments[-1][1]:
+            s_sample = segments[-1][1]  # padding must not make neighbours overlap
+        segments.append((s_sample, e_sample))
+    return segments
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Worker-side model handle (one Whisper model per worker process)
+# ------------------------------------------------------------------------
+_worker_model = None
+
+
+def _init_worker(model_size: str, threads: int):
+    global _worker_model
+    from model_registry import get_whisper_model
+    set_threads(threads)  # avoid oversubscribing cores across workers
+    _worker_model = get_whisper_model(model_size)
+
+
+def decode_spans(model, start_samples: list, pcms: list, sample_rate: int = SAMPLE_RATE) -> list:
+    # One VAD segment per call, or a batch of them decoded together (WHISPER_BATCH_SIZE > 1)
+    if len(pcms) == 1:
+        results = [model.transcribe(pcms[0], fp16=False, condition_on_previous_text=False).get("segments", [])]
+    else:
+        results = transcribe_batch(model, pcms)
+    segments = []
+    for start_sample, result in zip(start_samples, results):
+        offset = start_sample / sample_rate
+        segments += [
+            {"start": round(offset + seg["start"], 3), "end": round(offset + seg["end"], 3), "text": seg["text"]}
+            for seg in result
+        ]
+    return segments
+
+
+def _transcribe_spans(index: int, start_samples: list, pcms: list, sample_rate: int) -> tuple:
+    return index, decode_spans(_worker_model, start_samples, pcms, sample_rate)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Stream timestamped segments, in order, as the worker pool finishes them
+# ------------------------------------------------------------------------
+def stream_transcription(audio_path: str, model_size: str = "tiny", workers: int = TRANSCRIBE_WORKERS,
+                         batch_size: int = WHISPER_BATCH_SIZE):
+    samples = load_pcm(audio_path)
+    spans = vad_segments(samples)
+    print(f"VAD found {len(spans)} speech segments in {len(samples) / SAMPLE_RATE:.1f}s of audio.")
+    size = max(1, batch_size)
+    batches = [spans[i:i + size] for i in range(0, len(spans), size)]
+
+    if workers <= 1:
+        # Single worker: transcribe inline, no process start-up cost
+        _init_worker(model_size, WHISPER_THREADS or os.cpu_count() or 1)
+        for index, batch in enumerate(batches):
+            yield from _transcribe_spans(index, [s for s, _ in batch], [samples[s:e] for s, e in batch],
+                                         SAMPLE_RATE)[1]
+        return
+
+    threads = WHISPER_THREADS or max(1, (os.cpu_count() or workers) // workers)
+    context = multiprocessing.get_context("spawn")  # fork is unsafe once torch has started threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(model_size, threads)) as pool:
+        pending = {}
+        batch_iter = iter(enumerate(batches))
+        max_in_flight = workers * 2  # bounded so long files don't queue every slice at once
+
+        def submit_more():
+            while len(pending) < max_in_flight:
+                item = next(batch_iter, None)
+                if item is None:
+                    return
+                index, batch = item
+                pending[index] = pool.submit(_transcribe_spans, index, [s for s, _ in batch],
+                                             [samples[s:e] for s, e in batch], SAMPLE_RATE)
+
+        try:
+            submit_more()
+            # Batches are submitted in order, so the head of the stream is always in flight
+            for next_index in range(len(batches)):
+                _, segments = pending.pop(next_index).result()
+                submit_more()
+                yield from segments
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)  # consumer stopped early or a worker failed
+
+
+
+
+# ------------------------------------------------------------------------
+# main: Transcribe while writing; yields each segment so callers can start early
+# ------------------------------------------------------------------------
+def transcribe_audio_streaming(audio_path: str, output_text_path: str = "transcription.txt",
+                               model_size: str = "tiny", workers: int = TRANSCRIBE_WORKERS):
+    with TranscriptStoreWriter(output_text_path) as writer:
+        for segment in stream_transcription(audio_path, model_size=model_size, workers=workers):
+            writer.write(segment)
+            yield segment
+    print(f"Streaming transcription completed: {output_text_path} ({writer.count} segments)")
@@ -0,0 +1,108 @@
+# stub_yt_dlp.py
+#
+# Minimal local stand-in for the yt-dlp CLI, for offline runs of the pipeline:
+#   YTDLP_CMD="python src/stub_yt_dlp.py" streamlit run deployment/streamlit_app_final.py
+# Honors "-o <template>" and "--print after_move:%()j" the way picone calls yt-dlp,
+# and "--flat-playlist -J" the way bulk_ingest expands playlists and channels.
+
+import os
+import re
+import sys
+import json
+import math
+import shutil
+import struct
+import wave
+
+
+# ------------------------------------------------------------------------
+# config: Stub behaviour (overridable through the environment)
+# ------------------------------------------------------------------------
+STUB_AUDIO_SOURCE = os.getenv("STUB_AUDIO_SOURCE")            # copy this WAV instead of synthesizing one
+STUB_DURATION_SECONDS = float(os.getenv("STUB_DURATION_SECONDS", "2"))
+STUB_PLAYLIST_SIZE = int(os.getenv("STUB_PLAYLIST_SIZE", "3"))  # entries returned for --flat-playlist
+STUB_SAMPLE_RATE = 16000
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Write a short 16 kHz mono tone so downstream decoders get valid audio
+# ------------------------------------------------------------------------
+def write_tone(path, seconds=STUB_DURATION_SECONDS, frequency=440.0):
+    frames = int(seconds * STUB_SAMPLE_RATE)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(STUB_SAMPLE_RATE)
+        wav.writeframes(b"".join(
+            struct.pack("<h", int(3000 * math.sin(2 * math.pi * frequency * i / STUB_SAMPLE_RATE)))
+            for i in range(frames)
+        ))
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Flat playlist listing (stable fake video IDs derived from the URL)
+# ------------------------------------------------------------------------
+def playlist_info(url):
+    prefix = re.sub(r"[^A-Za-z0-9]", "", url)[-7:].rjust(7, "x")
+    entries = [
+        {"_type": "url", "id": f"{prefix}{i:04d}", "url": f"https://www.youtube.com/watch?v={prefix}{i:04d}",
+         "title": f"Stub Playlist Video {i}", "duration": STUB_DURATION_SECONDS}
+        for i in range(STUB_PLAYLIST_SIZE)
+    ]
+    return {"_type": "playlist", "id": prefix, "title": "Stub Playlist", "webpage_url": url, "entries": entries}
+
+
+
+
+# ------------------------------------------------------------------------
+# main: Parse the yt-dlp arguments picone uses and emulate a download
+# ------------------------------------------------------------------------
+def main(argv):
+    template = "%(id)s.%(ext)s"
+    print_json = False
+    url = argv[-1] if argv else ""
+
+    for i, arg in enumerate(argv):
+        if arg == "-o" and i + 1 < len(argv):
+            template = argv[i + 1]
+        if arg == "--print" and i + 1 < len(argv) and "%()j" in argv[i + 1]:
+            print_json = True
+
+    if "--flat-playlist" in argv and "-J" in argv:
+        print(json.dumps(playlist_info(url)))
+        return 0
+
+    match = re.search(r"(?:v=|youtu\.be/|/shorts/)([A-Za-z0-9_-]{11})", url)
+    video_id = match.group(1) if match else "stubvideo00"
+    filepath = template.replace("%(id)s", video_id).replace("%(ext)s", "wav")
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+
+    if STUB_AUDIO_SOURCE:
+        shutil.copyfile(STUB_AUDIO_SOURCE, filepath)
+    else:
+        write_tone(filepath)
+
+    with wave.open(filepath, "rb") as wav:
+        duration = wav.getnframes() / wav.getframerate()
+
+    info = {
+        "id": video_id,
+        "title": os.getenv("STUB_TITLE", f"Stub Video {video_id}"),
+        "description": "Generated by stub_yt_dlp.py",
+        "uploader": "stub",
+        "duration": duration,
+        "ext": "wav",
+        "filepath": filepath,
+        "webpage_url": url,
+    }
+    if print_json:
+        print(json.dumps(info))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -9,8 +9,10 @@ from reportlab.lib.utils import ImageReader
 from PIL import Image
 from io import BytesIO
 
-from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain.chat_models import ChatOpenAI
+from session_context import resolve_context
+from map_reduce_summary import MapReduceSummarizer, get_rate_limiter
+from token_stream import TokenStream
+from instrumentation import span
 
 
 
@@ -21,45 +23,28 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # 🔐 Avoid hardcoding API keys
 
 
 # ------------------------------------------------------------------------
-# feat: Load transcript and namespace from local file
+# feat: Load transcript and namespace for the caller's session
 # ------------------------------------------------------------------------
-def load_transcript():
-    with open("current_namespace.txt", "r", encoding="utf-8") as f:
-        namespace = f.read().strip()
-
-    # Find transcript file using normalized namespace
-    transcript_path = None
-    for f in os.listdir("data"):
-        if f.lower() == f"{namespace}_transcription.txt".lower():
-            transcript_path = os.path.join("data", f)
-            break
-
-    if not transcript_path:
-        raise FileNotFoundError("Transcript file not found.")
-
-    with open(transcript_path, "r", encoding="utf-8") as f:
-        return f.read(), namespace
+def load_transcript(ctx=None):
+    ctx = resolve_context(ctx)  # falls back to current_namespace.txt for single-user scripts
+    return ctx.read_transcript(), ctx.namespace
 
 
 
 
 # ------------------------------------------------------------------------
-# feat: Summarize a transcript using LLM (5–7 sentence summary)
+# feat: Summarize a full transcript using LLM (5–7 sentence summary)
 # ------------------------------------------------------------------------
-def summarize_transcript(transcript_text):
-    prompt = ChatPromptTemplate.from_messages([
-        SystemMessagePromptTemplate.from_template(
-            "You are a helpful assistant. Summarize the transcript in 5-7 sentences using only the information from the transcript."
-        ),
-        HumanMessagePromptTemplate.from_template("Transcript:\n{transcript}\n\nSummary:")
-    ])
+def summarize_transcript(transcript_text, llm=None):
+    # Whole transcript via token-aware map-reduce (short transcripts still take a single call)
+    summarizer = MapReduceSummarizer(llm=llm, temperature=0.4, rate_limiter=get_rate_limiter())
+    return summarizer.summarize(transcript_text)
 
-    # Use OpenAI's GPT model with moderate creativity
-    llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.4, openai_api_key=OPENAI_API_KEY)
-    chain = prompt | llm
 
-    # Limit input to 4000 chars to avoid token overflow
-    return chain.invoke({"transcript": transcript_text[:4000]}).content
+def stream_summary(transcript_text, llm=None):
+    # Same summary, with the final pass streamed (iterate, or st.write_stream, for tokens as they arrive)
+    summarizer = MapReduceSummarizer(llm=llm, temperature=0.4, rate_limiter=get_rate_limiter())
+    return TokenStream("summary", summarizer.stream(transcript_text))
 
 
 
@@ -106,39 +91,41 @@ def generate_pdf(summary_text, title, image=None):
     safe_title = re.sub(r"[^\w\s]", "", title).replace(" ", "_")
     pdf_path = f"{safe_title}.pdf"
 
-    c = canvas.Canvas(pdf_path, pagesize=letter)
-    width, height = letter
-
-    # Add title
-    y = height - 75
-    c.setFont("Helvetica-Bold", 20)
-    c.drawString(80, y, title)
-    y -= 30
-
-    # Add image if provided
-    if image:
-        try:
-            image = image.resize((500, 250))
-            img_buffer = BytesIO()
-            image.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
-            c.drawImage(ImageReader(img_buffer), 50, y - 250)
-            y -= 270
-        except Exception:
-            pass  # Skip image if any issues occur
-
-    # Add summary text (wrapped to page width)
-    c.setFont("Helvetica", 12)
-    wrapped_lines = wrap_text(summary_text, max_chars=100)
-    for line in wrapped_lines:
-        if y < 50:  # Add page break if needed
-            c.showPage()
-            y = height - 50
-            c.setFont("Helvetica", 12)
-        c.drawString(50, y, line)
-        y -= 20
-
-    c.save()
+    with span("pdf", chars=len(summary_text)) as s:
+        c = canvas.Canvas(pdf_path, pagesize=letter)
+        width, height = letter
+
+        # Add title
+        y = height - 75
+        c.setFont("Helvetica-Bold", 20)
+        c.drawString(80, y, title)
+        y -= 30
+
+        # Add image if provided
+        if image:
+            try:
+                image = image.resize((500, 250))
+                img_buffer = BytesIO()
+                image.save(img_buffer, format='PNG')
+                img_buffer.seek(0)
+                c.drawImage(ImageReader(img_buffer), 50, y - 250)
+                y -= 270
+            except Exception:
+                pass  # Skip image if any issues occur
+
+        # Add summary text (wrapped to page width)
+        c.setFont("Helvetica", 12)
+        wrapped_lines = wrap_text(summary_text, max_chars=100)
+        for line in wrapped_lines:
+            if y < 50:  # Add page break if needed
+                c.showPage()
+                y = height - 50
+                c.setFont("Helvetica", 12)
+            c.drawString(50, y, line)
+            y -= 20
+
+        c.save()
+        s.set(bytes=os.path.getsize(pdf_path))
     return pdf_path
 
 
@@ -170,7 +157,8 @@ def send_email_with_pdf(pdf_path, recipient_emails, sender_email, app_password):
 
     # Connect to Gmail SMTP and send
     try:
-        with smtplib.SMTP("smtp.gmail.com", 587, timeout=10) as smtp:
+        with span("email", recipients=len(recipient_emails), bytes=os.path.getsize(pdf_path)), \
+                smtplib.SMTP("smtp.gmail.com", 587, timeout=10) as smtp:
             smtp.starttls()
             smtp.login(sender_email, app_password)
             smtp.send_message(msg)
@@ -0,0 +1,375 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import hashlib
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from map_reduce_summary import (MapReduceSummarizer, RateLimiter, SummaryCache, PROMPTS_HASH, SUMMARY_MODEL,
+                                SUMMARY_CHUNK_TOKENS, SUMMARY_REDUCE_TOKENS, SUMMARY_REQUESTS_PER_MINUTE,
+                                get_rate_limiter, model_name, split_sentences)
+from instrumentation import span, bind_context
+
+
+# ------------------------------------------------------------------------
+# config: Dataset file, prediction cache, concurrency and truncation
+# ------------------------------------------------------------------------
+EVAL_DATA_FILE = os.getenv("EVAL_DATA_FILE", os.path.join("data", "eval", "cnn_dailymail_test.jsonl"))
+EVAL_CACHE_DIR = os.getenv("EVAL_CACHE_DIR", os.path.join("data", "eval", "predictions"))
+EVAL_REPORT_DIR = os.getenv("EVAL_REPORT_DIR", os.path.join("data", "eval", "reports"))
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "8"))                          # articles summarized concurrently
+EVAL_REQUESTS_PER_MINUTE = float(os.getenv("EVAL_REQUESTS_PER_MINUTE", str(SUMMARY_REQUESTS_PER_MINUTE)))
+EVAL_MAX_CHARS = int(os.getenv("EVAL_MAX_CHARS", "0"))                      # > 0: truncate inputs before summarizing
+EVAL_PROMPT_VERSION = os.getenv("EVAL_PROMPT_VERSION", "")                  # empty: derived from prompts + settings
+ROUGE_TYPES = ("rouge1", "rouge2", "rougeL", "rougeLsum")
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Prompt version (changes whenever prompts, token budgets or truncation change)
+# ------------------------------------------------------------------------
+def prompt_version(max_chars: int = EVAL_MAX_CHARS, chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+                   reduce_tokens: int = SUMMARY_REDUCE_TOKENS) -> str:
+    if EVAL_PROMPT_VERSION:
+        return EVAL_PROMPT_VERSION
+    # The summarizer's own prompt hash (it also keys the partial-summary cache), plus the eval settings
+    settings = f"prompts={PROMPTS_HASH};chunk={chunk_tokens};reduce={reduce_tokens};max_chars={max_chars}"
+    return hashlib.sha1(settings.encode("utf-8")).hexdigest()[:12]
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Local dataset files (JSONL, JSON list or CSV with article/reference columns)
+# ------------------------------------------------------------------------
+def load_examples(path: str, limit: int = None, input_field: str = "article",
+                  reference_field: str = "highlights") -> list:
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+    elif path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+
+    examples = []
+    for i, row in enumerate(rows[:limit] if limit else rows):
+        examples.append({"id": str(row.get("id") or i), "input": row[input_field],
+                         "reference": row[reference_field]})
+    return examples
+
+
+def export_hf_dataset(path: str, name: str = "cnn_dailymail", config: str = "3.0.0", split: str = "test[:100]"):
+    # One-time download with `datasets`; evaluation runs only read the local file afterwards
+    from datasets import load_dataset
+    dataset = load_dataset(name, config, split=split)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        for row in dataset:
+            f.write(json.dumps({"id": row.get("id"), "article": row["article"], "highlights": row["highlights"]},
+                               ensure_ascii=False) + "\n")
+    os.replace(path + ".tmp", path)
+    print(f"Exported {len(dataset)} examples to {path}")
+    return path
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: On-disk prediction cache keyed by (prompt version, input hash, model)
+# ------------------------------------------------------------------------
+class PredictionCache:
+    def __init__(self, directory: str = EVAL_CACHE_DIR):
+        self.directory = directory
+
+    @staticmethod
+    def key(version: str, text: str, model: str) -> str:
+        return SummaryCache.key(version, hashlib.sha1(text.encode("utf-8")).hexdigest(), model)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, entry: dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: ROUGE-1/2/L/Lsum F1 (same tokenization as rouge_score, no stemming), accumulated per example
+# ------------------------------------------------------------------------
+def _tokens(text: str) -> list:
+    return "".join(ch if ch.isalnum() and ch.isascii() else " " for ch in text.lower()).split()
+
+
+def _f1(hits: int, reference_len: int, prediction_len: int) -> float:
+    if not hits:
+        return 0.0
+    precision, recall = hits / prediction_len, hits / reference_len
+    return 2 * precision * recall / (precision + recall)
+
+
+def _ngram_f1(reference: list, prediction: list, n: int) -> float:
+    ref = Counter(tuple(reference[i:i + n]) for i in range(len(reference) - n + 1))
+    pred = Counter(tuple(prediction[i:i + n]) for i in range(len(prediction) - n + 1))
+    return _f1(sum((ref & pred).values()), sum(ref.values()), sum(pred.values()))
+
+
+def _lcs_table(a: list, b: list) -> list:
+    table = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i, x in enumerate(a, start=1):
+        row, previous = table[i], table[i - 1]
+        for j, y in enumerate(b, start=1):
+            row[j] = previous[j - 1] + 1 if x == y else max(previous[j], row[j - 1])
+    return table
+
+
+def _lcs_indices(a: list, b: list) -> set:
+    # Positions in `a` that belong to one longest common subsequence with `b`
+    table, i, j, indices = _lcs_table(a, b), len(a), len(b), set()
+    while i and j:
+        if a[i - 1] == b[j - 1]:
+            indices.add(i - 1)
+            i, j = i - 1, j - 1
+        elif table[i - 1][j] >= table[i][j - 1]:
+            i -= 1
+        else:
+            j -= 1
+    return indices
+
+
+def _summary_lcs_f1(reference_sentences: list, prediction_sentences: list) -> float:
+    # rougeLsum: union LCS of each reference sentence against every predicted sentence
+    ref_counts = Counter(t for s in reference_sentences for t in s)
+    pred_counts = Counter(t for s in prediction_sentences for t in s)
+    hits = 0
+    for sentence in reference_sentences:
+        union = set().union(*(_lcs_indices(sentence, p) for p in prediction_sentences))
+        for token in (sentence[i] for i in sorted(union)):
+            if ref_counts[token] > 0 and pred_counts[token] > 0:
+                hits += 1
+                ref_counts[token] -= 1
+                pred_counts[token] -= 1
+    return _f1(hits, sum(len(s) for s in reference_sentences), sum(len(s) for s in prediction_sentences))
+
+
+def _sentences(text: str) -> list:
+    # Highlights come one per line; LLM summaries are a paragraph, so split those on punctuation
+    lines = [line for line in text.split("\n") if line.strip()]
+    return lines if len(lines) > 1 else split_sentences(text)
+
+
+def rouge_scores(prediction: str, reference: str) -> dict:
+    pred, ref = _tokens(prediction), _tokens(reference)
+    if not pred or not ref:
+        return {name: 0.0 for name in ROUGE_TYPES}
+    return {
+        "rouge1": _ngram_f1(ref, pred, 1),
+        "rouge2": _ngram_f1(ref, pred, 2),
+        "rougeL": _f1(_lcs_table(ref, pred)[-1][-1], len(ref), len(pred)),
+        "rougeLsum": _summary_lcs_f1([_tokens(s) for s in _sentences(reference)],
+                                     [_tokens(s) for s in _sentences(prediction)]),
+    }
+
+
+class RougeAccumulator:
+    def __init__(self):
+        self.totals = dict.fromkeys(ROUGE_TYPES, 0.0)
+        self.count = 0
+
+    def add(self, prediction: str, reference: str) -> dict:
+        scores = rouge_scores(prediction, reference)
+        for name, value in scores.items():
+            self.totals[name] += value
+        self.count += 1
+        return scores
+
+    def means(self) -> dict:
+        return {name: total / self.count if self.count else 0.0 for name, total in self.totals.items()}
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Concurrent evaluation runner (shared rate limiter, cached predictions, running ROUGE)
+# ------------------------------------------------------------------------
+class SummaryEvaluator:
+    def __init__(self, llm=None, model: str = SUMMARY_MODEL, workers: int = EVAL_WORKERS,
+                 rate_limiter: RateLimiter = None, max_chars: int = EVAL_MAX_CHARS,
+                 cache: PredictionCache = None, use_cache: bool = True):
+        if llm is None:
+            from langchain_community.chat_models import ChatOpenAI
+            llm = ChatOpenAI(model=model, temperature=0.4, openai_api_key=os.getenv("OPENAI_API_KEY"))
+        self.llm = llm
+        self.model = model_name(llm)
+        self.workers = workers
+        self.max_chars = max_chars
+        self.version = prompt_version(max_chars)
+        self.rate_limiter = rate_limiter or get_rate_limiter()  # the process-wide quota, shared by every worker
+        self.cache = cache or PredictionCache()
+        self.use_cache = use_cache
+        self._lock = threading.Lock()
+        self.llm_calls = 0
+
+    def _predict(self, example: dict) -> dict:
+        text = example["input"][:self.max_chars] if self.max_chars else example["input"]
+        key = PredictionCache.key(self.version, text, self.model)
+        with span("eval_example", chars=len(text)) as s:
+            cached = self.cache.get(key) if self.use_cache else None
+            s.set(cache_hit=cached is not None)
+            if cached is not None:
+                return {"id": example["id"], "prediction": cached["prediction"], "latency": cached["latency"],
+                        "cached": True, "error": None}
+
+            # Partial summaries are reused across runs too (their keys include the prompt hash)
+            summarizer = MapReduceSummarizer(llm=self.llm, rate_limiter=self.rate_limiter,
+                                             use_cache=self.use_cache, temperature=0.4)
+            started = time.perf_counter()
+            try:
+                prediction = summarizer.summarize(text)
+            except Exception as e:
+                return {"id": example["id"], "prediction": "", "latency": time.perf_counter() - started,
+                        "cached": False, "error": f"{type(e).__name__}: {e}"}
+            finally:
+                with self._lock:
+                    self.llm_calls += summarizer.llm_calls
+            latency = time.perf_counter() - started
+            self.cache.put(key, {"prediction": prediction, "latency": latency, "model": self.model,
+                                 "prompt_version": self.version})
+            return {"id": example["id"], "prediction": prediction, "latency": latency, "cached": False, "error": None}
+
+    def run(self, examples: list, verbose: bool = True) -> dict:
+        references = {example["id"]: example["reference"] for example in examples}
+        rouge = RougeAccumulator()
+        results = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="eval") as pool:
+            futures = [pool.submit(bind_context(self._predict), example) for example in examples]
+            for finished, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                if result["error"] is None:
+                    result["scores"] = rouge.add(result["prediction"], references[result["id"]])
+                results.append(result)
+                if verbose:
+                    status = "cached" if result["cached"] else result["error"] or f"{result['latency']:.2f}s"
+                    print(f"[{finished}/{len(examples)}] {result['id']}: {status}  "
+                          f"running rougeL {rouge.means()['rougeL']:.4f}")
+        wall = time.perf_counter() - started
+        return self.report(results, rouge, wall)
+
+    def report(self, results: list, rouge: RougeAccumulator, wall: float) -> dict:
+        fresh = np.array([r["latency"] for r in results if not r["cached"] and r["error"] is None] or [0.0])
+        completed = sum(r["error"] is None for r in results)
+        return {
+            "model": self.model,
+            "prompt_version": self.version,
+            "max_chars": self.max_chars,
+            "examples": len(results),
+            "errors": len(results) - completed,
+            "cache_hits": sum(r["cached"] for r in results),
+            "llm_calls": self.llm_calls,
+            "rouge": {name: round(value, 4) for name, value in rouge.means().items()},
+            "wall_seconds": round(wall, 3),
+            "examples_per_minute": round(60 * completed / wall, 2) if wall else 0.0,
+            "latency_p50": round(float(np.percentile(fresh, 50)), 3),
+            "latency_p95": round(float(np.percentile(fresh, 95)), 3),
+            "latency_mean": round(float(fresh.mean()), 3),
+            "results": sorted(results, key=lambda r: r["id"]),
+        }
+
+
+
+
+# ------------------------------------------------------------------------
+# cli: Evaluate summaries of a local dataset file and save the report
+# ------------------------------------------------------------------------
+def save_report(report: dict, directory: str = EVAL_REPORT_DIR) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{report['prompt_version']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def print_report(report: dict):
+    print("\n ROUGE Evaluation:")
+    for name, value in report["rouge"].items():
+        print(f"{name}: {value:.4f}")
+    print("\n Latency / throughput:")
+    for key in ("examples", "errors", "cache_hits", "llm_calls", "wall_seconds", "examples_per_minute",
+                "latency_p50", "latency_p95", "latency_mean"):
+        print(f"{key}: {report[key]}")
+
+
+def official_rouge(report: dict, examples: list) -> dict:
+    # Cross-check with Hugging Face `evaluate` (rouge_score) when it is installed
+    from evaluate import load
+    predictions = {r["id"]: r["prediction"] for r in report["results"]}
+    return load("rouge").compute(predictions=[predictions[e["id"]] for e in examples],
+                                 references=[e["reference"] for e in examples])
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Concurrent, cached ROUGE evaluation of transcript summaries.")
+    parser.add_argument("data", nargs="?", default=EVAL_DATA_FILE, help="JSONL, JSON or CSV file")
+    parser.add_argument("--limit", type=int, help="only the first N examples")
+    parser.add_argument("--input-field", default="article")
+    parser.add_argument("--reference-field", default="highlights")
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS, help="articles summarized concurrently")
+    parser.add_argument("--rpm", type=float, default=EVAL_REQUESTS_PER_MINUTE, help="LLM requests per minute")
+    parser.add_argument("--max-chars", type=int, default=EVAL_MAX_CHARS, help="truncate inputs (0: no truncation)")
+    parser.add_argument("--no-cache", action="store_true", help="recompute predictions (results are still cached)")
+    parser.add_argument("--export-hf", metavar="SPLIT", help="download cnn_dailymail 3.0.0 SPLIT to the data file first")
+    parser.add_argument("--official", action="store_true", help="also compute ROUGE with `evaluate`")
+    parser.add_argument("--fake-llm", action="store_true", help="offline run with a canned-answer LLM")
+    parser.add_argument("--quiet", action="store_true", help="no per-example progress lines")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv if argv is not None else sys.argv[1:])
+    if args.export_hf:
+        export_hf_dataset(args.data, split=args.export_hf)
+    examples = load_examples(args.data, args.limit, args.input_field, args.reference_field)
+
+    llm = None
+    if args.fake_llm:
+        from fakes import make_fake_llm
+        llm = make_fake_llm()
+    get_rate_limiter().set_rate(args.rpm)
+    evaluator = SummaryEvaluator(llm=llm, workers=args.workers,
+                                 max_chars=args.max_chars, use_cache=not args.no_cache)
+    print(f"Evaluating {len(examples)} examples with {args.workers} worker(s); "
+          f"model {evaluator.model}, prompt version {evaluator.version}")
+
+    report = evaluator.run(examples, verbose=not args.quiet)
+    print_report(report)
+    if args.official:
+        report["official_rouge"] = {k: round(float(v), 4) for k, v in official_rouge(report, examples).items()}
+        print(f"\n evaluate/rouge_score: {report['official_rouge']}")
+    print(f"\nReport saved to {save_report(report)}")
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
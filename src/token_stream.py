@@ -0,0 +1,104 @@
+import time
+import asyncio
+import threading
+
+import numpy as np
+
+
+# ------------------------------------------------------------------------
+# config: How many recent streams per feature the metrics keep
+# ------------------------------------------------------------------------
+STREAM_METRICS_WINDOW = 200
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Time-to-first-token / total latency per feature (qa, summary, quiz, agent)
+# ------------------------------------------------------------------------
+class StreamMetrics:
+    def __init__(self, window: int = STREAM_METRICS_WINDOW):
+        self.window = window
+        self._samples = {}  # feature -> [(ttft, total, pieces)]
+        self._lock = threading.Lock()
+
+    def record(self, feature: str, ttft: float, total: float, pieces: int):
+        with self._lock:
+            samples = self._samples.setdefault(feature, [])
+            samples.append((ttft, total, pieces))
+            del samples[:-self.window]
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = {feature: list(samples) for feature, samples in self._samples.items()}
+        stats = {}
+        for feature, samples in snapshot.items():
+            ttft = np.array([s[0] for s in samples if s[0] is not None] or [0.0])
+            total = np.array([s[1] for s in samples])
+            stats[feature] = {
+                "count": len(samples),
+                "ttft_p50": float(np.percentile(ttft, 50)),
+                "ttft_p95": float(np.percentile(ttft, 95)),
+                "total_p50": float(np.percentile(total, 50)),
+            }
+        return stats
+
+
+def get_stream_metrics() -> StreamMetrics:
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = StreamMetrics()
+        return _metrics
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Token stream wrapper (sync and async iteration, TTFT tracking)
+# ------------------------------------------------------------------------
+class TokenStream:
+    def __init__(self, feature: str, pieces, sources: list = None):
+        self.feature = feature
+        self._pieces = pieces              # iterable of text pieces, consumed once
+        self.sources = sources if sources is not None else []  # may be filled while streaming
+        self.text = ""
+        self.ttft = None                   # seconds until the first non-empty piece
+        self.total = None
+
+    def __iter__(self):
+        started = time.perf_counter()
+        count = 0
+        for piece in self._pieces:
+            if not piece:
+                continue
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - started
+            self.text += piece
+            count += 1
+            yield piece
+        self.total = time.perf_counter() - started
+        get_stream_metrics().record(self.feature, self.ttft, self.total, count)
+
+    async def __aiter__(self):
+        # Pull pieces on a worker thread so a blocking LLM client never stalls the event loop
+        iterator, done = iter(self), object()
+        while True:
+            piece = await asyncio.to_thread(next, iterator, done)
+            if piece is done:
+                break
+            yield piece
+
+    def read(self) -> str:
+        for _ in self:
+            pass
+        return self.text
+
+
+def message_pieces(chunks):
+    # LangChain chat models stream AIMessageChunk objects; runnables ending in a parser stream str
+    for chunk in chunks:
+        yield chunk if isinstance(chunk, str) else chunk.content
@@ -0,0 +1,208 @@
+import os
+import mmap
+import struct
+
+import numpy as np
+
+
+# ------------------------------------------------------------------------
+# config: On-disk layout
+#   <name>.txt       transcript text, stored once (UTF-8)
+#   <name>.segments  16-byte header + one 16-byte record per Whisper segment
+# ------------------------------------------------------------------------
+SEGMENTS_MAGIC = b"TSEG"
+SEGMENTS_VERSION = 1
+HEADER_FORMAT = "<4sIII"                 # magic, version, segment count, reserved
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+SEGMENT_DTYPE = np.dtype([
+    ("start", "<f4"),                    # seconds from video start
+    ("end", "<f4"),
+    ("char_start", "<u4"),               # offset of the segment's first character in the text
+    ("byte_start", "<u4"),               # same position in the UTF-8 file, for mmap slicing
+])
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Sidecar path for a transcript text file
+# ------------------------------------------------------------------------
+def segments_path_for(text_path: str) -> str:
+    root, _ = os.path.splitext(text_path)
+    return f"{root}.segments"
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Append-only writer (used while transcription is still streaming)
+# ------------------------------------------------------------------------
+class TranscriptStoreWriter:
+    def __init__(self, text_path: str):
+        self.text_path = text_path
+        self.segments_path = segments_path_for(text_path)
+        self._text = open(text_path, "wb")
+        self._segments = open(self.segments_path, "wb")
+        self._segments.write(struct.pack(HEADER_FORMAT, SEGMENTS_MAGIC, SEGMENTS_VERSION, 0, 0))
+        self.count = 0
+        self._chars = 0
+        self._bytes = 0
+
+    def write(self, segment: dict):
+        encoded = segment["text"].encode("utf-8")
+        record = np.array([(segment["start"], segment["end"], self._chars, self._bytes)], dtype=SEGMENT_DTYPE)
+        self._text.write(encoded)
+        self._segments.write(record.tobytes())
+        self._chars += len(segment["text"])
+        self._bytes += len(encoded)
+        self.count += 1
+
+        # Keep the header count current so readers can open a partial transcript
+        self._segments.seek(0)
+        self._segments.write(struct.pack(HEADER_FORMAT, SEGMENTS_MAGIC, SEGMENTS_VERSION, self.count, 0))
+        self._segments.seek(0, os.SEEK_END)
+        self._text.flush()
+        self._segments.flush()
+
+    def close(self):
+        self._text.close()
+        self._segments.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_transcript(text_path: str, segments: list) -> str:
+    # Whole-file variant for Whisper results that already hold every segment
+    with TranscriptStoreWriter(text_path) as writer:
+        for segment in segments:
+            writer.write(segment)
+    return text_path
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Memory-mapped, read-only view with O(log n) time/offset lookup
+# ------------------------------------------------------------------------
+class Transcript:
+    def __init__(self, text_path: str):
+        self.text_path = text_path
+        self.segments_path = segments_path_for(text_path)
+        if not os.path.isfile(self.segments_path):
+            raise FileNotFoundError(f"No segment index for transcript: {text_path}")
+
+        with open(self.segments_path, "rb") as f:
+            magic, version, count, _ = struct.unpack(HEADER_FORMAT, f.read(HEADER_SIZE))
+        if magic != SEGMENTS_MAGIC or version != SEGMENTS_VERSION:
+            raise ValueError(f"Unsupported segment index format: {self.segments_path}")
+
+        self.records = (
+            np.memmap(self.segments_path, dtype=SEGMENT_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+            if count else np.zeros(0, dtype=SEGMENT_DTYPE)
+        )
+        self._file = open(text_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._text = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._byte_len = size
+        self._char_len = None
+
+    @classmethod
+    def open(cls, text_path: str):
+        return cls(text_path)
+
+    def close(self):
+        if isinstance(self._text, mmap.mmap):
+            self._text.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def text(self) -> str:
+        return self._text[:self._byte_len].decode("utf-8")
+
+    @property
+    def char_length(self) -> int:
+        if self._char_len is None:
+            self._char_len = len(self.text)
+        return self._char_len
+
+    @property
+    def duration(self) -> float:
+        return float(self.records["end"][-1]) if len(self.records) else 0.0
+
+    def segment(self, i: int) -> dict:
+        record = self.records[i]
+        byte_end = int(self.records["byte_start"][i + 1]) if i + 1 < len(self.records) else self._byte_len
+        text = self._text[int(record["byte_start"]):byte_end].decode("utf-8")
+        return {
+            "index": i,
+            "start": float(record["start"]),
+            "end": float(record["end"]),
+            "char_start": int(record["char_start"]),
+            "char_end": int(record["char_start"]) + len(text),
+            "text": text,
+        }
+
+    def segments(self):
+        for i in range(len(self.records)):
+            yield self.segment(i)
+
+    def index_at_time(self, seconds: float) -> int:
+        # Last segment starting at or before `seconds`
+        i = int(np.searchsorted(self.records["start"], seconds, side="right")) - 1
+        return min(max(i, 0), len(self.records) - 1)
+
+    def index_at_offset(self, char_offset: int) -> int:
+        i = int(np.searchsorted(self.records["char_start"], char_offset, side="right")) - 1
+        return min(max(i, 0), len(self.records) - 1)
+
+    def segment_at_time(self, seconds: float) -> dict:
+        return self.segment(self.index_at_time(seconds)) if len(self.records) else None
+
+    def segment_at_offset(self, char_offset: int) -> dict:
+        return self.segment(self.index_at_offset(char_offset)) if len(self.records) else None
+
+    def time_range(self, char_start: int, char_end: int) -> tuple:
+        # (start, end) seconds covering the characters [char_start, char_end)
+        if not len(self.records):
+            return 0.0, 0.0
+        first = self.index_at_offset(char_start)
+        last = self.index_at_offset(max(char_start, char_end - 1))
+        return float(self.records["start"][first]), float(self.records["end"][last])
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Open the transcript store for a namespace, if it has a segment index
+# ------------------------------------------------------------------------
+def open_transcript(namespace: str, data_dir: str = "data"):
+    text_path = os.path.join(data_dir, f"{namespace}_transcription.txt")
+    try:
+        return Transcript(text_path)
+    except FileNotFoundError:
+        return None  # transcripts from before timestamps were kept
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Format seconds as H:MM:SS / M:SS for display
+# ------------------------------------------------------------------------
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
@@ -0,0 +1,96 @@
+import os
+import threading
+
+
+# ------------------------------------------------------------------------
+# config: Vector backend selection (shared by ingestion, QA and the agent)
+# ------------------------------------------------------------------------
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")          # pinecone | local
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", os.path.join("data", "vectors"))
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "youtube-video-index")
+PINECONE_CLOUD = "aws"                                            # Pinecone cloud provider
+PINECONE_REGION = "us-east-1"                                     # Pinecone region for serverless
+VECTOR_DIMENSION = 384                                            # matches embedding output
+
+_local_index = None
+_local_lock = threading.Lock()
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Stable identifier of the active backend (used in cache keys)
+# ------------------------------------------------------------------------
+def backend_id() -> str:
+    if VECTOR_BACKEND == "local":
+        return f"local:{os.path.abspath(LOCAL_VECTOR_DIR)}"
+    return f"pinecone:{PINECONE_INDEX_NAME}"
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Connect to the Pinecone index, creating it on first use
+# ------------------------------------------------------------------------
+def get_pinecone_index(create_if_missing: bool = True):
+    from pinecone import Pinecone
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    if not create_if_missing:
+        return pc.Index(PINECONE_INDEX_NAME)  # query path: skip the list_indexes round trip
+
+    # fix: Create index if it doesn't exist yet
+    if PINECONE_INDEX_NAME not in [index.name for index in pc.list_indexes()]:
+        print(f"Creating index '{PINECONE_INDEX_NAME}'...")
+        pc.create_index(
+            name=PINECONE_INDEX_NAME,
+            dimension=VECTOR_DIMENSION,
+            metric="cosine",
+            spec={"serverless": {"cloud": PINECONE_CLOUD, "region": PINECONE_REGION}}
+        )
+        print(f"Index '{PINECONE_INDEX_NAME}' created.")
+    else:
+        print(f"Using existing index '{PINECONE_INDEX_NAME}'.")
+
+    return pc.Index(PINECONE_INDEX_NAME)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Process-wide local index (one instance so every module sees the same data)
+# ------------------------------------------------------------------------
+def get_local_index():
+    global _local_index
+    with _local_lock:
+        if _local_index is None:
+            from local_vectorstore import LocalVectorIndex
+            _local_index = LocalVectorIndex(LOCAL_VECTOR_DIR, dimension=VECTOR_DIMENSION)
+        return _local_index
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Raw index handle (Pinecone Index or LocalVectorIndex, same API subset)
+# ------------------------------------------------------------------------
+def get_index(create_if_missing: bool = True):
+    if VECTOR_BACKEND == "local":
+        return get_local_index()
+    if VECTOR_BACKEND == "pinecone":
+        return get_pinecone_index(create_if_missing)
+    raise ValueError(f"Unknown VECTOR_BACKEND '{VECTOR_BACKEND}' (expected 'pinecone' or 'local')")
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: LangChain vector store for a namespace on the configured backend
+# ------------------------------------------------------------------------
+def get_vectorstore(namespace: str, embeddings):
+    if VECTOR_BACKEND == "local":
+        from local_vectorstore import LocalVectorStore
+        return LocalVectorStore(index=get_local_index(), embedding=embeddings, namespace=namespace, text_key="text")
+
+    from langchain_pinecone import PineconeVectorStore
+    return PineconeVectorStore(index=get_index(create_if_missing=False), embedding=embeddings,
+                               namespace=namespace, text_key="text")
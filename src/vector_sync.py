@@ -0,0 +1,131 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+
+from vector_backend import backend_id
+from instrumentation import span
+
+
+# ------------------------------------------------------------------------
+# config: Manifest location and delete batch size
+# ------------------------------------------------------------------------
+VECTOR_MANIFEST_DIR = os.getenv("VECTOR_MANIFEST_DIR", os.path.join("data", "vector_manifests"))
+DELETE_BATCH_SIZE = 1000                                          # Pinecone accepts up to 1000 ids per delete
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Content-hash chunk IDs (same chunk + same model → same ID on every run)
+# ------------------------------------------------------------------------
+def chunk_id(chunk, embedding_model: str) -> str:
+    if isinstance(chunk, dict):
+        parts = [embedding_model, chunk["text"], str(chunk.get("start")), str(chunk.get("end"))]
+    else:
+        parts = [embedding_model, chunk]
+    return "chunk-" + hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:24]
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Per-namespace manifest of stored vector IDs
+# ------------------------------------------------------------------------
+#   <namespace>.json      ids confirmed in the index after the last completed sync
+#   <namespace>.pending   append-only journal of ids about to be upserted (may or may not
+#                         have reached the index if a run died), cleaned up on the next sync
+class NamespaceManifest:
+    def __init__(self, namespace: str, directory: str = None):
+        directory = directory or os.path.join(VECTOR_MANIFEST_DIR, re.sub(r"[^A-Za-z0-9_.-]+", "_", backend_id()))
+        self.namespace = namespace
+        self.path = os.path.join(directory, f"{namespace or '__default__'}.json")
+        self.pending_path = self.path[:-len(".json")] + ".pending"
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def stored(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"ids": [], "embedding_model": None}
+
+    def pending(self) -> set:
+        try:
+            with open(self.pending_path, "r", encoding="utf-8") as f:
+                return {line.strip() for line in f if line.strip()}
+        except OSError:
+            return set()
+
+    def mark_pending(self, ids: list):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.pending_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{vector_id}\n" for vector_id in ids))
+
+    def commit(self, ids: list, embedding_model: str):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"ids": sorted(ids), "embedding_model": embedding_model, "updated": time.time()}, f)
+            os.replace(self.path + ".tmp", self.path)
+            if os.path.exists(self.pending_path):
+                os.remove(self.pending_path)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Diff-based sync (embed/upsert only new chunks, delete stale ones)
+# ------------------------------------------------------------------------
+class VectorSync:
+    def __init__(self, namespace: str, index, embedding_model: str, full: bool = False,
+                 manifest: NamespaceManifest = None):
+        self.namespace = namespace
+        self.index = index
+        self.embedding_model = embedding_model
+        self.manifest = manifest or NamespaceManifest(namespace)
+        self.legacy = not self.manifest.exists()
+        # full=True re-uploads every chunk but still removes whatever the last run left behind
+        self.known = set() if full else set(self.manifest.stored()["ids"])
+        self.desired = set()
+        self.stats = {"chunks": 0, "embedded": 0, "skipped": 0, "deleted": 0}
+
+    def start(self):
+        if self.legacy:
+            # Namespaces written before manifests existed use positional IDs we cannot diff against
+            try:
+                self.index.delete(delete_all=True, namespace=self.namespace)
+            except Exception as e:
+                print(f"⚠️ Could not clear legacy namespace '{self.namespace}': {e}")
+
+    def assign(self, chunk) -> tuple:
+        # Returns (id, needs_upload); chunks already stored under the same ID are skipped
+        vector_id = chunk_id(chunk, self.embedding_model)
+        if vector_id in self.desired:
+            return vector_id, False  # identical chunk twice in one transcript
+        self.desired.add(vector_id)
+        self.stats["chunks"] += 1
+        if vector_id in self.known:
+            self.stats["skipped"] += 1
+            return vector_id, False
+        self.stats["embedded"] += 1
+        return vector_id, True
+
+    def finish(self) -> dict:
+        with span("vector_sync") as s:
+            stored = set(self.manifest.stored()["ids"]) | self.manifest.pending()
+            stale = sorted(stored - self.desired)
+            for start in range(0, len(stale), DELETE_BATCH_SIZE):
+                self.index.delete(ids=stale[start:start + DELETE_BATCH_SIZE], namespace=self.namespace)
+            self.stats["deleted"] = len(stale)
+            self.manifest.commit(self.desired, self.embedding_model)
+            s.set(**self.stats)
+        print(f"Vector sync for '{self.namespace}': {self.stats['embedded']} embedded, "
+              f"{self.stats['skipped']} unchanged (skipped), {self.stats['deleted']} stale deleted.")
+        return dict(self.stats)
@@ -0,0 +1,192 @@
+import os
+
+import numpy as np
+
+
+# ------------------------------------------------------------------------
+# config: Inference backend, CPU threads and batch size for Whisper
+# ------------------------------------------------------------------------
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "torch")               # torch | int8 | ctranslate2
+WHISPER_THREADS = int(os.getenv("WHISPER_THREADS", "0"))              # > 0: intra-op threads per process
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "1"))        # VAD segments decoded per forward pass
+WHISPER_CT2_COMPUTE_TYPE = os.getenv("WHISPER_CT2_COMPUTE_TYPE", "int8")  # int8 | int8_float32 | float32
+SAMPLE_RATE = 16000
+TIME_PRECISION = 0.02                                                 # seconds per Whisper timestamp token
+
+# Registry model kind per backend (the plain "whisper" kind stays the full-precision default)
+BACKEND_KINDS = {"torch": "whisper", "int8": "whisper-int8", "ctranslate2": "whisper-ct2"}
+
+_threads = 0
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Thread count for whichever runtime this process uses
+# ------------------------------------------------------------------------
+def set_threads(threads: int):
+    global _threads
+    _threads = threads
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass  # CTranslate2-only installs; cpu_threads is passed when the model loads
+
+
+def backend_kind(backend: str = WHISPER_BACKEND) -> str:
+    if backend not in BACKEND_KINDS:
+        raise ValueError(f"Unknown Whisper backend: {backend} (expected one of {', '.join(BACKEND_KINDS)})")
+    return BACKEND_KINDS[backend]
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Dynamic int8 quantization of the PyTorch model (Linear layers, CPU only)
+# ------------------------------------------------------------------------
+def load_int8(name: str, device: str = "cpu"):
+    import torch
+    import whisper
+    if device != "cpu":
+        print(f"int8 Whisper runs on CPU only; ignoring device '{device}'.")
+    model = whisper.load_model(name, device="cpu")
+
+    # whisper.model.Linear only adds a dtype cast; quantize_dynamic matches exact nn.Linear types
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+
+
+# ------------------------------------------------------------------------
+# util: Whisper's own quality checks (a failed slice is decoded again, unbatched, with temperature fallback)
+# ------------------------------------------------------------------------
+NO_SPEECH_THRESHOLD = 0.6                                             # same cut-offs whisper.transcribe uses
+LOGPROB_THRESHOLD = -1.0
+COMPRESSION_RATIO_THRESHOLD = 2.4                                     # above: repetition loop / hallucination
+
+
+def is_silent(no_speech_prob: float, avg_logprob: float) -> bool:
+    return no_speech_prob > NO_SPEECH_THRESHOLD and avg_logprob < LOGPROB_THRESHOLD
+
+
+def needs_fallback(avg_logprob: float, compression_ratio: float) -> bool:
+    return compression_ratio > COMPRESSION_RATIO_THRESHOLD or avg_logprob < LOGPROB_THRESHOLD
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: CTranslate2 runtime via faster-whisper (optional dependency)
+# ------------------------------------------------------------------------
+class FasterWhisperModel:
+    # Same transcribe() result shape as openai-whisper, so call sites need no changes
+    def __init__(self, model):
+        self.model = model
+        self._pipeline = None
+
+    @staticmethod
+    def _segments(segments, offset: float = 0.0) -> list:
+        return [{"start": round(s.start - offset, 3), "end": round(s.end - offset, 3), "text": " " + s.text.strip()}
+                for s in segments]
+
+    def transcribe(self, audio, condition_on_previous_text: bool = True, language: str = None, **kwargs) -> dict:
+        segments, _ = self.model.transcribe(audio, language=language,
+                                            condition_on_previous_text=condition_on_previous_text)
+        segments = self._segments(segments)  # the generator decodes lazily; consume it here
+        return {"text": "".join(s["text"] for s in segments), "segments": segments}
+
+    def transcribe_batch(self, pcms: list, language: str = None) -> list:
+        # Slices go back to back into one array; clip timestamps make faster-whisper's batched pipeline
+        # decode each slice as one batch item (its own VAD is off: the slices are already VAD-cut)
+        from faster_whisper import BatchedInferencePipeline
+        if self._pipeline is None:
+            self._pipeline = BatchedInferencePipeline(model=self.model)
+        offsets = np.cumsum([0] + [len(pcm) for pcm in pcms]) / SAMPLE_RATE
+        audio = np.concatenate([np.asarray(pcm, dtype=np.float32) for pcm in pcms])
+        clips = [{"start": float(offsets[i]), "end": float(offsets[i + 1])} for i in range(len(pcms))]
+        segments, _ = self._pipeline.transcribe(audio, language=language, vad_filter=False, clip_timestamps=clips,
+                                                batch_size=len(pcms), without_timestamps=False)
+
+        per_slice, failed = [[] for _ in pcms], set()
+        for segment in segments:
+            index = min(int(np.searchsorted(offsets, segment.start, side="right")) - 1, len(pcms) - 1)
+            if is_silent(segment.no_speech_prob, segment.avg_logprob):
+                continue
+            if needs_fallback(segment.avg_logprob, segment.compression_ratio):
+                failed.add(index)
+            per_slice[index] += self._segments([segment], offsets[index])
+        for index in failed:
+            per_slice[index] = self.transcribe(pcms[index], condition_on_previous_text=False,
+                                               language=language)["segments"]
+        return per_slice
+
+
+def load_ctranslate2(name: str, device: str = "cpu"):
+    from faster_whisper import WhisperModel
+    compute_type = WHISPER_CT2_COMPUTE_TYPE if device == "cpu" else "float16"
+    model = WhisperModel(name, device=device, compute_type=compute_type, cpu_threads=_threads or WHISPER_THREADS)
+    return FasterWhisperModel(model)
+
+
+
+
+# ------------------------------------------------------------------------
+# feat: Batched decoding of VAD segments (one forward pass per batch on the PyTorch backends)
+# ------------------------------------------------------------------------
+def _split_on_timestamps(tokens: list, tokenizer, duration: float) -> list:
+    # <|0.00|> text <|2.40|><|2.40|> text <|5.00|> ... -> timestamped segments, as whisper.transcribe does
+    segments, start, text_tokens = [], None, []
+    for token in tokens:
+        if token < tokenizer.timestamp_begin:
+            text_tokens.append(token)
+            continue
+        time = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+        if text_tokens:
+            segments.append((start or 0.0, time, text_tokens))
+            start, text_tokens = time, []  # a following timestamp (usually the same) replaces it
+        else:
+            start = time
+    if text_tokens:  # no closing timestamp: the text runs to the end of the slice
+        segments.append((start or 0.0, duration, text_tokens))
+
+    result = []
+    for seg_start, seg_end, text_tokens in segments:
+        text = tokenizer.decode(text_tokens).strip()
+        if text:
+            result.append({"start": round(min(seg_start, duration), 3), "end": round(min(seg_end, duration), 3),
+                           "text": " " + text})
+    return result
+
+
+def transcribe_batch(model, pcms: list, language: str = None) -> list:
+    # -> one timestamped segment list per input slice; each slice is at most one 30 s window
+    if hasattr(model, "transcribe_batch"):
+        return model.transcribe_batch(pcms, language=language)
+    if not hasattr(model, "dims"):
+        # Stand-ins without batched decoding (fakes.FakeWhisperModel): one call per slice
+        return [model.transcribe(pcm)["segments"] for pcm in pcms]
+
+    import torch
+    import whisper
+    from whisper.tokenizer import get_tokenizer
+    mels = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(np.asarray(pcm, dtype=np.float32)),
+                                                    model.dims.n_mels) for pcm in pcms]).to(model.device)
+    options = whisper.DecodingOptions(language=language, without_timestamps=False, fp16=False)
+    results = whisper.decode(model, mels, options)
+    tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages, task="transcribe")
+
+    batches = []
+    for pcm, result in zip(pcms, results):
+        if is_silent(result.no_speech_prob, result.avg_logprob):
+            batches.append([])
+        elif needs_fallback(result.avg_logprob, result.compression_ratio):
+            # Greedy batch decode looped or was unsure: whisper.transcribe retries with higher temperatures
+            batches.append(model.transcribe(pcm, fp16=False, condition_on_previous_text=False,
+                                            language=language).get("segments", []))
+        else:
+            batches.append(_split_on_timestamps(result.tokens, tokenizer, len(pcm) / SAMPLE_RATE))
+    return batches
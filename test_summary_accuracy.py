@@ -1,28 +1,15 @@
-from datasets import load_dataset
-from evaluate import load
-from summary_and_email import summarize_transcript
+import os
+from summary_eval import EVAL_DATA_FILE, SummaryEvaluator, export_hf_dataset, load_examples, print_report, save_report
 
-# Load test data (10 samples from CNN/DailyMail)
-dataset = load_dataset("cnn_dailymail", "3.0.0", split="test[:100]")
-rouge = load("rouge")
+# Load test data (100 samples from CNN/DailyMail), downloaded once to a local JSONL file
+if not os.path.exists(EVAL_DATA_FILE):
+    export_hf_dataset(EVAL_DATA_FILE, split="test[:100]")
+examples = load_examples(EVAL_DATA_FILE, limit=100)
 
-# Get the transcript and reference summary
-inputs = dataset["article"]
-references = dataset["highlights"]
-
-# Generate summaries with your model
-predictions = []
-for i, text in enumerate(inputs):
-    print(f"Summarizing sample {i+1}/10...")
-    try:
-        summary = summarize_transcript(text)
-        predictions.append(summary)
-    except Exception as e:
-        print(f"Error: {e}")
-        predictions.append("")
+# Generate summaries concurrently (rate limited); unchanged prompts reuse cached predictions
+evaluator = SummaryEvaluator()
+report = evaluator.run(examples)
 
 # Evaluate
-results = rouge.compute(predictions=predictions, references=references)
-print("\n ROUGE Evaluation:")
-for k, v in results.items():
-    print(f"{k}: {v:.4f}")
+print_report(report)
+print(f"\nReport saved to {save_report(report)}")